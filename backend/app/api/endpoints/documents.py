@@ -1,26 +1,69 @@
-import os
-import shutil
+import asyncio
+import zipfile
 from pathlib import Path
-from tempfile import NamedTemporaryFile
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from bson import ObjectId
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, File, HTTPException, UploadFile, status
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
 from app.core.config import settings
 from app.core.logging import logger
-from app.core.database import get_cvs_collection, get_parsed_data_collection
-from app.models.documents import CVDocument, DocumentStatus, DocumentType, ParsedCV
-from app.services.document_processing import DocumentProcessor
-from app.services.llm_service import LLMService
+from app.core.database import get_batches_collection, get_cvs_collection, get_parsed_data_collection
+from app.models.documents import CVDocument, DocumentStatus, DocumentType, UploadBatch
+from app.services.artifacts import get_artifact_store
+from app.services.corpus import bump_corpus_version
+from app.services.job_queue import get_ingestion_queue
+from app.services.pipeline import PIPELINE_STAGES
+from app.services.storage import StoredUpload, UploadRejected, discard_upload, save_archive, save_upload
 
 router = APIRouter()
-llm_service = LLMService()
+
+async def _link_duplicate(existing: Dict, force_reprocess: bool) -> Dict:
+    """Point a re-upload at the document that already holds the same content."""
+    document_id = str(existing["_id"])
+    
+    if force_reprocess or existing.get("status") == DocumentStatus.FAILED:
+        cvs_collection = get_cvs_collection()
+        # A failed document resumes from its stored artifacts; a forced reprocess recomputes every stage.
+        # A document in flight is left alone: its job is still queued, so enqueueing would be a no-op and
+        # the worker clears force_stages when it finishes.
+        result = await cvs_collection.update_one(
+            {"_id": existing["_id"], "status": {"$ne": DocumentStatus.PROCESSING}},
+            {
+                "$set": {
+                    "status": DocumentStatus.PENDING,
+                    "error_message": None,
+                    "force_stages": PIPELINE_STAGES if force_reprocess else []
+                }
+            }
+        )
+        if result.matched_count == 0:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Document {document_id} is being processed; retry the reprocess once it finishes"
+            )
+        try:
+            await get_ingestion_queue().enqueue(document_id)
+        except Exception as e:
+            logger.warning(f"Failed to enqueue document {document_id}, leaving it for the worker sweep: {str(e)}")
+        logger.info(f"Duplicate upload of {document_id} queued for reprocessing")
+        return {
+            "message": "Document already uploaded, queued for reprocessing",
+            "document_id": document_id,
+            "duplicate": True
+        }
+    
+    logger.info(f"Duplicate upload linked to existing document {document_id}")
+    return {
+        "message": "Document already uploaded",
+        "document_id": document_id,
+        "parsed_data_id": str(existing["parsed_data_id"]) if existing.get("parsed_data_id") else None,
+        "duplicate": True
+    }
 
 @router.post("/upload", status_code=status.HTTP_202_ACCEPTED)
-async def upload_document(file: UploadFile = File(...)) -> Dict:
+async def upload_document(file: UploadFile = File(...), force_reprocess: bool = False) -> Dict:
 
-    file_size = 0
     max_size = settings.MAX_DOCUMENT_SIZE_MB * 1024 * 1024  
     
     file_ext = Path(file.filename).suffix.lower().lstrip(".")
@@ -30,108 +73,210 @@ async def upload_document(file: UploadFile = File(...)) -> Dict:
             detail=f"Invalid file type. Allowed types: {', '.join(settings.ALLOWED_DOCUMENT_TYPES)}"
         )
     
-    upload_dir = Path("data/uploads")
-    upload_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        stored = await save_upload(file, file_ext, max_size)
+    except UploadRejected as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    with NamedTemporaryFile(delete=False) as temp_file:
-        shutil.copyfileobj(file.file, temp_file)
-        file_size = temp_file.tell()
-        
-        if file_size > max_size:
-            os.unlink(temp_file.name)
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"File too large. Maximum size: {settings.MAX_DOCUMENT_SIZE_MB}MB"
-            )
-        
-        file_path = upload_dir / f"{ObjectId()}.{file_ext}"
-        shutil.move(temp_file.name, file_path)
+    cvs_collection = get_cvs_collection()
+    existing = await cvs_collection.find_one({"content_hash": stored.content_hash})
+    if existing:
+        discard_upload(stored, in_use_path=existing.get("file_path"))
+        return await _link_duplicate(existing, force_reprocess)
     
     document_type = DocumentType.PDF if file_ext == "pdf" else DocumentType.DOCX
     cv_document = CVDocument(
         filename=file.filename,
         file_type=document_type,
-        file_size=file_size,
-        file_path=str(file_path),
+        file_size=stored.file_size,
+        file_path=stored.file_path,
+        content_hash=stored.content_hash,
         status=DocumentStatus.PENDING
     )
     
-    cvs_collection = get_cvs_collection()
-    result = await cvs_collection.insert_one(cv_document.model_dump(exclude={"id"}))
+    try:
+        result = await cvs_collection.insert_one(cv_document.model_dump(exclude={"id"}))
+    except DuplicateKeyError:
+        # Lost a race with a concurrent upload of the same file
+        existing = await cvs_collection.find_one({"content_hash": stored.content_hash})
+        discard_upload(stored, in_use_path=existing.get("file_path"))
+        return await _link_duplicate(existing, force_reprocess)
     document_id = str(result.inserted_id)
     
     try:
-        await cvs_collection.update_one(
-            {"_id": ObjectId(document_id)},
-            {"$set": {"status": DocumentStatus.PROCESSING}}
-        )
-        
-        parsed_cv, error = await DocumentProcessor.process_document(cv_document)
-        
-        if error:
-            await cvs_collection.update_one(
-                {"_id": ObjectId(document_id)},
-                {
-                    "$set": {
-                        "status": DocumentStatus.FAILED,
-                        "error_message": error
-                    }
-                }
-            )
-            logger.error(f"Document processing failed: {error}")
-        else:
-            try:
-                if not hasattr(parsed_cv, 'id') or parsed_cv.id is None:
-                    parsed_cv.id = document_id
-                
-                enhanced_cv = await llm_service.enhance_cv(parsed_cv)
-                
-                if not enhanced_cv.embedding:
-                    text_for_embedding = llm_service._prepare_text_for_embedding(enhanced_cv)
-                    enhanced_cv.embedding = llm_service.embedding_model.encode(text_for_embedding).tolist()
-                
-                parsed_data_collection = get_parsed_data_collection()
-                parsed_data_result = await parsed_data_collection.insert_one(
-                    enhanced_cv.model_dump(by_alias=True, exclude={"id"})
-                )
-                parsed_data_id = str(parsed_data_result.inserted_id)
-                
-                await cvs_collection.update_one(
-                    {"_id": ObjectId(document_id)},
-                    {
-                        "$set": {
-                            "status": DocumentStatus.COMPLETED,
-                            "parsed_data_id": parsed_data_id
-                        }
-                    }
-                )
-                
-                logger.info(f"Document processed successfully: {document_id}")
-            except Exception as e:
-                logger.error(f"Error enhancing CV with LLM: {str(e)}", exc_info=True)
-                await cvs_collection.update_one(
-                    {"_id": ObjectId(document_id)},
-                    {
-                        "$set": {
-                            "status": DocumentStatus.FAILED,
-                            "error_message": f"Error enhancing CV: {str(e)}"
-                        }
-                    }
-                )
+        await get_ingestion_queue().enqueue(document_id)
     except Exception as e:
-        logger.error(f"Error processing document: {str(e)}", exc_info=True)
-        await cvs_collection.update_one(
-            {"_id": ObjectId(document_id)},
-            {
-                "$set": {
-                    "status": DocumentStatus.FAILED,
-                    "error_message": str(e)
-                }
-            }
-        )
+        # The worker sweep picks up PENDING documents that never made it onto the queue
+        logger.warning(f"Failed to enqueue document {document_id}, leaving it for the worker sweep: {str(e)}")
     
     return {"message": "Document uploaded and queued for processing", "document_id": document_id}
 
+async def _store_batch_files(files: List[UploadFile], max_size: int) -> Tuple[List[Tuple[str, StoredUpload]], List[Dict[str, str]]]:
+    stored: List[Tuple[str, StoredUpload]] = []
+    rejected: List[Dict[str, str]] = []
+    semaphore = asyncio.Semaphore(settings.BATCH_STORE_CONCURRENCY)
+    
+    async def store_file(file: UploadFile):
+        file_ext = Path(file.filename).suffix.lower().lstrip(".")
+        async with semaphore:
+            if file_ext == "zip":
+                try:
+                    archive_stored, archive_rejected = await asyncio.to_thread(
+                        save_archive, file.file, settings.ALLOWED_DOCUMENT_TYPES, max_size, settings.BATCH_MAX_FILES
+                    )
+                except zipfile.BadZipFile:
+                    rejected.append({"filename": file.filename, "reason": "Invalid zip archive"})
+                    return
+                stored.extend(archive_stored)
+                rejected.extend(archive_rejected)
+                return
+            
+            if file_ext not in settings.ALLOWED_DOCUMENT_TYPES:
+                rejected.append({"filename": file.filename, "reason": "Invalid file type"})
+                return
+            
+            try:
+                upload = await save_upload(file, file_ext, max_size)
+            except UploadRejected as e:
+                rejected.append({"filename": file.filename, "reason": str(e)})
+                return
+            stored.append((file.filename, upload))
+    
+    await asyncio.gather(*(store_file(file) for file in files))
+    
+    kept = stored[:settings.BATCH_MAX_FILES]
+    # Uploads are content-addressed, so a dropped file may share its path with one we keep
+    kept_paths = {upload.content_hash: upload.file_path for _, upload in kept}
+    for filename, upload in stored[settings.BATCH_MAX_FILES:]:
+        discard_upload(upload, in_use_path=kept_paths.get(upload.content_hash))
+        rejected.append({"filename": filename, "reason": "Batch file limit reached"})
+    return kept, rejected
+
+@router.post("/batch", status_code=status.HTTP_202_ACCEPTED)
+async def upload_batch(files: List[UploadFile] = File(...)) -> Dict:
+
+    max_size = settings.MAX_DOCUMENT_SIZE_MB * 1024 * 1024
+    stored, rejected = await _store_batch_files(files, max_size)
+    
+    batch = UploadBatch(id=str(ObjectId()), rejected=rejected)
+    
+    # Drop duplicates within the batch and against documents that are already stored
+    unique: Dict[str, Tuple[str, StoredUpload]] = {}
+    for filename, upload in stored:
+        if upload.content_hash in unique:
+            discard_upload(upload, in_use_path=unique[upload.content_hash][1].file_path)
+        else:
+            unique[upload.content_hash] = (filename, upload)
+    
+    cvs_collection = get_cvs_collection()
+    existing_ids: Dict[str, str] = {}
+    async for existing in cvs_collection.find({"content_hash": {"$in": list(unique)}}, {"content_hash": 1, "file_path": 1}):
+        existing_ids[existing["content_hash"]] = str(existing["_id"])
+        discard_upload(unique.pop(existing["content_hash"])[1], in_use_path=existing.get("file_path"))
+    
+    new_documents = []
+    for filename, upload in unique.values():
+        file_ext = Path(upload.file_path).suffix.lstrip(".")
+        cv_document = CVDocument(
+            filename=filename,
+            file_type=DocumentType.PDF if file_ext == "pdf" else DocumentType.DOCX,
+            file_size=upload.file_size,
+            file_path=upload.file_path,
+            content_hash=upload.content_hash,
+            status=DocumentStatus.PENDING,
+            batch_id=batch.id
+        )
+        document = cv_document.model_dump(exclude={"id"})
+        document["_id"] = ObjectId()
+        new_documents.append(document)
+    
+    if new_documents:
+        try:
+            await cvs_collection.insert_many(new_documents, ordered=False)
+        except BulkWriteError as e:
+            # Documents that lost a race with a concurrent upload of the same content
+            for error in e.details.get("writeErrors", []):
+                document = new_documents[error["index"]]
+                existing = await cvs_collection.find_one({"content_hash": document["content_hash"]}, {"file_path": 1})
+                discard_upload(unique[document["content_hash"]][1], in_use_path=existing.get("file_path") if existing else None)
+                if existing:
+                    existing_ids[document["content_hash"]] = str(existing["_id"])
+                document["_id"] = None
+            new_documents = [document for document in new_documents if document["_id"] is not None]
+    
+    batch.document_ids = [str(document["_id"]) for document in new_documents]
+    batch.duplicate_ids = list(existing_ids.values())
+    
+    batches_collection = get_batches_collection()
+    batch_record = batch.model_dump(exclude={"id"})
+    batch_record["_id"] = batch.id
+    await batches_collection.insert_one(batch_record)
+    
+    if batch.document_ids:
+        try:
+            await get_ingestion_queue().enqueue_many(batch.document_ids)
+        except Exception as e:
+            logger.warning(f"Failed to enqueue batch {batch.id}, leaving it for the worker sweep: {str(e)}")
+    
+    logger.info(
+        f"Batch {batch.id}: {len(batch.document_ids)} queued, "
+        f"{len(batch.duplicate_ids)} duplicates, {len(batch.rejected)} rejected"
+    )
+    return {
+        "message": "Batch uploaded and queued for processing",
+        "batch_id": batch.id,
+        "queued": len(batch.document_ids),
+        "duplicates": len(batch.duplicate_ids),
+        "rejected": batch.rejected
+    }
+
+@router.get("/batch/{batch_id}")
+async def get_batch_status(batch_id: str) -> Dict:
+
+    batches_collection = get_batches_collection()
+    batch = await batches_collection.find_one({"_id": batch_id})
+    if not batch:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Batch with ID {batch_id} not found"
+        )
+    
+    document_ids = [ObjectId(document_id) for document_id in batch["document_ids"] + batch["duplicate_ids"]]
+    status_counts = {document_status.value: 0 for document_status in DocumentStatus}
+    
+    cvs_collection = get_cvs_collection()
+    async for group in cvs_collection.aggregate([
+        {"$match": {"_id": {"$in": document_ids}}},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ]):
+        status_counts[group["_id"]] = group["count"]
+    
+    total = len(document_ids)
+    finished = status_counts[DocumentStatus.COMPLETED.value] + status_counts[DocumentStatus.FAILED.value]
+    return {
+        "batch_id": batch_id,
+        "created_at": batch["created_at"],
+        "total": total,
+        "status_counts": status_counts,
+        "progress": finished / total if total else 1.0,
+        "rejected": batch["rejected"]
+    }
+
+@router.get("/queue/stats")
+async def get_queue_stats() -> Dict:
+
+    try:
+        return await get_ingestion_queue().stats()
+    except Exception as e:
+        logger.error(f"Error getting queue stats: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Error getting queue stats: {str(e)}"
+        )
+
 @router.get("/status/{document_id}")
 async def get_document_status(document_id: str) -> Dict:
 
@@ -234,7 +379,10 @@ async def delete_document(document_id: str) -> Dict:
             parsed_data_collection = get_parsed_data_collection()
             await parsed_data_collection.delete_one({"_id": ObjectId(parsed_data_id)})
         
+        await get_artifact_store().invalidate(document.get("content_hash") or document_id, PIPELINE_STAGES)
+        
         await cvs_collection.delete_one({"_id": ObjectId(document_id)})
+        await bump_corpus_version("delete")
         
         return {"message": f"Document with ID {document_id} deleted successfully"}
     except Exception as e:
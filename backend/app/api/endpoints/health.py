@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse
 from typing import Dict
-import anthropic
 import socket
 import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -9,6 +9,9 @@ from redis.asyncio import Redis
 from app.core.config import settings
 from app.core.database import mongodb_client, redis_client, mongodb_connected, redis_connected
 from app.core.logging import logger
+from app.services.circuit_breaker import get_llm_breaker
+from app.services.llm_backends import get_llm_backend
+from app.services.model_registry import get_model_registry
 
 router = APIRouter()
 
@@ -97,19 +100,11 @@ async def health_check() -> Dict[str, str]:
     
     redis_status = await check_redis_connection()
     
-    anthropic_status = "down"
-    try:
-        client = anthropic.Anthropic(api_key=settings.ANTHROPIC_API_KEY)
-        # Simple API call to check status
-        response = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=10,
-            messages=[{"role": "user", "content": "Hi"}]
-        )
-        if response:
-            anthropic_status = "up"
-    except Exception as e:
-        logger.warning(f"Anthropic API health check failed: {str(e)}")
+    # Judged from the breaker's view of real traffic rather than spending a live call on every probe
+    llm_circuit = get_llm_breaker().snapshot()
+    anthropic_status = "up"
+    if not get_llm_backend().is_available() or llm_circuit["state"] == "open":
+        anthropic_status = "down"
     
     services_down = 0
     total_services = 3
@@ -132,7 +127,17 @@ async def health_check() -> Dict[str, str]:
         "mongodb_details": mongodb_status["details"],
         "redis": redis_status["status"],
         "redis_details": redis_status["details"],
-        "anthropic": anthropic_status
+        "anthropic": anthropic_status,
+        "llm_circuit": llm_circuit["state"]
     }
     
-    return health_status
\ No newline at end of file
+    return health_status
+
+@router.get("/ready")
+async def readiness_check() -> JSONResponse:
+
+    model_status = get_model_registry().status()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if model_status["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=model_status
+    )
@@ -1,115 +1,278 @@
-from typing import Dict, List
+import asyncio
+import json
+import time
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
 from bson import ObjectId
-from fastapi import APIRouter, Depends, HTTPException, status
-from redis.asyncio import Redis
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 
+from app.core.config import settings
 from app.core.logging import logger
-from app.core.database import redis_client, get_parsed_data_collection
-from app.models.documents import CVQuery, ParsedCV
-from app.services.llm_service import LLMService
+from app.core.database import get_parsed_data_collection
+from app.models.documents import ConversationSession, CVQuery, ParsedCV, QueryMode
+from app.services.circuit_breaker import CircuitOpenError, DeadlineExceeded
+from app.services.corpus import get_corpus_version
+from app.services.llm_cache import get_query_cache, normalize_text
+from app.services.llm_service import SearchIndex, get_llm_service
+from app.services.model_registry import ModelUnavailableError
+from app.services.query_router import get_query_router
+from app.services.semantic_cache import get_answer_cache
+from app.services.sessions import get_session_store
 
 router = APIRouter()
 
 try:
-    llm_service = LLMService()
+    llm_service = get_llm_service()
 except Exception as e:
     logger.error(f"Failed to initialize LLM service: {e}")
     llm_service = None
 
-@router.post("/query")
-async def query_cv_data(query: CVQuery) -> Dict[str, str]:
+def query_projection() -> Dict:
+    # Full CV text is the bulk of each document; only unstructured CVs need a preview of it
+    return {
+        "personal_info": 1,
+        "education": 1,
+        "work_experience": 1,
+        "skills": 1,
+        "projects": 1,
+        "certifications": 1,
+        "embedding": 1,
+        "raw_text": {"$substrCP": ["$raw_text", 0, settings.QUERY_RAW_TEXT_PREVIEW_CHARS]}
+    }
 
-    if not llm_service:
-        logger.error("LLM service is not initialized")
+async def load_query_cvs(ids: Optional[List[str]] = None) -> List[ParsedCV]:
+    """Load the parsed CVs a query can draw on (all of them, or the given ids in order)."""
+    parsed_data_collection = get_parsed_data_collection()
+    
+    try:
+        filter_query = {"_id": {"$in": [ObjectId(cv_id) for cv_id in ids]}} if ids is not None else {}
+        parsed_data_docs = await parsed_data_collection.find(filter_query, query_projection()).to_list(None)
+        if ids is not None:
+            positions = {cv_id: i for i, cv_id in enumerate(ids)}
+            parsed_data_docs.sort(key=lambda doc: positions.get(str(doc["_id"]), len(positions)))
+        logger.info(f"Retrieved {len(parsed_data_docs)} documents from MongoDB")
+        
+        if parsed_data_docs and len(parsed_data_docs) > 0:
+            logger.info(f"Sample document structure: {list(parsed_data_docs[0].keys())}")
+    except Exception as db_error:
+        logger.error(f"Error retrieving documents from MongoDB: {str(db_error)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="LLM service is not initialized. Please check system logs."
+            detail=f"Database retrieval error: {str(db_error)}"
         )
     
-    try:
-        parsed_data_collection = get_parsed_data_collection()
-        
-        logger.info(f"Processing query: '{query.query}'")
-        
+    parsed_cvs = []
+    conversion_errors = 0
+    
+    for doc in parsed_data_docs:
         try:
-            parsed_data_docs = await parsed_data_collection.find().to_list(None)
-            logger.info(f"Retrieved {len(parsed_data_docs)} documents from MongoDB")
+            original_id = str(doc.pop('_id', '')) if '_id' in doc else None
+  
+            parsed_cv = ParsedCV.model_validate(doc)
             
-            if parsed_data_docs and len(parsed_data_docs) > 0:
-                logger.info(f"Sample document structure: {list(parsed_data_docs[0].keys())}")
-        except Exception as db_error:
-            logger.error(f"Error retrieving documents from MongoDB: {str(db_error)}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Database retrieval error: {str(db_error)}"
-            )
-        
-        parsed_cvs = []
-        conversion_errors = 0
-        
-        for doc in parsed_data_docs:
+            parsed_cv.id = original_id
+            
+            if not parsed_cv.raw_text:
+                parsed_cv.raw_text = "No raw text available"
+            
+            parsed_cvs.append(parsed_cv)
+            
+        except Exception as validation_error:
+            conversion_errors += 1
+            logger.warning(f"Error converting document to ParsedCV: {validation_error}")
             try:
-                original_id = str(doc.pop('_id', '')) if '_id' in doc else None
-  
-                parsed_cv = ParsedCV.model_validate(doc)
-                
-                parsed_cv.id = original_id
+                minimal_cv = ParsedCV(
+                    id=str(doc.get('_id', '')),
+                    raw_text="Partial data available"
+                )
                 
-                if not parsed_cv.raw_text:
-                    parsed_cv.raw_text = "No raw text available"
+                if 'personal_info' in doc and isinstance(doc['personal_info'], dict):
+                    minimal_cv.personal_info.name = doc['personal_info'].get('name')
+                    minimal_cv.personal_info.email = doc['personal_info'].get('email')
                 
-                parsed_cvs.append(parsed_cv)
+                if 'skills' in doc and isinstance(doc['skills'], list):
+                    for skill_item in doc['skills']:
+                        if isinstance(skill_item, dict) and 'name' in skill_item:
+                            minimal_cv.skills.append({
+                                'name': skill_item['name'],
+                                'category': skill_item.get('category')
+                            })
                 
-            except Exception as validation_error:
-                conversion_errors += 1
-                logger.warning(f"Error converting document to ParsedCV: {validation_error}")
-                try:
-                    minimal_cv = ParsedCV(
-                        id=str(doc.get('_id', '')),
-                        raw_text="Partial data available"
-                    )
-                    
-                    if 'personal_info' in doc and isinstance(doc['personal_info'], dict):
-                        minimal_cv.personal_info.name = doc['personal_info'].get('name')
-                        minimal_cv.personal_info.email = doc['personal_info'].get('email')
-                    
-                    if 'skills' in doc and isinstance(doc['skills'], list):
-                        for skill_item in doc['skills']:
-                            if isinstance(skill_item, dict) and 'name' in skill_item:
-                                minimal_cv.skills.append({
-                                    'name': skill_item['name'],
-                                    'category': skill_item.get('category')
-                                })
-                    
-                    parsed_cvs.append(minimal_cv)
-                    logger.info(f"Added document with minimal valid data instead")
-                except Exception as backup_error:
-                    logger.error(f"Even minimal CV parsing failed: {backup_error}")
+                parsed_cvs.append(minimal_cv)
+                logger.info(f"Added document with minimal valid data instead")
+            except Exception as backup_error:
+                logger.error(f"Even minimal CV parsing failed: {backup_error}")
+    
+    logger.info(f"Successfully converted {len(parsed_cvs)} CVs, with {conversion_errors} conversion errors")
+    
+    if not parsed_cvs:
+        return parsed_cvs
+    
+    logger.info(f"Processing query with {len(parsed_cvs)} CVs")
+    for i, cv in enumerate(parsed_cvs[:5]): 
+        name = cv.personal_info.name if cv.personal_info and cv.personal_info.name else "Unknown"
+        skill_count = len(cv.skills) if cv.skills else 0
+        logger.info(f"CV #{i+1}: {name}, {skill_count} skills, ID: {cv.id}")
+    
+    return parsed_cvs
+
+async def build_search_index(cvs: List[ParsedCV]) -> Optional[SearchIndex]:
+    try:
+        return await asyncio.to_thread(llm_service.build_index, cvs)
+    except Exception as index_error:
+        logger.warning(f"Failed to build index: {index_error}, continuing with basic processing")
+    return None
+
+@dataclass
+class QueryCorpus:
+    cvs: List[ParsedCV]
+    search_index: Optional[SearchIndex] = None
+
+class QueryCorpusCache:
+    """The full set of query CVs and their search index, kept until the corpus version changes.
+    
+    Each query gets the index built for the CVs it was handed, so concurrent queries never search
+    each other's candidates, and only the first query after an upload or delete reloads the corpus.
+    """
+    
+    def __init__(self):
+        self._corpus: Optional[QueryCorpus] = None
+        self._corpus_version: Optional[int] = None
+        self._lock = asyncio.Lock()
+    
+    async def get(self, corpus_version: Optional[int]) -> QueryCorpus:
+        async with self._lock:
+            if corpus_version is not None and self._corpus is not None and self._corpus_version == corpus_version:
+                return self._corpus
+            parsed_cvs = await load_query_cvs()
+            corpus = QueryCorpus(parsed_cvs, await build_search_index(parsed_cvs))
+            if corpus_version is not None:
+                # Without a version we cannot tell whether a kept corpus is current
+                self._corpus, self._corpus_version = corpus, corpus_version
+            return corpus
+
+query_corpus_cache = QueryCorpusCache()
+
+@dataclass
+class CachedAnswer:
+    answer: Optional[str] = None
+    corpus_version: Optional[int] = None
+    exact_key: Optional[str] = None
+    query_embedding: Optional[np.ndarray] = None
+
+async def lookup_cached_answer(query: CVQuery) -> CachedAnswer:
+    """Check the exact-match cache, then the semantic one, for an answer over the current corpus."""
+    corpus_version = await get_corpus_version()
+    if corpus_version is None:
+        return CachedAnswer()
+    
+    query_cache = get_query_cache()
+    lookup = CachedAnswer(
+        corpus_version=corpus_version,
+        exact_key=query_cache.make_key(
+            llm_service.model_name,
+            str(corpus_version),
+            query.mode.value,
+            normalize_text(query.query).lower(),
+            normalize_text(query.context or "")
+        )
+    )
+    lookup.answer = await query_cache.get(lookup.exact_key)
+    if lookup.answer is not None:
+        return lookup
+    
+    answer_cache = get_answer_cache()
+    if answer_cache.applies_to(query):
+        lookup.answer, lookup.query_embedding = await answer_cache.lookup(query.query, corpus_version)
+    return lookup
+
+async def store_cached_answer(query: CVQuery, lookup: CachedAnswer, answer: str):
+    if lookup.exact_key:
+        await get_query_cache().put(lookup.exact_key, answer)
+    if lookup.query_embedding is not None:
+        get_answer_cache().store(query.query, lookup.query_embedding, answer, lookup.corpus_version)
+
+async def load_session_cvs(query: CVQuery, session: Optional[ConversationSession]) -> QueryCorpus:
+    """Reuse a conversation's candidates for a follow-up unless the corpus changed or the query names someone new."""
+    corpus_version = await get_corpus_version()
+    if (
+        session is not None
+        and session.candidate_ids
+        and query.mode == QueryMode.FOCUSED
+        and corpus_version is not None
+        and session.corpus_version == corpus_version
+    ):
+        session_cvs = await load_query_cvs(session.candidate_ids)
+        mentions = llm_service._extract_entity_mentions(query.query)
+        if session_cvs and all(llm_service._resolve_entity(mention, session_cvs) for mention in mentions):
+            logger.info(f"Reusing {len(session_cvs)} candidates from session {session.id}")
+            return QueryCorpus(session_cvs, await build_search_index(session_cvs))
+    
+    corpus = await query_corpus_cache.get(corpus_version)
+    if session is not None:
+        session.corpus_version = corpus_version
+        session.corpus_size = len(corpus.cvs)
+    return corpus
+
+async def answer_without_llm(query: CVQuery, session: Optional[ConversationSession]) -> Tuple[Optional[str], CachedAnswer]:
+    """Answer from the structured indexes or the caches; follow-ups in a session depend on its history, so they skip both."""
+    if session is not None and session.turns:
+        return None, CachedAnswer()
+    routed = await get_query_router().route(query)
+    if routed is not None:
+        return routed, CachedAnswer()
+    cached = await lookup_cached_answer(query)
+    return cached.answer, cached
+
+async def record_turn(query: CVQuery, session: Optional[ConversationSession], answer: str, background_tasks: BackgroundTasks):
+    if session is None:
+        return
+    session_store = get_session_store()
+    await session_store.record_turn(session, query.query, answer)
+    if session_store.needs_folding(session):
+        # Summarizing is an LLM call; run it once the response has gone out
+        background_tasks.add_task(session_store.fold, session.id)
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/query")
+async def query_cv_data(query: CVQuery, background_tasks: BackgroundTasks) -> Dict[str, str]:
+
+    if not llm_service:
+        logger.error("LLM service is not initialized")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="LLM service is not initialized. Please check system logs."
+        )
+    
+    try:
+        logger.info(f"Processing query: '{query.query}'")
         
-        logger.info(f"Successfully converted {len(parsed_cvs)} CVs, with {conversion_errors} conversion errors")
+        session = await get_session_store().load(query.session_id) if query.session_id else None
+        ready_answer, cached = await answer_without_llm(query, session)
+        if ready_answer is not None:
+            await record_turn(query, session, ready_answer, background_tasks)
+            return {"response": ready_answer}
         
-        if not parsed_cvs:
+        corpus = await load_session_cvs(query, session)
+        if not corpus.cvs:
             logger.warning("No valid CV data found to process query")
             return {"response": "No CV data available to query. Please upload some CVs first."}
         
-        logger.info(f"Processing query with {len(parsed_cvs)} CVs")
-        for i, cv in enumerate(parsed_cvs[:5]): 
-            name = cv.personal_info.name if cv.personal_info and cv.personal_info.name else "Unknown"
-            skill_count = len(cv.skills) if cv.skills else 0
-            logger.info(f"CV #{i+1}: {name}, {skill_count} skills, ID: {cv.id}")
-        
         try:
-            if llm_service.embedding_model:
-                llm_service.build_index(parsed_cvs)
-                logger.info("Successfully built search index for CVs")
-            else:
-                logger.warning("Embedding model not initialized, skipping index building")
-        except Exception as index_error:
-            logger.warning(f"Failed to build index: {index_error}, continuing with basic processing")
-        
-        try:
-            response = await llm_service.query_cv_data(query, parsed_cvs)
+            response = await llm_service.query_cv_data(query, corpus.cvs, session=session, search_index=corpus.search_index)
             logger.info("Successfully received response from LLM service")
+        except (CircuitOpenError, DeadlineExceeded, ModelUnavailableError) as unavailable:
+            logger.warning(f"Shedding query, LLM unavailable: {unavailable}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"LLM service is temporarily unavailable: {str(unavailable)}",
+                headers={"Retry-After": str(int(getattr(unavailable, "retry_after", 5)) or 1)}
+            )
         except Exception as llm_error:
             logger.error(f"Error querying LLM service: {llm_error}")
             raise HTTPException(
@@ -117,16 +280,13 @@ async def query_cv_data(query: CVQuery) -> Dict[str, str]:
                 detail=f"Error processing query with LLM: {str(llm_error)}"
             )
         
-        try:
-            if redis_client:
-                query_key = f"query:{ObjectId()}"
-                await redis_client.set(query_key, query.model_dump_json(), ex=3600) 
-                logger.info("Successfully saved query to Redis history")
-        except Exception as redis_error:
-            logger.warning(f"Failed to save query to Redis: {redis_error}")
+        await store_cached_answer(query, cached, response)
+        await record_turn(query, session, response, background_tasks)
         
         return {"response": response}
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error querying CV data: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -134,11 +294,77 @@ async def query_cv_data(query: CVQuery) -> Dict[str, str]:
             detail=f"Error querying CV data: {str(e)}"
         )
 
+@router.post("/query/stream")
+async def stream_query_cv_data(query: CVQuery, request: Request, background_tasks: BackgroundTasks) -> StreamingResponse:
+
+    if not llm_service:
+        logger.error("LLM service is not initialized")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="LLM service is not initialized. Please check system logs."
+        )
+    
+    logger.info(f"Processing streaming query: '{query.query}'")
+    session = await get_session_store().load(query.session_id) if query.session_id else None
+    ready_answer, cached = await answer_without_llm(query, session)
+    corpus = await load_session_cvs(query, session) if ready_answer is None else QueryCorpus([])
+    
+    async def event_stream():
+        if ready_answer is not None:
+            yield sse_event("token", {"text": ready_answer})
+            yield sse_event("done", {"usage": None, "cached": cached.answer is not None, "routed": cached.answer is None})
+            await record_turn(query, session, ready_answer, background_tasks)
+            return
+        
+        if not corpus.cvs:
+            yield sse_event("token", {"text": "No CV data available to query. Please upload some CVs first."})
+            yield sse_event("done", {"usage": None})
+            return
+        
+        started = time.perf_counter()
+        first_token_ms = None
+        answer_parts = []
+        try:
+            async with aclosing(llm_service.stream_query_cv_data(query, corpus.cvs, session=session, search_index=corpus.search_index)) as events:
+                async for event in events:
+                    if await request.is_disconnected():
+                        # Leaving the block closes the upstream stream so we stop paying for tokens
+                        logger.info("Client disconnected, cancelling streaming query")
+                        return
+                    
+                    if event["event"] == "token":
+                        if first_token_ms is None:
+                            first_token_ms = round((time.perf_counter() - started) * 1000)
+                        answer_parts.append(event["text"])
+                        yield sse_event("token", {"text": event["text"]})
+                    else:
+                        await store_cached_answer(query, cached, "".join(answer_parts))
+                        yield sse_event("done", {
+                            "usage": event["usage"],
+                            "stop_reason": event["stop_reason"],
+                            "time_to_first_token_ms": first_token_ms,
+                            "duration_ms": round((time.perf_counter() - started) * 1000)
+                        })
+                        await record_turn(query, session, "".join(answer_parts), background_tasks)
+        except CircuitOpenError as e:
+            yield sse_event("error", {"detail": f"LLM service is temporarily unavailable: {str(e)}", "retry_after": e.retry_after})
+        except Exception as e:
+            logger.error(f"Error streaming query response: {str(e)}", exc_info=True)
+            yield sse_event("error", {"detail": f"Error processing query with LLM: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/followup")
-async def followup_query(query: CVQuery) -> Dict[str, str]:
+async def followup_query(query: CVQuery, background_tasks: BackgroundTasks) -> Dict[str, str]:
 
     try:
-        return await query_cv_data(query)
+        return await query_cv_data(query, background_tasks)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in followup query: {str(e)}", exc_info=True)
         raise HTTPException(
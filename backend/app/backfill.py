@@ -0,0 +1,322 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.database import (
+    connect_to_mongodb,
+    connect_to_redis,
+    close_mongodb_connection,
+    close_redis_connection,
+    get_cvs_collection,
+    get_parsed_data_collection
+)
+from app.models.documents import CVDocument, DocumentStatus, DocumentType, ParsedCV
+from app.services.corpus import bump_corpus_version
+from app.services.ingestion import document_from_mongo, pipeline
+from app.services.job_queue import get_ingestion_queue
+from app.services.pipeline import PIPELINE_STAGES, StageRun, completed_fields
+from app.services.storage import INCOMING_DIR, UPLOAD_DIR, hash_file
+
+BACKFILL_DIR = Path("data/backfill")
+DEFAULT_STATUSES = [DocumentStatus.COMPLETED.value, DocumentStatus.FAILED.value]
+
+class BackfillCheckpoint:
+    """Per-shard progress: every document up to last_id has been handled."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.last_id: Optional[str] = None
+        self.processed = 0
+        self.failed: Dict[str, str] = {}
+
+    @classmethod
+    def load(cls, path: Path) -> "BackfillCheckpoint":
+        checkpoint = cls(path)
+        if path.exists():
+            data = json.loads(path.read_text())
+            checkpoint.last_id = data["last_id"]
+            checkpoint.processed = data["processed"]
+            checkpoint.failed = data["failed"]
+        return checkpoint
+
+    def save(self) -> None:
+        # Write then rename so an interrupted save never leaves a truncated checkpoint
+        temp_path = self.path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps({
+            "last_id": self.last_id,
+            "processed": self.processed,
+            "failed": self.failed
+        }))
+        os.replace(temp_path, self.path)
+
+def shard_query(plan: Dict[str, Any], shard: Dict[str, Optional[str]], after_id: Optional[str]) -> Dict[str, Any]:
+    id_range: Dict[str, ObjectId] = {}
+    if after_id:
+        id_range["$gt"] = ObjectId(after_id)
+    elif shard["start"]:
+        id_range["$gte"] = ObjectId(shard["start"])
+    if shard["end"]:
+        id_range["$lt"] = ObjectId(shard["end"])
+
+    query: Dict[str, Any] = {"status": {"$in": plan["statuses"]}}
+    if id_range:
+        query["_id"] = id_range
+    return query
+
+async def plan_shards(statuses: List[str], shards: int) -> List[Dict[str, Optional[str]]]:
+    """Split the matching documents into contiguous _id ranges of roughly equal size."""
+    cvs_collection = get_cvs_collection()
+    query = {"status": {"$in": statuses}}
+    total = await cvs_collection.count_documents(query)
+
+    edges: List[Optional[str]] = [None]
+    for i in range(1, shards):
+        boundary = await cvs_collection.find(query, {"_id": 1}).sort("_id", 1).skip(total * i // shards).limit(1).to_list(1)
+        edges.append(str(boundary[0]["_id"]) if boundary else None)
+    edges.append(None)
+
+    logger.info(f"Planned backfill of {total} documents across {shards} shards")
+    return [{"start": edges[i], "end": edges[i + 1]} for i in range(shards)]
+
+async def register_untracked_uploads() -> int:
+    """Create documents for files under data/uploads that have no record and queue them for ingestion."""
+    cvs_collection = get_cvs_collection()
+    document_ids = []
+
+    for file_path in UPLOAD_DIR.rglob("*"):
+        file_ext = file_path.suffix.lower().lstrip(".")
+        if INCOMING_DIR in file_path.parents or not file_path.is_file() or file_ext not in settings.ALLOWED_DOCUMENT_TYPES:
+            continue
+        if await cvs_collection.find_one({"file_path": str(file_path)}, {"_id": 1}):
+            continue
+
+        content_hash = await asyncio.to_thread(hash_file, str(file_path))
+        cv_document = CVDocument(
+            filename=file_path.name,
+            file_type=DocumentType.PDF if file_ext == "pdf" else DocumentType.DOCX,
+            file_size=file_path.stat().st_size,
+            file_path=str(file_path),
+            content_hash=content_hash,
+            status=DocumentStatus.PENDING
+        )
+        try:
+            result = await cvs_collection.insert_one(cv_document.model_dump(exclude={"id"}))
+        except DuplicateKeyError:
+            # The same content is already tracked under another path
+            continue
+        document_ids.append(str(result.inserted_id))
+
+    if document_ids:
+        await get_ingestion_queue().enqueue_many(document_ids)
+    logger.info(f"Registered {len(document_ids)} untracked uploads for ingestion")
+    return len(document_ids)
+
+async def reprocess_chunk(
+    documents: List[Dict[str, Any]],
+    force_stages: List[str],
+    semaphore: asyncio.Semaphore
+) -> List[Tuple[CVDocument, Optional[ParsedCV], Optional[str]]]:
+    """Rerun the stages for a chunk of documents, with NER for the whole chunk in one nlp.pipe call."""
+    runs = [pipeline.start(document_from_mongo(document), force_stages) for document in documents]
+    errors: Dict[str, str] = {}
+
+    async def advance(run: StageRun, until: Optional[str] = None):
+        if run.cv_document.id in errors:
+            return
+        async with semaphore:
+            try:
+                await pipeline.advance(run, until=until)
+            except Exception as e:
+                logger.error(f"Backfill failed for document {run.cv_document.id}: {str(e)}")
+                errors[run.cv_document.id] = str(e)
+
+    await asyncio.gather(*(advance(run, until="ner") for run in runs))
+    try:
+        await pipeline.run_ner_batch([run for run in runs if run.cv_document.id not in errors])
+    except Exception as e:
+        # Documents left without NER output run it one by one in the next step
+        logger.warning(f"Batch NER failed, falling back to per-document NER: {str(e)}")
+    await asyncio.gather(*(advance(run) for run in runs))
+
+    results = []
+    for run in runs:
+        parsed_cv = None
+        if run.cv_document.id not in errors:
+            try:
+                parsed_cv = pipeline.build_parsed_cv(run.cv_document, run.outputs)
+            except Exception as e:
+                logger.error(f"Backfill failed for document {run.cv_document.id}: {str(e)}")
+                errors[run.cv_document.id] = str(e)
+        results.append((run.cv_document, parsed_cv, errors.get(run.cv_document.id)))
+    return results
+
+async def write_results(results: List[Tuple[CVDocument, ParsedCV]]) -> None:
+    """Persist a chunk of parsed CVs with one bulk write per collection and phase."""
+    reservations, parsed_writes, completions = [], [], []
+    for cv_document, parsed_cv in results:
+        parsed_data_id = cv_document.parsed_data_id
+        if not parsed_data_id:
+            parsed_data_id = str(ObjectId())
+            reservations.append(UpdateOne({"_id": ObjectId(cv_document.id)}, {"$set": {"parsed_data_id": parsed_data_id}}))
+        parsed_writes.append(ReplaceOne(
+            {"_id": ObjectId(parsed_data_id)},
+            parsed_cv.model_dump(by_alias=True, exclude={"id"}),
+            upsert=True
+        ))
+        completions.append(UpdateOne({"_id": ObjectId(cv_document.id)}, {"$set": completed_fields(parsed_data_id)}))
+
+    if not parsed_writes:
+        return
+
+    cvs_collection = get_cvs_collection()
+    # Same order as the single-document path: reserve ids, write parsed data, then mark completed
+    if reservations:
+        await cvs_collection.bulk_write(reservations, ordered=False)
+    await get_parsed_data_collection().bulk_write(parsed_writes, ordered=False)
+    await cvs_collection.bulk_write(completions, ordered=False)
+    await bump_corpus_version("backfill")
+
+async def backfill_shard(run_dir: Path, plan: Dict[str, Any], shard_index: int, concurrency: int, batch_size: int) -> Dict[str, int]:
+    shard = plan["shards"][shard_index]
+    checkpoint = BackfillCheckpoint.load(run_dir / f"shard-{shard_index}.json")
+    semaphore = asyncio.Semaphore(concurrency)
+    cvs_collection = get_cvs_collection()
+    started = time.monotonic()
+    processed_this_run = 0
+
+    while True:
+        query = shard_query(plan, shard, checkpoint.last_id)
+        documents = await cvs_collection.find(query).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not documents:
+            break
+
+        results = await reprocess_chunk(documents, plan["stages"], semaphore)
+        await write_results([(cv_document, parsed_cv) for cv_document, parsed_cv, error in results if parsed_cv])
+
+        for cv_document, parsed_cv, error in results:
+            if error:
+                checkpoint.failed[cv_document.id] = error
+            else:
+                checkpoint.failed.pop(cv_document.id, None)
+        checkpoint.last_id = str(documents[-1]["_id"])
+        checkpoint.processed += len(documents)
+        checkpoint.save()
+
+        processed_this_run += len(documents)
+        rate = processed_this_run / (time.monotonic() - started)
+        logger.info(
+            f"Backfill shard {shard_index}: {checkpoint.processed} documents processed, "
+            f"{len(checkpoint.failed)} failed, {rate:.1f} documents/s"
+        )
+
+    return {"processed": checkpoint.processed, "failed": len(checkpoint.failed)}
+
+async def _run_shard(run_dir: Path, plan: Dict[str, Any], shard_index: int, concurrency: int, batch_size: int) -> Dict[str, int]:
+    if not await connect_to_mongodb():
+        raise RuntimeError("MongoDB connection is not established")
+    # Only needed to bump the corpus version, so cached query answers are not served over rewritten CVs
+    if not await connect_to_redis():
+        logger.warning("Redis connection is not established; cached query answers will expire by TTL only")
+    try:
+        return await backfill_shard(run_dir, plan, shard_index, concurrency, batch_size)
+    finally:
+        await close_mongodb_connection()
+        await close_redis_connection()
+
+def run_shard_process(run_dir: Path, plan: Dict[str, Any], shard_index: int, concurrency: int, batch_size: int) -> Dict[str, int]:
+    return asyncio.run(_run_shard(run_dir, plan, shard_index, concurrency, batch_size))
+
+async def prepare_run(args: argparse.Namespace, run_dir: Path) -> Dict[str, Any]:
+    """Load the run's plan, or create it; resuming reuses the stored shard ranges and stages."""
+    plan_path = run_dir / "plan.json"
+    if plan_path.exists() and not args.restart:
+        plan = json.loads(plan_path.read_text())
+        if args.stages is not None and sorted(args.stages) != sorted(plan["stages"]):
+            raise SystemExit(f"Backfill '{args.name}' was started with stages {plan['stages']}; use --restart to start over")
+        logger.info(f"Resuming backfill '{args.name}'")
+        return plan
+
+    if not await connect_to_mongodb():
+        raise SystemExit("MongoDB connection is not established")
+    try:
+        if args.register_untracked:
+            if not await connect_to_redis():
+                raise SystemExit("Redis connection is not established")
+            await register_untracked_uploads()
+            await close_redis_connection()
+
+        plan = {
+            "stages": args.stages or [],
+            "statuses": args.statuses,
+            "shards": await plan_shards(args.statuses, args.processes)
+        }
+    finally:
+        await close_mongodb_connection()
+
+    for checkpoint_path in run_dir.glob("shard-*.json"):
+        checkpoint_path.unlink()
+    plan_path.write_text(json.dumps(plan, indent=2))
+    return plan
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-run pipeline stages over stored CVs")
+    parser.add_argument(
+        "--stages",
+        nargs="+",
+        choices=PIPELINE_STAGES[:-1],
+        help="Stages to force (their dependents re-run too); by default only stages whose version changed are recomputed"
+    )
+    parser.add_argument(
+        "--statuses",
+        nargs="+",
+        default=DEFAULT_STATUSES,
+        choices=[s.value for s in DocumentStatus],
+        help="Document statuses to include"
+    )
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes, each owning a shard of the corpus")
+    parser.add_argument("--concurrency", type=int, default=4, help="Documents processed concurrently per process")
+    parser.add_argument("--batch-size", type=int, default=100, help="Documents per bulk write and checkpoint")
+    parser.add_argument("--name", default="backfill", help="Run name; rerunning with the same name resumes it")
+    parser.add_argument("--restart", action="store_true", help="Discard the run's checkpoints and start over")
+    parser.add_argument(
+        "--register-untracked",
+        action="store_true",
+        help="Also create and queue documents for files in data/uploads that have no record"
+    )
+    args = parser.parse_args()
+
+    run_dir = BACKFILL_DIR / args.name
+    run_dir.mkdir(parents=True, exist_ok=True)
+    plan = asyncio.run(prepare_run(args, run_dir))
+    shard_count = len(plan["shards"])
+
+    if shard_count == 1:
+        results = [run_shard_process(run_dir, plan, 0, args.concurrency, args.batch_size)]
+    else:
+        with ProcessPoolExecutor(max_workers=shard_count, mp_context=get_context("spawn")) as executor:
+            futures = [
+                executor.submit(run_shard_process, run_dir, plan, i, args.concurrency, args.batch_size)
+                for i in range(shard_count)
+            ]
+            results = [future.result() for future in futures]
+
+    processed = sum(result["processed"] for result in results)
+    failed = sum(result["failed"] for result in results)
+    logger.info(f"Backfill '{args.name}' finished: {processed} documents processed, {failed} failed")
+    if failed:
+        logger.info(f"Failed document ids are listed in {run_dir}/shard-*.json")
+
+if __name__ == "__main__":
+    main()
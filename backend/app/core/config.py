@@ -16,6 +16,8 @@ class Settings(BaseSettings):
     MIN_CONNECTIONS_COUNT: int = 1
     CV_COLLECTION_NAME: str = "cv_documents"
     PARSED_DATA_COLLECTION_NAME: str = "parsed_cvs"
+    ARTIFACT_COLLECTION_NAME: str = "cv_artifacts"
+    BATCH_COLLECTION_NAME: str = "upload_batches"
     
     REDIS_URL: str
     REDIS_HOST: str = "cv-analysis-redis"
@@ -24,6 +26,78 @@ class Settings(BaseSettings):
     
     MAX_DOCUMENT_SIZE_MB: int = 10
     ALLOWED_DOCUMENT_TYPES: List[str] = ["pdf", "docx"]
+    BATCH_MAX_FILES: int = 500
+    BATCH_MAX_UPLOAD_MB: int = 1024
+    BATCH_STORE_CONCURRENCY: int = 8
+    
+    INGESTION_QUEUE_NAME: str = "ingestion"
+    INGESTION_WORKER_CONCURRENCY: int = 2
+    INGESTION_VISIBILITY_TIMEOUT_SECONDS: int = 600
+    INGESTION_MAX_ATTEMPTS: int = 3
+    INGESTION_RETRY_BACKOFF_SECONDS: int = 30
+    INGESTION_POLL_INTERVAL_SECONDS: float = 1.0
+    INGESTION_SWEEP_INTERVAL_SECONDS: int = 60
+    
+    MODEL_WARMUP_ON_STARTUP: bool = True
+    
+    NER_BATCH_SIZE: int = 32
+    NER_PROCESSES: int = 1
+    
+    DOCX_EXTRACTOR: str = "streaming"  # "streaming" or "python-docx"
+    
+    LLM_BACKEND: str = "anthropic"  # "anthropic" or "fake"
+    LLM_MODEL: str = "claude-3-haiku-20240307"
+    LLM_FAKE_RECORDINGS_PATH: Optional[str] = None
+    LLM_FAKE_MEDIAN_LATENCY_MS: float = 800.0
+    LLM_FAKE_LATENCY_SIGMA: float = 0.5
+    LLM_FAKE_TOKENS_PER_SECOND: float = 120.0
+    LLM_FAKE_SEED: int = 0
+    
+    LLM_MAX_CONCURRENCY: int = 4
+    LLM_REQUEST_TIMEOUT_SECONDS: float = 60.0
+    LLM_MAX_ATTEMPTS: int = 3
+    LLM_STRUCTURE_DEADLINE_SECONDS: float = 180.0
+    LLM_QUERY_DEADLINE_SECONDS: float = 30.0
+    LLM_BREAKER_FAILURE_RATE: float = 0.5
+    LLM_BREAKER_MINIMUM_CALLS: int = 10
+    LLM_BREAKER_WINDOW_SECONDS: float = 60.0
+    LLM_BREAKER_OPEN_SECONDS: float = 30.0
+    LLM_REQUESTS_PER_MINUTE: int = 50
+    LLM_TOKENS_PER_MINUTE: int = 50000
+    
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL_SECONDS: int = 30 * 24 * 3600
+    LLM_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    
+    QUERY_TOP_K: int = 20
+    QUERY_CONTEXT_TOKEN_BUDGET: int = 8000
+    QUERY_RAW_TEXT_PREVIEW_CHARS: int = 1500
+    QUERY_MAP_SHARD_TOKEN_BUDGET: int = 6000
+    QUERY_MAP_MAX_TOKENS: int = 600
+    QUERY_MAP_CONCURRENCY: int = 4
+    QUERY_MAP_REDUCE_DEADLINE_SECONDS: float = 120.0
+    
+    QUERY_CACHE_ENABLED: bool = True
+    QUERY_CACHE_TTL_SECONDS: int = 24 * 3600
+    QUERY_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.9
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 512
+    SEMANTIC_CACHE_TTL_SECONDS: int = 3600
+    
+    SESSION_TTL_SECONDS: int = 24 * 3600
+    SESSION_MAX_TURNS: int = 6
+    SESSION_TURN_MAX_CHARS: int = 2000
+    SESSION_SUMMARY_MAX_TOKENS: int = 300
+    
+    OCR_WORKERS: int = 0
+    OCR_PAGE_TIMEOUT_SECONDS: int = 120
+    OCR_RASTER_DPI: int = 300
+    OCR_RASTER_WINDOW_PAGES: int = 4
+    OCR_PAGE_MIN_CHARS: int = 100
+    OCR_PAGE_MIN_TEXT_QUALITY: float = 0.8
+    OCR_MIN_CONFIDENCE: float = 70.0
+    OCR_TARGET_TEXT_HEIGHT: int = 30
     
     LOG_LEVEL: str = "INFO"
     ENABLE_TRACING: bool = False
@@ -51,6 +51,8 @@ async def connect_to_mongodb() -> bool:
         
         mongodb_connected = True
         logger.info("Successfully established MongoDB connection")
+        
+        await ensure_indexes()
         return True
     
     except Exception as e:
@@ -58,6 +60,23 @@ async def connect_to_mongodb() -> bool:
         mongodb_connected = False
         return False
 
+async def ensure_indexes():
+
+    try:
+        cvs_collection = mongodb_client[settings.MONGODB_NAME][settings.CV_COLLECTION_NAME]
+        # Partial so that documents uploaded before content hashing don't collide on null
+        await cvs_collection.create_index(
+            "content_hash",
+            name="content_hash_unique",
+            unique=True,
+            partialFilterExpression={"content_hash": {"$type": "string"}}
+        )
+        artifacts_collection = mongodb_client[settings.MONGODB_NAME][settings.ARTIFACT_COLLECTION_NAME]
+        await artifacts_collection.create_index([("input_key", 1), ("stage", 1)], name="input_stage")
+        logger.info("MongoDB indexes ensured")
+    except Exception as e:
+        logger.error(f"Failed to ensure MongoDB indexes: {str(e)}")
+
 async def connect_to_redis() -> bool:
 
     global redis_client, redis_connected
@@ -130,4 +149,19 @@ def get_cvs_collection():
 def get_parsed_data_collection():
     if not mongodb_client or not mongodb_connected:
         raise Exception("MongoDB connection is not established. Please check system logs.")
-    return mongodb_client[settings.MONGODB_NAME][settings.PARSED_DATA_COLLECTION_NAME]
\ No newline at end of file
+    return mongodb_client[settings.MONGODB_NAME][settings.PARSED_DATA_COLLECTION_NAME]
+
+def get_artifacts_collection():
+    if not mongodb_client or not mongodb_connected:
+        raise Exception("MongoDB connection is not established. Please check system logs.")
+    return mongodb_client[settings.MONGODB_NAME][settings.ARTIFACT_COLLECTION_NAME]
+
+def get_batches_collection():
+    if not mongodb_client or not mongodb_connected:
+        raise Exception("MongoDB connection is not established. Please check system logs.")
+    return mongodb_client[settings.MONGODB_NAME][settings.BATCH_COLLECTION_NAME]
+
+def get_redis_client() -> Redis:
+    if not redis_client or not redis_connected:
+        raise Exception("Redis connection is not established. Please check system logs.")
+    return redis_client
@@ -0,0 +1,62 @@
+from typing import Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+# Multipart overhead allowance on top of the document itself
+UPLOAD_ENVELOPE_BYTES = 64 * 1024
+
+def upload_limit(path: str) -> Optional[Tuple[int, str]]:
+    """Maximum request body in bytes for an upload route, with the message sent when it is exceeded."""
+    if path == f"{settings.API_V1_STR}/documents/upload":
+        return (
+            settings.MAX_DOCUMENT_SIZE_MB * 1024 * 1024 + UPLOAD_ENVELOPE_BYTES,
+            f"File too large. Maximum size: {settings.MAX_DOCUMENT_SIZE_MB}MB"
+        )
+    if path == f"{settings.API_V1_STR}/documents/batch":
+        return (
+            settings.BATCH_MAX_UPLOAD_MB * 1024 * 1024 + UPLOAD_ENVELOPE_BYTES,
+            f"Batch too large. Maximum size: {settings.BATCH_MAX_UPLOAD_MB}MB"
+        )
+    return None
+
+class UploadSizeLimitMiddleware:
+    """Answers 413 to upload requests whose body is over the route's limit.
+
+    A Content-Length over the limit is refused before any of the body is read. Chunked or
+    under-declared bodies are counted as they are received, so parsing stops at the limit
+    instead of after the whole body has been spooled to disk.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limit = upload_limit(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        max_size, detail = limit
+
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > max_size:
+            await JSONResponse(status_code=413, content={"detail": detail})(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_size:
+                    # Raised inside body parsing, which passes HTTPException through to the 413 handler
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
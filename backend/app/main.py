@@ -8,6 +8,7 @@ from prometheus_fastapi_instrumentator import Instrumentator
 from app.api.api import api_router
 from app.core.config import settings
 from app.core.logging import logger
+from app.core.upload_limits import UploadSizeLimitMiddleware
 from app.core.database import (
     connect_to_mongodb, 
     connect_to_redis, 
@@ -15,6 +16,9 @@ from app.core.database import (
     close_redis_connection,
     maintain_database_connections
 )
+from app.services.job_queue import get_ingestion_queue, monitor_queue_depth
+from app.services.model_registry import get_model_registry
+from app.services.ocr import get_ocr_engine
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -28,6 +32,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(UploadSizeLimitMiddleware)
 
 Instrumentator().instrument(app).expose(app)
 
@@ -50,6 +55,11 @@ async def startup_event():
         await connect_to_redis()
         
         asyncio.create_task(maintain_database_connections())
+        asyncio.create_task(monitor_queue_depth(get_ingestion_queue()))
+        
+        if settings.MODEL_WARMUP_ON_STARTUP:
+            # Readiness (/health/ready) flips once warm-up completes
+            asyncio.create_task(get_model_registry().warm_up())
         
         logger.info(f"{settings.PROJECT_NAME} started with initial database connections")
     except Exception as e:
@@ -63,6 +73,7 @@ async def shutdown_event():
     try:
         await close_mongodb_connection()
         await close_redis_connection()
+        get_ocr_engine().shutdown()
     except Exception as e:
         logger.error(f"Error during shutdown: {str(e)}")
 
@@ -13,6 +13,10 @@ class DocumentType(str, Enum):
     PDF = "pdf"
     DOCX = "docx"
 
+class QueryMode(str, Enum):
+    FOCUSED = "focused"
+    MAP_REDUCE = "map_reduce"
+
 class PersonalInfo(BaseModel):
     name: Optional[str] = None
     email: Optional[str] = None
@@ -80,8 +84,36 @@ class CVDocument(BaseModel):
     error_message: Optional[str] = None
     file_size: int
     file_path: str
+    content_hash: Optional[str] = None
     parsed_data_id: Optional[str] = None
+    force_stages: List[str] = []
+    batch_id: Optional[str] = None
+
+class UploadBatch(BaseModel):
+    id: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    document_ids: List[str] = []
+    duplicate_ids: List[str] = []
+    rejected: List[Dict[str, str]] = []
 
 class CVQuery(BaseModel):
     query: str
-    context: Optional[str] = None
\ No newline at end of file
+    context: Optional[str] = None
+    # map_reduce reads every CV instead of the most relevant ones, for questions like "rank all candidates by ..."
+    mode: QueryMode = QueryMode.FOCUSED
+    # Server-side conversation; when set, context is ignored in favour of the stored history
+    session_id: Optional[str] = Field(default=None, max_length=128)
+
+class ConversationTurn(BaseModel):
+    question: str
+    answer: str
+
+class ConversationSession(BaseModel):
+    id: str
+    summary: str = ""
+    turns: List[ConversationTurn] = []
+    # Candidates the conversation is about, in relevance order, valid for corpus_version
+    candidate_ids: List[str] = []
+    corpus_version: Optional[int] = None
+    corpus_size: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
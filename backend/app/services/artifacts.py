@@ -0,0 +1,44 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+from app.core.database import get_artifacts_collection
+from app.core.logging import logger
+
+class ArtifactStore:
+    """Keyed store for intermediate pipeline outputs, stamped with the version of the stage that produced them."""
+
+    @staticmethod
+    def _artifact_id(input_key: str, stage: str, version: str) -> str:
+        return f"{input_key}:{stage}:{version}"
+
+    async def get(self, input_key: str, stage: str, version: str) -> Optional[Dict[str, Any]]:
+        artifacts_collection = get_artifacts_collection()
+        artifact = await artifacts_collection.find_one({"_id": self._artifact_id(input_key, stage, version)})
+        return artifact["data"] if artifact else None
+
+    async def put(self, input_key: str, stage: str, version: str, data: Dict[str, Any]) -> None:
+        artifacts_collection = get_artifacts_collection()
+        await artifacts_collection.replace_one(
+            {"_id": self._artifact_id(input_key, stage, version)},
+            {
+                "input_key": input_key,
+                "stage": stage,
+                "version": version,
+                "data": data,
+                "created_at": datetime.utcnow()
+            },
+            upsert=True
+        )
+
+    async def invalidate(self, input_key: str, stages: Iterable[str]) -> int:
+        """Drop every stored version of the given stages for an input."""
+        artifacts_collection = get_artifacts_collection()
+        result = await artifacts_collection.delete_many({"input_key": input_key, "stage": {"$in": list(stages)}})
+        if result.deleted_count:
+            logger.info(f"Invalidated {result.deleted_count} artifacts for {input_key}")
+        return result.deleted_count
+
+artifact_store = ArtifactStore()
+
+def get_artifact_store() -> ArtifactStore:
+    return artifact_store
@@ -0,0 +1,207 @@
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+from prometheus_client import Gauge
+
+from app.core.config import settings
+from app.core.logging import logger
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+CIRCUIT_STATE = Gauge(
+    "cv_circuit_breaker_state",
+    "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ["name"]
+)
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+class DeadlineExceeded(Exception):
+    pass
+
+class CircuitBreaker:
+    """Per-process breaker over an upstream dependency.
+
+    Opens once the failure rate over a sliding window crosses the threshold (given a minimum number
+    of calls), fails fast while open, then lets a limited number of probe calls through; a
+    successful probe closes it again and a failed one re-opens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = settings.LLM_BREAKER_FAILURE_RATE,
+        minimum_calls: int = settings.LLM_BREAKER_MINIMUM_CALLS,
+        window_seconds: float = settings.LLM_BREAKER_WINDOW_SECONDS,
+        open_seconds: float = settings.LLM_BREAKER_OPEN_SECONDS,
+        half_open_max_calls: int = 1
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = CLOSED
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        CIRCUIT_STATE.labels(name=name).set(STATE_VALUES[CLOSED])
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        logger.warning(f"Circuit '{self.name}' {self.state} -> {state}")
+        self.state = state
+        CIRCUIT_STATE.labels(name=self.name).set(STATE_VALUES[state])
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if state == CLOSED:
+            self._outcomes.clear()
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    def reject_if_open(self) -> None:
+        """Fail fast while open, before a caller queues for rate limits; unlike before_call it takes no probe slot."""
+        if self.state == OPEN and self.retry_after() > 0:
+            raise CircuitOpenError(self.name, self.retry_after())
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if the call must not go upstream."""
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                raise CircuitOpenError(self.name, self.retry_after())
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_max_calls:
+                raise CircuitOpenError(self.name, self.open_seconds)
+            self._probes_in_flight += 1
+
+    def record(self, success: bool) -> None:
+        if self.state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            self._transition(CLOSED if success else OPEN)
+            return
+
+        now = time.monotonic()
+        self._outcomes.append((now, success))
+        while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+            self._outcomes.popleft()
+
+        failures = sum(1 for _, ok in self._outcomes if not ok)
+        if len(self._outcomes) >= self.minimum_calls and failures / len(self._outcomes) >= self.failure_rate_threshold:
+            self._transition(OPEN)
+
+    @asynccontextmanager
+    async def protect(self, is_failure: Callable[[Exception], bool] = lambda e: True) -> AsyncIterator[None]:
+        """Guard an upstream call; exceptions for which is_failure is false (e.g. bad requests) don't count against the upstream.
+
+        Inside call_with_retries the call is bounded by the remaining deadline. Enter this only once the
+        request is about to be sent, so time spent queueing for rate limits never counts as a failure.
+        """
+        deadline = _current_deadline.get()
+        if deadline is not None and deadline.remaining() <= 0:
+            raise DeadlineExceeded("Deadline exceeded before the call was sent")
+        self.before_call()
+        try:
+            async with asyncio.timeout(deadline.remaining() if deadline is not None else None):
+                yield
+        except asyncio.TimeoutError:
+            # The deadline ran out while the upstream was working on the call; a hung upstream has to open the circuit
+            self.record(False)
+            raise
+        except Exception as e:
+            if is_failure(e):
+                self.record(False)
+            elif self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            raise
+        except BaseException:
+            # Cancelled calls say nothing about the upstream
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            raise
+        self.record(True)
+
+    def snapshot(self) -> Dict[str, object]:
+        failures = sum(1 for _, ok in self._outcomes if not ok)
+        return {
+            "state": self.state,
+            "recent_calls": len(self._outcomes),
+            "recent_failures": failures,
+            "retry_after_seconds": round(self.retry_after(), 1) if self.state == OPEN else 0
+        }
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+# Deadline of the call_with_retries attempt in progress, so rate limit waits and protect can bound
+# their own part of the call without a timeout around the whole attempt
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+async def call_with_retries(
+    operation: Callable[[], Awaitable[T]],
+    deadline: Deadline,
+    max_attempts: int = settings.LLM_MAX_ATTEMPTS,
+    base_delay: float = 1.0,
+    max_delay: float = 8.0,
+    is_retryable: Callable[[Exception], bool] = lambda e: True
+) -> T:
+    """Retry with jittered exponential backoff, but never past the deadline.
+
+    An open circuit fails immediately, and a retry is abandoned when its backoff would not leave
+    time for the attempt, so callers shed load instead of queueing doomed calls. The deadline is
+    enforced by the rate limiter wait and by protect (see current_deadline), not around the whole
+    attempt, so only time spent upstream can count against the circuit.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        if deadline.remaining() <= 0:
+            raise DeadlineExceeded(f"Deadline exceeded after {attempt - 1} attempts")
+        token = _current_deadline.set(deadline)
+        try:
+            return await operation()
+        except (CircuitOpenError, DeadlineExceeded):
+            raise
+        except asyncio.TimeoutError as e:
+            raise DeadlineExceeded(f"Deadline exceeded during attempt {attempt}") from e
+        except Exception as e:
+            if attempt >= max_attempts or not is_retryable(e):
+                raise
+            delay = min(max_delay, base_delay * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+            delay = max(delay, getattr(e, "retry_after", None) or 0)
+            if delay >= deadline.remaining():
+                raise
+            logger.warning(f"Attempt {attempt} failed ({str(e)}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        finally:
+            _current_deadline.reset(token)
+
+llm_breaker = CircuitBreaker("llm")
+
+def get_llm_breaker() -> CircuitBreaker:
+    return llm_breaker
@@ -0,0 +1,32 @@
+from typing import Optional
+
+from prometheus_client import Counter
+
+from app.core.database import get_redis_client
+from app.core.logging import logger
+
+CORPUS_VERSION_KEY = "corpus:version"
+
+CORPUS_CHANGES = Counter(
+    "cv_corpus_version_bumps_total",
+    "Corpus version bumps by reason",
+    ["reason"]
+)
+
+async def get_corpus_version() -> Optional[int]:
+    """Current version of the queryable CV set, or None if Redis is unavailable (callers then skip caching)."""
+    try:
+        return int(await get_redis_client().get(CORPUS_VERSION_KEY) or 0)
+    except Exception as e:
+        logger.warning(f"Failed to read corpus version: {str(e)}")
+        return None
+
+async def bump_corpus_version(reason: str) -> Optional[int]:
+    """Mark the parsed CV set as changed so answers computed over the old set stop being served."""
+    try:
+        version = await get_redis_client().incr(CORPUS_VERSION_KEY)
+        CORPUS_CHANGES.labels(reason=reason).inc()
+        return version
+    except Exception as e:
+        logger.warning(f"Failed to bump corpus version ({reason}): {str(e)}")
+        return None
@@ -1,40 +1,26 @@
-import os
+import asyncio
 import re
-from typing import Dict, List, Optional, Tuple
-import pytesseract
-from pdf2image import convert_from_path
+from typing import Dict, List, Optional
 from pypdf import PdfReader
 import docx
-import spacy
-from PIL import Image
-import cv2
-import numpy as np
 import traceback
 
+from app.core.config import settings
 from app.core.logging import logger
 from app.models.documents import (
     CVDocument, DocumentStatus, DocumentType, ParsedCV, 
     PersonalInfo, Education, WorkExperience, 
     Skill, Project, Certification
 )
-from app.services.llm_service import LLMService
+from app.services.docx_extractor import extract_docx_text
+from app.services.ner import recognize_entities, recognize_entities_batch
+from app.services.ocr import get_ocr_engine
 
-nlp = None
-
-def get_nlp_model():
-    global nlp
-    if nlp is None:
-        try:
-            nlp = spacy.load("en_core_web_sm")
-        except:
-            spacy.cli.download("en_core_web_sm")
-            nlp = spacy.load("en_core_web_sm")
-    return nlp
+# Bump when a change to text extraction should invalidate stored extraction artifacts
+EXTRACTION_VERSION = "2"
+NER_VERSION = "1"
 
 class DocumentProcessor:
-    def __init__(self):
-        self.llm_service = LLMService()
-    
     @staticmethod
     def _preprocess_text(text: str) -> str:
         text = text.replace('\u2022', '-')  # Replace bullet points
@@ -43,113 +29,105 @@ class DocumentProcessor:
         return text
 
     @staticmethod
-    def _enhance_image_for_ocr(image):
-        try:
-            img_np = np.array(image)
-            
-            gray = cv2.cvtColor(img_np, cv2.COLOR_RGB2GRAY)
-            
-            thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                                          cv2.THRESH_BINARY, 21, 11)
-            
-            denoised = cv2.fastNlMeansDenoising(thresh, None, 10, 7, 21)
-            
-            kernel = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]])
-            sharpened = cv2.filter2D(denoised, -1, kernel)
-            
-            kernel = np.ones((1, 1), np.uint8)
-            dilated = cv2.dilate(sharpened, kernel, iterations=1)
-            
-            return Image.fromarray(dilated)
-        except Exception as e:
-            logger.error(f"Image enhancement failed: {str(e)}\n{traceback.format_exc()}")
-            return image
+    def _extract_text_layer(file_path: str) -> List[str]:
+        logger.info("Attempting direct text extraction with PdfReader")
+        reader = PdfReader(file_path)
+        logger.info(f"PDF has {len(reader.pages)} pages")
+        
+        page_texts = []
+        for i, page in enumerate(reader.pages):
+            page_text = page.extract_text() or ""
+            page_texts.append(page_text)
+            logger.info(f"Page {i+1}: Extracted {len(page_text)} characters")
+        
+        return page_texts
+    
+    @staticmethod
+    def _has_usable_text_layer(page_text: str) -> bool:
+        """Decide whether a page's embedded text is good enough to skip OCR."""
+        stripped = page_text.strip()
+        if len(stripped) < settings.OCR_PAGE_MIN_CHARS:
+            return False
+        
+        # Fonts without a unicode map come out as "(cid:NN)" runs or symbol soup
+        cleaned = re.sub(r'\(cid:\d+\)', '', stripped)
+        readable = len(re.findall(r'[\w\s.,;:()@&/+\-\'"]', cleaned))
+        return readable / len(stripped) >= settings.OCR_PAGE_MIN_TEXT_QUALITY
     
     @staticmethod
-    def _extract_text_from_pdf(file_path: str) -> str:
+    async def _extract_text_from_pdf(file_path: str) -> str:
         logger.info(f"Starting text extraction from PDF: {file_path}")
         
-        direct_extraction_text = ""
+        page_texts: Optional[List[str]] = None
         try:
-            logger.info("Attempting direct text extraction with PdfReader")
-            reader = PdfReader(file_path)
-            logger.info(f"PDF has {len(reader.pages)} pages")
-            
-            page_texts = []
-            for i, page in enumerate(reader.pages):
-                page_text = page.extract_text() or ""
-                page_texts.append(page_text)
-                logger.info(f"Page {i+1}: Extracted {len(page_text)} characters")
-            
-            direct_extraction_text = "\n\n".join(page_texts)
-            text_length = len(direct_extraction_text.strip())
-            logger.info(f"Direct extraction yielded {text_length} characters")
-            
-            if text_length > 200: 
-                logger.info("Direct extraction successful, returning text")
-                return DocumentProcessor._preprocess_text(direct_extraction_text)
+            page_texts = await asyncio.to_thread(DocumentProcessor._extract_text_layer, file_path)
+            pages_to_ocr = [
+                page_number for page_number, page_text in enumerate(page_texts, start=1)
+                if not DocumentProcessor._has_usable_text_layer(page_text)
+            ]
+            
+            if not pages_to_ocr:
+                logger.info("All pages have a usable text layer, skipping OCR")
+                return DocumentProcessor._preprocess_text("\n\n".join(page_texts))
                 
-            logger.info(f"PDF text extraction returned limited content ({text_length} chars), falling back to OCR")
+            logger.info(f"{len(pages_to_ocr)} of {len(page_texts)} pages lack a usable text layer, OCRing pages {pages_to_ocr}")
         except Exception as e:
-            logger.warning(f"Error extracting text with PyPDF: {str(e)}\n{traceback.format_exc()}")
+            logger.warning(f"Error extracting text with PyPDF, OCRing all pages: {str(e)}\n{traceback.format_exc()}")
+            pages_to_ocr = None
         
+        ocr_texts: Dict[int, str] = {}
         try:
             logger.info("Starting OCR extraction process")
-            logger.info(f"Converting PDF to images with DPI=300")
-            images = convert_from_path(file_path, dpi=300, thread_count=os.cpu_count() or 4)
-            logger.info(f"Converted PDF to {len(images)} images")
-            
-            extracted_text = []
-            for i, img in enumerate(images):
-                logger.info(f"Processing image {i+1}/{len(images)}")
-                
-                logger.info(f"Image size: {img.size}, mode: {img.mode}")
-                
-                logger.info("Enhancing image for OCR")
-                enhanced_img = DocumentProcessor._enhance_image_for_ocr(img)
-                
-                logger.info("Applying OCR with pytesseract")
-                page_text = pytesseract.image_to_string(
-                    enhanced_img, 
-                    config='--psm 6 --oem 3 -l eng+osd'
-                )
-                
-                logger.info(f"OCR extracted {len(page_text)} characters from image {i+1}")
-                extracted_text.append(page_text)
-            
-            ocr_text = "\n\n".join(extracted_text)
-            ocr_text_length = len(ocr_text)
-            logger.info(f"OCR extraction complete, yielded {ocr_text_length} characters")
-            
-            if ocr_text_length < len(direct_extraction_text.strip()) and len(direct_extraction_text.strip()) > 0:
-                logger.info("Direct extraction yielded more text than OCR, using direct extraction")
-                return DocumentProcessor._preprocess_text(direct_extraction_text)
-            
-            return DocumentProcessor._preprocess_text(ocr_text)
+            ocr_texts = await get_ocr_engine().ocr_pdf(file_path, pages=pages_to_ocr)
+            logger.info(f"OCR extraction complete, yielded {sum(len(text) for text in ocr_texts.values())} characters")
         except Exception as e:
             logger.error(f"OCR extraction failed: {str(e)}\n{traceback.format_exc()}")
-            if direct_extraction_text:
-                logger.info("Falling back to direct extraction result despite limited content")
-                return DocumentProcessor._preprocess_text(direct_extraction_text)
-            return ""
+        
+        if page_texts is None:
+            return DocumentProcessor._preprocess_text("\n\n".join(ocr_texts[page] for page in sorted(ocr_texts)))
+        
+        merged_pages = []
+        for page_number, layer_text in enumerate(page_texts, start=1):
+            ocr_text = ocr_texts.get(page_number, "")
+            # Keep whichever source recovered more of the page
+            merged_pages.append(ocr_text if len(ocr_text.strip()) > len(layer_text.strip()) else layer_text)
+        
+        return DocumentProcessor._preprocess_text("\n\n".join(merged_pages))
     
     @staticmethod
     def _extract_text_from_docx(file_path: str) -> str:
+        if settings.DOCX_EXTRACTOR == "python-docx":
+            return DocumentProcessor._extract_text_from_docx_python_docx(file_path)
+        return DocumentProcessor._extract_text_from_docx_streaming(file_path)
+    
+    @staticmethod
+    def _extract_text_from_docx_streaming(file_path: str) -> str:
+        logger.info(f"Starting streaming text extraction from DOCX: {file_path}")
+        try:
+            text = extract_docx_text(file_path)
+            logger.info(f"DOCX extraction complete, yielded {len(text)} characters")
+            return DocumentProcessor._preprocess_text(text)
+        except Exception as e:
+            logger.error(f"Error extracting text from DOCX: {str(e)}\n{traceback.format_exc()}")
+            return ""
+    
+    @staticmethod
+    def _extract_text_from_docx_python_docx(file_path: str) -> str:
         logger.info(f"Starting text extraction from DOCX: {file_path}")
         try:
             doc = docx.Document(file_path)
             
             paragraphs = []
             
-            logger.info(f"Document has {len(doc.paragraphs)} paragraphs")
+            logger.debug(f"Document has {len(doc.paragraphs)} paragraphs")
             for i, para in enumerate(doc.paragraphs):
                 if para.text.strip():
                     paragraphs.append(para.text)
-                    logger.info(f"Paragraph {i+1}: {len(para.text)} characters")
+                    logger.debug(f"Paragraph {i+1}: {len(para.text)} characters")
             
-            logger.info(f"Document has {len(doc.tables)} tables")
+            logger.debug(f"Document has {len(doc.tables)} tables")
             for i, table in enumerate(doc.tables):
-                logger.info(f"Table {i+1} has {len(table.rows)} rows")
+                logger.debug(f"Table {i+1} has {len(table.rows)} rows")
                 for row in table.rows:
                     row_text = " | ".join(cell.text for cell in row.cells if cell.text.strip())
                     if row_text:
@@ -163,46 +141,32 @@ class DocumentProcessor:
             return ""
             
     @staticmethod
-    async def process_document(cv_document: CVDocument) -> Tuple[ParsedCV, Optional[str]]:
-        """Process a document with improved LLM-based parsing."""
-        logger.info(f"Processing document: {cv_document.file_path}, type: {cv_document.file_type}")
-        try:
-            processor = DocumentProcessor()
-            
-            raw_text = ""
-            if cv_document.file_type == DocumentType.PDF:
-                raw_text = DocumentProcessor._extract_text_from_pdf(cv_document.file_path)
-            else:
-                raw_text = DocumentProcessor._extract_text_from_docx(cv_document.file_path)
-            
-            logger.info(f"Extracted {len(raw_text)} characters from document")
-            
-            if not raw_text:
-                logger.error("Failed to extract any text from document")
-                return ParsedCV(raw_text=""), "Failed to extract text from document"
-            
-            # Initialize parsed CV with raw text
-            parsed_cv = ParsedCV(raw_text=raw_text)
-            
-            # Extract basic information using NER for initial classification
-            logger.info("Extracting basic information using NER")
-            nlp_model = get_nlp_model()
-            doc = nlp_model(raw_text[:5000])  # Process only first 5000 chars for efficiency
-            
-            # Extract personal info using traditional methods as fallback
-            logger.info("Extracting personal info")
-            parsed_cv.personal_info = DocumentProcessor._extract_personal_info(raw_text, doc)
-            
-            # Let LLM handle the complete parsing for all sections
-            logger.info("Enhancing CV with LLM")
-            enhanced_cv = await processor.llm_service.enhance_cv(parsed_cv)
-            
-            logger.info("Document processing complete")
-            return enhanced_cv, None
-        except Exception as e:
-            error_message = f"Error processing document: {str(e)}"
-            logger.error(f"{error_message}\n{traceback.format_exc()}")
-            return ParsedCV(raw_text=raw_text if 'raw_text' in locals() else ""), error_message
+    async def extract_text(cv_document: CVDocument) -> str:
+        logger.info(f"Extracting text from document: {cv_document.file_path}, type: {cv_document.file_type}")
+        if cv_document.file_type == DocumentType.PDF:
+            raw_text = await DocumentProcessor._extract_text_from_pdf(cv_document.file_path)
+        else:
+            raw_text = await asyncio.to_thread(DocumentProcessor._extract_text_from_docx, cv_document.file_path)
+        
+        logger.info(f"Extracted {len(raw_text)} characters from document")
+        return raw_text
+    
+    @staticmethod
+    async def extract_personal_info(raw_text: str) -> PersonalInfo:
+        """Extract basic personal information with NER and patterns, used to backfill the LLM result."""
+        logger.info("Extracting basic information using NER")
+        doc = await recognize_entities(raw_text)
+        return DocumentProcessor._extract_personal_info(raw_text, doc)
+    
+    @staticmethod
+    async def extract_personal_info_batch(
+        raw_texts: List[str],
+        batch_size: Optional[int] = None,
+        n_process: Optional[int] = None
+    ) -> List[PersonalInfo]:
+        """Bulk variant of extract_personal_info for backfills and batch ingestion."""
+        docs = await asyncio.to_thread(recognize_entities_batch, raw_texts, batch_size, n_process)
+        return [DocumentProcessor._extract_personal_info(text, doc) for text, doc in zip(raw_texts, docs)]
         
     @staticmethod
     def _extract_personal_info(text: str, doc) -> PersonalInfo:
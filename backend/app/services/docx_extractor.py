@@ -0,0 +1,96 @@
+import zipfile
+from typing import Dict, Iterator, List, Optional
+from xml.etree.ElementTree import iterparse
+
+DOCUMENT_PART = "word/document.xml"
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+# Text boxes are written twice, as a DrawingML choice and a VML fallback; only the choice is read
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+PARAGRAPH = f"{WORD_NS}p"
+RUN = f"{WORD_NS}r"
+TEXT = f"{WORD_NS}t"
+TAB = f"{WORD_NS}tab"
+BREAKS = {f"{WORD_NS}br", f"{WORD_NS}cr"}
+TABLE = f"{WORD_NS}tbl"
+ROW = f"{WORD_NS}tr"
+CELL = f"{WORD_NS}tc"
+VERTICAL_MERGE = f"{WORD_NS}vMerge"
+VAL = f"{WORD_NS}val"
+
+def iter_docx_blocks(file_path: str) -> Iterator[str]:
+    """Stream text blocks out of a DOCX body in document order.
+
+    Each non-empty top-level paragraph is one block and each table row becomes one
+    "cell | cell" block. Horizontally merged cells appear once and the continuation
+    cells of a vertical merge are skipped, so merged cells are not repeated.
+    """
+    with zipfile.ZipFile(file_path) as archive, archive.open(DOCUMENT_PART) as document_xml:
+        paragraphs: List[List[str]] = []
+        run_depth = 0
+        fallback_depth = 0
+        # Open tables, each a list of finished row texts plus the cells of the current row
+        tables: List[Dict] = []
+        # Open cells, each collecting its paragraph texts; None marks a vertical-merge continuation
+        cells: List[Optional[List[str]]] = []
+
+        for event, elem in iterparse(document_xml, events=("start", "end")):
+            tag = elem.tag
+            if tag == MC_FALLBACK:
+                fallback_depth += 1 if event == "start" else -1
+                continue
+            if fallback_depth:
+                continue
+
+            if event == "start":
+                if tag == PARAGRAPH:
+                    paragraphs.append([])
+                elif tag == RUN:
+                    run_depth += 1
+                elif tag == TABLE:
+                    tables.append({"rows": [], "cells": []})
+                elif tag == ROW:
+                    tables[-1]["cells"] = []
+                elif tag == CELL:
+                    cells.append([])
+                continue
+
+            if tag == TEXT and paragraphs:
+                paragraphs[-1].append(elem.text or "")
+            elif tag == TAB and run_depth and paragraphs:
+                paragraphs[-1].append("\t")
+            elif tag in BREAKS and run_depth and paragraphs:
+                paragraphs[-1].append("\n")
+            elif tag == RUN:
+                run_depth -= 1
+            elif tag == VERTICAL_MERGE and cells:
+                if elem.get(VAL, "continue") == "continue":
+                    cells[-1] = None
+            elif tag == PARAGRAPH:
+                text = "".join(paragraphs.pop())
+                if text.strip():
+                    if cells and cells[-1] is not None:
+                        cells[-1].append(text)
+                    elif not cells and not tables:
+                        yield text
+                elem.clear()
+            elif tag == CELL:
+                cell = cells.pop()
+                if cell:
+                    tables[-1]["cells"].append("\n".join(cell))
+            elif tag == ROW:
+                row_text = " | ".join(tables[-1]["cells"])
+                if row_text:
+                    tables[-1]["rows"].append(row_text)
+            elif tag == TABLE:
+                rows = tables.pop()["rows"]
+                if cells and cells[-1] is not None:
+                    # A nested table reads as part of the enclosing cell
+                    cells[-1].extend(rows)
+                elif not cells:
+                    yield from rows
+                elem.clear()
+
+def extract_docx_text(file_path: str) -> str:
+    """Extract DOCX text by stream-parsing word/document.xml instead of building the python-docx object model."""
+    return "\n\n".join(iter_docx_blocks(file_path))
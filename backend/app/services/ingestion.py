@@ -0,0 +1,60 @@
+from bson import ObjectId
+
+from app.core.database import get_cvs_collection
+from app.core.logging import logger
+from app.models.documents import CVDocument, DocumentStatus
+from app.services.llm_service import get_llm_service
+from app.services.pipeline import IngestionPipeline, PipelineError
+
+pipeline = IngestionPipeline(get_llm_service())
+
+class IngestionError(Exception):
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+def document_from_mongo(document: dict) -> CVDocument:
+    document["id"] = str(document.pop("_id"))
+    if document.get("parsed_data_id"):
+        document["parsed_data_id"] = str(document["parsed_data_id"])
+    return CVDocument.model_validate(document)
+
+async def ingest_document(document_id: str) -> None:
+    """Run the staged processing pipeline for a stored CV document and persist the result."""
+    cvs_collection = get_cvs_collection()
+    document = await cvs_collection.find_one({"_id": ObjectId(document_id)})
+
+    if not document:
+        logger.warning(f"Document {document_id} no longer exists, skipping ingestion")
+        return
+
+    if document.get("status") == DocumentStatus.COMPLETED:
+        logger.info(f"Document {document_id} is already processed, skipping ingestion")
+        return
+
+    cv_document = document_from_mongo(document)
+
+    await cvs_collection.update_one(
+        {"_id": ObjectId(document_id)},
+        {"$set": {"status": DocumentStatus.PROCESSING, "error_message": None}}
+    )
+
+    try:
+        await pipeline.run(cv_document, force_stages=cv_document.force_stages)
+    except PipelineError as e:
+        raise IngestionError(str(e), retryable=e.retryable) from e
+
+    logger.info(f"Document processed successfully: {document_id}")
+
+async def mark_document_failed(document_id: str, error_message: str, final: bool = True) -> None:
+    """Record a processing failure; non-final failures leave the document pending for a retry."""
+    cvs_collection = get_cvs_collection()
+    await cvs_collection.update_one(
+        {"_id": ObjectId(document_id)},
+        {
+            "$set": {
+                "status": DocumentStatus.FAILED if final else DocumentStatus.PENDING,
+                "error_message": error_message
+            }
+        }
+    )
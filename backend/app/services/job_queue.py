@@ -0,0 +1,180 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from prometheus_client import Gauge
+
+from app.core.config import settings
+from app.core.database import get_redis_client
+from app.core.logging import logger
+
+QUEUE_DEPTH = Gauge(
+    "cv_job_queue_depth",
+    "Number of jobs in each state of a job queue",
+    ["queue", "state"]
+)
+
+# Enqueue only if the job is not already known to the queue (pending, delayed or in flight).
+ENQUEUE_SCRIPT = """
+if redis.call('HSETNX', KEYS[1], ARGV[1], 0) == 1 then
+    redis.call('LPUSH', KEYS[2], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+# Atomically move the next pending job into the in-flight set with a visibility deadline.
+DEQUEUE_SCRIPT = """
+local job_id = redis.call('RPOP', KEYS[1])
+if not job_id then
+    return nil
+end
+redis.call('ZADD', KEYS[2], ARGV[1], job_id)
+local attempts = redis.call('HINCRBY', KEYS[3], job_id, 1)
+return {job_id, attempts}
+"""
+
+# Return expired in-flight jobs and due delayed jobs to the pending list.
+REQUEUE_SCRIPT = """
+local moved = 0
+for _, source in ipairs({KEYS[1], KEYS[2]}) do
+    local jobs = redis.call('ZRANGEBYSCORE', source, '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+    for _, job_id in ipairs(jobs) do
+        redis.call('ZREM', source, job_id)
+        redis.call('LPUSH', KEYS[3], job_id)
+        moved = moved + 1
+    end
+end
+return moved
+"""
+
+@dataclass
+class Job:
+    job_id: str
+    attempts: int
+
+class JobQueue:
+    """Reliable Redis-backed work queue with visibility timeouts, delayed retries and a dead-letter list."""
+
+    def __init__(
+        self,
+        name: str,
+        visibility_timeout: int = settings.INGESTION_VISIBILITY_TIMEOUT_SECONDS,
+        max_attempts: int = settings.INGESTION_MAX_ATTEMPTS,
+        retry_backoff: int = settings.INGESTION_RETRY_BACKOFF_SECONDS
+    ):
+        self.name = name
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+
+        self.pending_key = f"jobs:{name}:pending"
+        self.inflight_key = f"jobs:{name}:inflight"
+        self.delayed_key = f"jobs:{name}:delayed"
+        self.attempts_key = f"jobs:{name}:attempts"
+        self.dead_key = f"jobs:{name}:dead"
+
+    async def enqueue(self, job_id: str) -> bool:
+        redis = get_redis_client()
+        added = await redis.eval(ENQUEUE_SCRIPT, 2, self.attempts_key, self.pending_key, job_id)
+        if added:
+            logger.info(f"Enqueued job {job_id} on queue '{self.name}'")
+        return bool(added)
+
+    async def enqueue_many(self, job_ids: List[str]) -> int:
+        redis = get_redis_client()
+        async with redis.pipeline(transaction=False) as pipe:
+            for job_id in job_ids:
+                pipe.eval(ENQUEUE_SCRIPT, 2, self.attempts_key, self.pending_key, job_id)
+            results = await pipe.execute()
+        added = sum(1 for result in results if result)
+        logger.info(f"Enqueued {added} of {len(job_ids)} jobs on queue '{self.name}'")
+        return added
+
+    async def dequeue(self) -> Optional[Job]:
+        redis = get_redis_client()
+        deadline = time.time() + self.visibility_timeout
+        result = await redis.eval(
+            DEQUEUE_SCRIPT, 3,
+            self.pending_key, self.inflight_key, self.attempts_key,
+            deadline
+        )
+        if not result:
+            return None
+        return Job(job_id=result[0], attempts=int(result[1]))
+
+    async def extend(self, job: Job) -> None:
+        """Push back the visibility deadline of a job that is still being worked on."""
+        redis = get_redis_client()
+        await redis.zadd(self.inflight_key, {job.job_id: time.time() + self.visibility_timeout}, xx=True)
+
+    async def ack(self, job: Job) -> None:
+        redis = get_redis_client()
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(self.inflight_key, job.job_id)
+            pipe.hdel(self.attempts_key, job.job_id)
+            await pipe.execute()
+
+    async def retry(self, job: Job) -> None:
+        redis = get_redis_client()
+        delay = self.retry_backoff * (2 ** (job.attempts - 1))
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(self.inflight_key, job.job_id)
+            pipe.zadd(self.delayed_key, {job.job_id: time.time() + delay})
+            await pipe.execute()
+        logger.info(f"Job {job.job_id} scheduled for retry in {delay}s (attempt {job.attempts}/{self.max_attempts})")
+
+    async def dead_letter(self, job: Job) -> None:
+        redis = get_redis_client()
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(self.inflight_key, job.job_id)
+            pipe.hdel(self.attempts_key, job.job_id)
+            pipe.lpush(self.dead_key, job.job_id)
+            await pipe.execute()
+        logger.warning(f"Job {job.job_id} moved to dead-letter list after {job.attempts} attempts")
+
+    async def requeue_expired(self, batch_size: int = 100) -> int:
+        """Return jobs whose visibility timeout or retry delay has elapsed to the pending list."""
+        redis = get_redis_client()
+        moved = await redis.eval(
+            REQUEUE_SCRIPT, 3,
+            self.inflight_key, self.delayed_key, self.pending_key,
+            time.time(), batch_size
+        )
+        if moved:
+            logger.info(f"Requeued {moved} expired or delayed jobs on queue '{self.name}'")
+        return int(moved)
+
+    async def stats(self) -> Dict[str, int]:
+        redis = get_redis_client()
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.llen(self.pending_key)
+            pipe.zcard(self.inflight_key)
+            pipe.zcard(self.delayed_key)
+            pipe.llen(self.dead_key)
+            pending, inflight, delayed, dead = await pipe.execute()
+
+        queue_stats = {
+            "pending": pending,
+            "in_flight": inflight,
+            "delayed": delayed,
+            "dead": dead
+        }
+        for state, count in queue_stats.items():
+            QUEUE_DEPTH.labels(queue=self.name, state=state).set(count)
+        return queue_stats
+
+async def monitor_queue_depth(queue: JobQueue, interval: int = 15):
+    """Keep the queue depth gauges fresh for the API process's /metrics endpoint."""
+    while True:
+        try:
+            await queue.stats()
+        except Exception as e:
+            logger.warning(f"Failed to refresh queue depth metrics: {str(e)}")
+        await asyncio.sleep(interval)
+
+ingestion_queue = JobQueue(settings.INGESTION_QUEUE_NAME)
+
+def get_ingestion_queue() -> JobQueue:
+    return ingestion_queue
@@ -0,0 +1,263 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+import anthropic
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.services.model_registry import model_registry
+from app.services.rate_limit import estimate_tokens
+
+@dataclass
+class LLMResponse:
+    text: str
+    input_tokens: int
+    output_tokens: int
+    stop_reason: Optional[str] = None
+
+class LLMRateLimitError(Exception):
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class LLMBackend(ABC):
+    """A chat-completion provider. Requests are dicts with max_tokens, messages and an optional system prompt."""
+
+    model_name: str
+    # Whether calls should go through the shared request/token budgets
+    rate_limited: bool = True
+
+    @abstractmethod
+    def is_available(self) -> bool:
+        ...
+
+    def is_retryable(self, error: Exception) -> bool:
+        """Whether an error reflects a transient upstream problem worth retrying (and counting against it)."""
+        return True
+
+    @abstractmethod
+    async def create(self, request: Dict[str, Any]) -> LLMResponse:
+        ...
+
+    @abstractmethod
+    def stream(self, request: Dict[str, Any]) -> AsyncIterator[Union[str, LLMResponse]]:
+        """Yield text chunks as they are generated, then a final LLMResponse with the full text and usage."""
+        ...
+
+class AnthropicBackend(LLMBackend):
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    @property
+    def client(self) -> Optional[anthropic.AsyncAnthropic]:
+        return model_registry.get_llm_client()
+
+    def is_available(self) -> bool:
+        return self.client is not None
+
+    def is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, (LLMRateLimitError, anthropic.APIConnectionError)):
+            return True
+        if isinstance(error, anthropic.APIStatusError):
+            return error.status_code >= 500
+        return False
+
+    @staticmethod
+    def _rate_limit_error(error: anthropic.RateLimitError) -> LLMRateLimitError:
+        retry_after = error.response.headers.get("retry-after")
+        return LLMRateLimitError(str(error), float(retry_after) if retry_after else None)
+
+    async def create(self, request: Dict[str, Any]) -> LLMResponse:
+        try:
+            message = await self.client.messages.create(model=self.model_name, **request)
+        except anthropic.RateLimitError as e:
+            raise self._rate_limit_error(e) from e
+        return LLMResponse(
+            text=message.content[0].text,
+            input_tokens=message.usage.input_tokens,
+            output_tokens=message.usage.output_tokens,
+            stop_reason=message.stop_reason
+        )
+
+    async def stream(self, request: Dict[str, Any]) -> AsyncIterator[Union[str, LLMResponse]]:
+        try:
+            async with self.client.messages.stream(model=self.model_name, **request) as stream:
+                async for text in stream.text_stream:
+                    yield text
+                message = await stream.get_final_message()
+        except anthropic.RateLimitError as e:
+            raise self._rate_limit_error(e) from e
+        yield LLMResponse(
+            text="".join(block.text for block in message.content),
+            input_tokens=message.usage.input_tokens,
+            output_tokens=message.usage.output_tokens,
+            stop_reason=message.stop_reason
+        )
+
+FAKE_SKILLS = {
+    "Programming Languages": ["Python", "Java", "JavaScript", "TypeScript", "Go", "C++", "C#", "SQL", "Rust", "Scala"],
+    "Frameworks": ["React", "Django", "FastAPI", "Flask", "Spring", "Angular", "Node.js", "Spark", "TensorFlow", "PyTorch"],
+    "Tools": ["Docker", "Kubernetes", "Git", "AWS", "Azure", "GCP", "PostgreSQL", "MongoDB", "Redis", "Terraform"],
+    "Soft Skills": ["Leadership", "Communication", "Mentoring", "Teamwork", "Problem Solving"]
+}
+FAKE_COMPANIES = ["Acme Corp", "Globex", "Initech", "Umbrella Systems", "Stark Industries", "Wayne Enterprises", "Hooli"]
+FAKE_POSITIONS = ["Software Engineer", "Senior Software Engineer", "Data Scientist", "DevOps Engineer", "Product Manager"]
+FAKE_INSTITUTIONS = ["University of Leeds", "Imperial College London", "University of Toronto", "TU Munich", "MIT"]
+
+class FakeLLMBackend(LLMBackend):
+    """Deterministic offline stand-in for load and latency experiments.
+
+    Replays a recorded response when the prompt has one, otherwise generates schema-valid CV JSON for
+    parsing prompts and a templated answer for queries. Latency is drawn from a log-normal time to
+    first token plus a fixed generation rate, seeded by the prompt so runs are reproducible.
+    """
+
+    rate_limited = False
+
+    def __init__(
+        self,
+        model_name: str = "fake-cv-llm",
+        recordings_path: Optional[str] = settings.LLM_FAKE_RECORDINGS_PATH,
+        median_latency_ms: float = settings.LLM_FAKE_MEDIAN_LATENCY_MS,
+        latency_sigma: float = settings.LLM_FAKE_LATENCY_SIGMA,
+        tokens_per_second: float = settings.LLM_FAKE_TOKENS_PER_SECOND,
+        seed: int = settings.LLM_FAKE_SEED
+    ):
+        self.model_name = model_name
+        self.median_latency_ms = median_latency_ms
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.seed = seed
+
+        self.recordings: Dict[str, str] = {}
+        if recordings_path and Path(recordings_path).exists():
+            self.recordings = json.loads(Path(recordings_path).read_text())
+            logger.info(f"Fake LLM loaded {len(self.recordings)} recorded responses")
+
+    @staticmethod
+    def prompt_key(request: Dict[str, Any]) -> str:
+        """Recording key: a hash of the last user message."""
+        return hashlib.sha256(request["messages"][-1]["content"].encode("utf-8")).hexdigest()
+
+    def is_available(self) -> bool:
+        return True
+
+    def _rng(self, key: str) -> random.Random:
+        return random.Random(f"{self.seed}:{key}")
+
+    def _respond(self, request: Dict[str, Any], rng: random.Random) -> str:
+        key = self.prompt_key(request)
+        if key in self.recordings:
+            return self.recordings[key]
+
+        prompt = request["messages"][-1]["content"]
+        if "CV/resume parser" in prompt:
+            return f"```json\n{json.dumps(self._generate_cv_json(prompt, rng), indent=2)}\n```"
+        return self._generate_answer(prompt, rng)
+
+    @staticmethod
+    def _generate_cv_json(prompt: str, rng: random.Random) -> Dict[str, Any]:
+        cv_text = prompt.split("Raw CV text:", 1)[-1].split("Respond with a JSON object", 1)[0]
+        email = re.search(r"[\w.+-]+@[\w-]+\.[\w.]+", cv_text)
+        phone = re.search(r"\+?\d[\d\s().-]{7,}\d", cv_text)
+        words = re.findall(r"\b[A-Z][a-z]+\b", cv_text)
+
+        found_skills = {
+            category: [skill for skill in skills if skill.lower() in cv_text.lower()] or rng.sample(skills, 2)
+            for category, skills in FAKE_SKILLS.items()
+        }
+        start_year = rng.randint(2005, 2018)
+        return {
+            "personal_information": {
+                "name": " ".join(words[:2]) if len(words) >= 2 else "Alex Candidate",
+                "email": email.group(0) if email else None,
+                "phone": phone.group(0).strip() if phone else None,
+                "location": None,
+                "linkedin": None,
+                "github": None,
+                "website": None
+            },
+            "education": [{
+                "institution": rng.choice(FAKE_INSTITUTIONS),
+                "degree": rng.choice(["BSc", "MSc", "PhD"]),
+                "field_of_study": "Computer Science",
+                "start_date": f"{start_year - 4}-09",
+                "end_date": f"{start_year}-06",
+                "gpa": None
+            }],
+            "work_experience": [
+                {
+                    "company": rng.choice(FAKE_COMPANIES),
+                    "position": rng.choice(FAKE_POSITIONS),
+                    "start_date": f"{start_year + 3 * i}-01",
+                    "end_date": "Present" if i == 1 else f"{start_year + 3 * i + 3}-01",
+                    "location": None,
+                    "description": "Delivered backend services and data pipelines.",
+                    "highlights": ["Improved service latency by 30%", "Mentored junior engineers"]
+                }
+                for i in range(2)
+            ],
+            "skills": found_skills,
+            "projects": [],
+            "certifications": []
+        }
+
+    @staticmethod
+    def _generate_answer(prompt: str, rng: random.Random) -> str:
+        names = re.findall(r"^\s*Name: (.+)$", prompt, flags=re.MULTILINE)
+        if not names:
+            return "The CV data does not provide this information."
+        mentioned = rng.sample(names, min(len(names), 3))
+        return (
+            f"Based on the provided CV data, the most relevant candidates are {', '.join(mentioned)}. "
+            f"Each of them lists experience and skills that relate to the question."
+        )
+
+    def _first_token_delay(self, rng: random.Random) -> float:
+        return rng.lognormvariate(0, self.latency_sigma) * self.median_latency_ms / 1000
+
+    def _usage(self, request: Dict[str, Any], text: str) -> LLMResponse:
+        prompt_text = (request.get("system") or "") + "".join(message["content"] for message in request["messages"])
+        return LLMResponse(
+            text=text,
+            input_tokens=estimate_tokens(prompt_text),
+            output_tokens=estimate_tokens(text),
+            stop_reason="end_turn"
+        )
+
+    async def create(self, request: Dict[str, Any]) -> LLMResponse:
+        rng = self._rng(self.prompt_key(request))
+        text = self._respond(request, rng)
+        response = self._usage(request, text)
+        await asyncio.sleep(self._first_token_delay(rng) + response.output_tokens / self.tokens_per_second)
+        return response
+
+    async def stream(self, request: Dict[str, Any]) -> AsyncIterator[Union[str, LLMResponse]]:
+        rng = self._rng(self.prompt_key(request))
+        text = self._respond(request, rng)
+        await asyncio.sleep(self._first_token_delay(rng))
+
+        chunks: List[str] = re.findall(r"\S+\s*", text) or [text]
+        for chunk in chunks:
+            await asyncio.sleep(estimate_tokens(chunk) / self.tokens_per_second)
+            yield chunk
+        yield self._usage(request, text)
+
+llm_backend: Optional[LLMBackend] = None
+
+def get_llm_backend() -> LLMBackend:
+    global llm_backend
+    if llm_backend is None:
+        if settings.LLM_BACKEND == "fake":
+            logger.warning("Using the fake LLM backend; responses are generated locally")
+            llm_backend = FakeLLMBackend()
+        else:
+            llm_backend = AnthropicBackend(settings.LLM_MODEL)
+    return llm_backend
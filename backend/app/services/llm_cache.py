@@ -0,0 +1,130 @@
+import hashlib
+import json
+import re
+import time
+import unicodedata
+from typing import Any, Optional
+
+from prometheus_client import Counter
+
+from app.core.config import settings
+from app.core.database import get_redis_client
+from app.core.logging import logger
+
+CACHE_REQUESTS = Counter(
+    "cv_llm_cache_requests_total",
+    "LLM cache lookups by cache and result",
+    ["cache", "result"]
+)
+
+# Store an entry, then drop expired and least recently used entries until the cache fits its byte budget.
+PUT_SCRIPT = """
+local previous = tonumber(redis.call('HGET', KEYS[3], KEYS[1]) or 0)
+local size = string.len(ARGV[1])
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+redis.call('HSET', KEYS[3], KEYS[1], size)
+redis.call('ZADD', KEYS[2], ARGV[3], KEYS[1])
+local total = redis.call('INCRBY', KEYS[4], size - previous)
+
+local function drop(key)
+    local dropped = tonumber(redis.call('HGET', KEYS[3], key) or 0)
+    redis.call('DEL', key)
+    redis.call('HDEL', KEYS[3], key)
+    redis.call('ZREM', KEYS[2], key)
+    total = redis.call('DECRBY', KEYS[4], dropped)
+end
+
+for _, key in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[5], 'LIMIT', 0, 100)) do
+    drop(key)
+end
+
+local evicted = 0
+while total > tonumber(ARGV[4]) do
+    local oldest = redis.call('ZRANGE', KEYS[2], 0, 0)
+    if #oldest == 0 or oldest[1] == KEYS[1] then
+        break
+    end
+    drop(oldest[1])
+    evicted = evicted + 1
+end
+return evicted
+"""
+
+def normalize_text(text: str) -> str:
+    """Canonical form of CV text, so re-extractions that only differ in whitespace share an entry."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+class LLMResponseCache:
+    """Redis cache for LLM results with a TTL and a total size budget enforced by LRU eviction.
+
+    Keys include the caller's version parts (model, prompt version, ...) so a change to any of them
+    simply stops matching old entries, which then age out.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: int = settings.LLM_CACHE_TTL_SECONDS,
+        max_bytes: int = settings.LLM_CACHE_MAX_BYTES,
+        enabled: bool = settings.LLM_CACHE_ENABLED
+    ):
+        self.name = name
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        self.index_key = f"llmcache:{name}:index"
+        self.sizes_key = f"llmcache:{name}:sizes"
+        self.bytes_key = f"llmcache:{name}:bytes"
+
+    def make_key(self, *parts: str) -> str:
+        digest = hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+        return f"llmcache:{self.name}:{digest}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        try:
+            redis = get_redis_client()
+            value = await redis.get(key)
+            if value is None:
+                CACHE_REQUESTS.labels(cache=self.name, result="miss").inc()
+                return None
+            await redis.zadd(self.index_key, {key: time.time()})
+            CACHE_REQUESTS.labels(cache=self.name, result="hit").inc()
+            return json.loads(value)
+        except Exception as e:
+            logger.warning(f"LLM cache '{self.name}' lookup failed: {str(e)}")
+            CACHE_REQUESTS.labels(cache=self.name, result="error").inc()
+            return None
+
+    async def put(self, key: str, value: Any) -> None:
+        if not self.enabled:
+            return
+        try:
+            redis = get_redis_client()
+            now = time.time()
+            evicted = await redis.eval(
+                PUT_SCRIPT, 4, key, self.index_key, self.sizes_key, self.bytes_key,
+                json.dumps(value), self.ttl, now, self.max_bytes, now - self.ttl
+            )
+            if evicted:
+                logger.info(f"LLM cache '{self.name}' evicted {evicted} entries to stay under {self.max_bytes} bytes")
+        except Exception as e:
+            logger.warning(f"LLM cache '{self.name}' store failed: {str(e)}")
+
+structure_cache = LLMResponseCache("structure")
+
+def get_structure_cache() -> LLMResponseCache:
+    return structure_cache
+
+# Query answers are keyed on the corpus version, so entries for an older corpus simply stop matching
+query_cache = LLMResponseCache(
+    "query_answers",
+    settings.QUERY_CACHE_TTL_SECONDS,
+    settings.QUERY_CACHE_MAX_BYTES,
+    enabled=settings.QUERY_CACHE_ENABLED
+)
+
+def get_query_cache() -> LLMResponseCache:
+    return query_cache
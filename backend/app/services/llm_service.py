@@ -1,71 +1,146 @@
-from typing import Dict, List, Optional, Union, Set, Tuple
+from typing import Any, AsyncIterator, Dict, List, Optional, Union, Set, Tuple
 import json
-import anthropic
-from anthropic.types import Message
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import faiss
-from tenacity import retry, stop_after_attempt, wait_exponential
 import asyncio
 import re
+from contextlib import aclosing, asynccontextmanager
 
 from app.core.config import settings
 from app.core.logging import logger
-from app.models.documents import ParsedCV, CVQuery, PersonalInfo, Education, WorkExperience, Skill, Project, Certification
+from app.models.documents import ParsedCV, CVQuery, ConversationSession, QueryMode, PersonalInfo, Education, WorkExperience, Skill, Project, Certification
+from app.services.circuit_breaker import Deadline, DeadlineExceeded, call_with_retries, current_deadline, get_llm_breaker
+from app.services.llm_backends import LLMBackend, LLMRateLimitError, LLMResponse, get_llm_backend
+from app.services.llm_cache import get_structure_cache, normalize_text
+from app.services.model_registry import EMBEDDING_MODEL_NAME, ModelUnavailableError, model_registry
+from app.services.query_router import query_sections
+from app.services.rate_limit import estimate_tokens, get_llm_rate_limiter
+
+# Bump when the parsing prompt or the embedding text changes so stored artifacts are recomputed
+PROMPT_VERSION = "1"
+EMBEDDING_TEXT_VERSION = "1"
+
+# A FAISS index and the CVs its positions refer to
+SearchIndex = Tuple[Any, List[ParsedCV]]
 
 class LLMService:
     def __init__(self):
-        self.model_name = "claude-3-haiku-20240307"
-        
-        self.client = None
-        self.embedding_model = None
-        self.index = None
-        self.cv_ids = []
+        self.backend = get_llm_backend()
+        self.model_name = self.backend.model_name
         
         self.entity_map = {}
-        
-        self._initialize_client()
     
-    def _initialize_client(self):
-        """Initialize Anthropic client and embedding model lazily."""
-        if self.client is not None:
+    @property
+    def client(self) -> Optional[LLMBackend]:
+        """The configured backend if it can take requests."""
+        return self.backend if self.backend.is_available() else None
+    
+    @property
+    def embedding_model(self):
+        return model_registry.embedding_model
+    
+    def _prepare_request(self, max_tokens: int, messages: List[Dict[str, str]], system: Optional[str]) -> Tuple[Dict[str, Any], int]:
+        prompt_text = (system or "") + "".join(message["content"] for message in messages)
+        request = {"max_tokens": max_tokens, "messages": messages}
+        if system:
+            request["system"] = system
+        return request, estimate_tokens(prompt_text) + max_tokens
+    
+    @asynccontextmanager
+    async def _rate_limited(self, estimated_tokens: int) -> AsyncIterator[None]:
+        if not self.backend.rate_limited:
+            yield
             return
-            
-        try:
-            self.client = anthropic.Anthropic(api_key=settings.ANTHROPIC_API_KEY)
-            logger.info("Anthropic client initialized successfully")
-            
-            # Load embedding model in background
-            asyncio.create_task(self._initialize_embedding_model())
-        except Exception as e:
-            logger.error(f"Failed to initialize Anthropic client: {e}")
-            self.client = None
+        
+        # Waiting for budget uses up the caller's deadline, but happens before the breaker sees the call
+        deadline = current_deadline()
+        async with get_llm_rate_limiter().acquire(estimated_tokens, timeout=deadline.remaining() if deadline else None):
+            try:
+                yield
+            except LLMRateLimitError as e:
+                await get_llm_rate_limiter().pause(e.retry_after or 10.0)
+                raise
     
-    async def _initialize_embedding_model(self):
-        try:
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-            logger.info("Embedding model loaded successfully")
-        except Exception as e:
-            logger.error(f"Failed to load embedding model: {e}")
-            self.embedding_model = None
+    async def _settle_usage(self, estimated_tokens: int, response: LLMResponse):
+        if self.backend.rate_limited:
+            await get_llm_rate_limiter().settle(estimated_tokens, response.input_tokens + response.output_tokens)
     
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-    async def enhance_cv(self, parsed_cv: ParsedCV) -> ParsedCV:
-        """Use LLM to extract and categorize all CV data in one comprehensive pass."""
-        # Ensure client is initialized
+    async def _create_message(self, max_tokens: int, messages: List[Dict[str, str]], system: Optional[str] = None) -> LLMResponse:
+        """Call the backend through the shared concurrency cap and request/token budgets."""
         if not self.client:
-            self._initialize_client()
-            if not self.client:
-                logger.error("Anthropic client initialization failed")
-                return parsed_cv
+            raise ValueError("LLM backend is not available")
+        
+        request, estimated_tokens = self._prepare_request(max_tokens, messages, system)
+        get_llm_breaker().reject_if_open()
+        async with self._rate_limited(estimated_tokens):
+            async with get_llm_breaker().protect(self.backend.is_retryable):
+                response = await self.backend.create(request)
+        
+        await self._settle_usage(estimated_tokens, response)
+        return response
+    
+    async def _stream_message(
+        self,
+        max_tokens: int,
+        messages: List[Dict[str, str]],
+        system: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming counterpart of _create_message: yields token events, then a done event with usage.
+
+        Closing the generator early (e.g. the client went away) closes the upstream stream.
+        """
+        if not self.client:
+            raise ValueError("LLM backend is not available")
+        
+        request, estimated_tokens = self._prepare_request(max_tokens, messages, system)
+        response: Optional[LLMResponse] = None
+        get_llm_breaker().reject_if_open()
+        async with self._rate_limited(estimated_tokens):
+            async with get_llm_breaker().protect(self.backend.is_retryable):
+                async with aclosing(self.backend.stream(request)) as chunks:
+                    async for chunk in chunks:
+                        if isinstance(chunk, LLMResponse):
+                            response = chunk
+                        else:
+                            yield {"event": "token", "text": chunk}
+        
+        await self._settle_usage(estimated_tokens, response)
+        yield {
+            "event": "done",
+            "stop_reason": response.stop_reason,
+            "usage": {"input_tokens": response.input_tokens, "output_tokens": response.output_tokens}
+        }
+    
+    async def structure_cv(self, raw_text: str) -> Optional[Dict]:
+        """Structure raw CV text, from the cache when the same text was structured by the same model and prompt."""
+        cache = get_structure_cache()
+        cache_key = cache.make_key(self.model_name, PROMPT_VERSION, normalize_text(raw_text))
+        cached = await cache.get(cache_key)
+        if cached is not None:
+            logger.info("Structured CV data served from cache")
+            return cached
+        
+        json_response = await call_with_retries(
+            lambda: self._request_structure(raw_text),
+            Deadline(settings.LLM_STRUCTURE_DEADLINE_SECONDS),
+            is_retryable=self.backend.is_retryable
+        )
+        # Unusable responses are not cached so the next attempt asks the LLM again
+        if json_response:
+            await cache.put(cache_key, json_response)
+        return json_response
+    
+    async def _request_structure(self, raw_text: str) -> Optional[Dict]:
+        """Ask the LLM to structure raw CV text; returns the parsed JSON or None if it was unusable."""
+        if not self.client:
+            raise ValueError("LLM backend is not available")
         
         logger.info("Processing CV data using LLM")
         
-        prompt = self._create_cv_parsing_prompt(parsed_cv.raw_text)
+        prompt = self._create_cv_parsing_prompt(raw_text)
         
         try:
-            response = self.client.messages.create(
-                model=self.model_name,
+            response = await self._create_message(
                 max_tokens=4000,
                 messages=[
                     {
@@ -74,28 +149,39 @@ class LLMService:
                     }
                 ]
             )
-            
-            json_response = self._extract_json_from_response(response.content[0].text)
-            
-            if json_response:
-                enhanced_cv = self._cv_from_json(parsed_cv.raw_text, json_response)
-                
-                if self.embedding_model:
-                    text_for_embedding = self._prepare_text_for_embedding(enhanced_cv)
-                    embedding = self.embedding_model.encode(text_for_embedding).tolist()
-                    enhanced_cv.embedding = embedding
-                
-                # Update entity map with this candidate's information
-                self._update_entity_map(enhanced_cv)
-                
-                return enhanced_cv
-            else:
-                logger.warning("Could not extract valid JSON from LLM response")
-                return parsed_cv
-                
         except Exception as e:
-            logger.error(f"Error calling Anthropic API: {e}")
+            logger.error(f"Error calling LLM backend: {e}")
             raise
+        
+        json_response = self._extract_json_from_response(response.text)
+        if not json_response:
+            logger.warning("Could not extract valid JSON from LLM response")
+        return json_response
+    
+    async def embed_cv(self, cv: ParsedCV) -> List[float]:
+        embedding_model = await model_registry.load_embedding_model()
+        text_for_embedding = self._prepare_text_for_embedding(cv)
+        return (await asyncio.to_thread(embedding_model.encode, text_for_embedding)).tolist()
+    
+    async def enhance_cv(self, parsed_cv: ParsedCV) -> ParsedCV:
+        """Use LLM to extract and categorize all CV data in one comprehensive pass."""
+        if not self.client:
+            logger.error("LLM backend is not available")
+            return parsed_cv
+        
+        json_response = await self.structure_cv(parsed_cv.raw_text)
+        if not json_response:
+            return parsed_cv
+        
+        enhanced_cv = self._cv_from_json(parsed_cv.raw_text, json_response)
+        
+        if self.embedding_model:
+            enhanced_cv.embedding = await self.embed_cv(enhanced_cv)
+        
+        # Update entity map with this candidate's information
+        self._update_entity_map(enhanced_cv)
+        
+        return enhanced_cv
     
     def _update_entity_map(self, cv: ParsedCV):
         """Update entity map with candidate information for better entity resolution."""
@@ -434,20 +520,46 @@ class LLMService:
                         
         return matched_cvs
     
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-    async def query_cv_data(self, query: CVQuery, cv_data: List[ParsedCV]) -> str:
-        if not self.client:
-            self._initialize_client()
-            if not self.client:
-                raise ValueError("Anthropic client initialization failed")
-        
+    def _conversation_messages(self, query: CVQuery, session: Optional[ConversationSession]) -> List[Dict[str, str]]:
+        """Earlier turns as chat messages: the session's summary and recent turns, or the client-sent context."""
+        if session is not None:
+            summary = session.summary
+            pairs = [{"user": turn.question, "assistant": turn.answer} for turn in session.turns]
+        else:
+            summary = ""
+            pairs = self._parse_conversation_context(query.context)[-settings.SESSION_MAX_TURNS:]
+        
+        messages = []
+        if summary:
+            messages.append({"role": "user", "content": f"Summary of our conversation so far: {summary}"})
+            messages.append({"role": "assistant", "content": "Understood."})
+        for pair in pairs:
+            messages.append({"role": "user", "content": pair["user"]})
+            messages.append({"role": "assistant", "content": pair["assistant"]})
+        return messages
+    
+    async def _build_query_request(
+        self,
+        query: CVQuery,
+        cv_data: List[ParsedCV],
+        session: Optional[ConversationSession] = None,
+        search_index: Optional[SearchIndex] = None
+    ) -> Dict[str, Any]:
         logger.info(f"Querying CV data: {query.query}")
         
-        cv_data_str = "\n".join([cv.raw_text for cv in cv_data])
+        candidates = await self.retrieve_candidates(query.query, cv_data, settings.QUERY_TOP_K, search_index)
+        cv_data_str, packed_cvs = self._pack_cv_context(candidates, query.query, settings.QUERY_CONTEXT_TOKEN_BUDGET)
+        packed = len(packed_cvs)
+        corpus_size = (session.corpus_size if session else 0) or len(cv_data)
+        logger.info(f"Answering from {packed} of {corpus_size} CVs")
+        if session is not None:
+            # Follow-ups start from these instead of searching the whole corpus again
+            session.candidate_ids = [cv.id for cv in packed_cvs if cv.id]
         
         prompt = f"""
         You are a helpful assistant that answers questions about CV data. 
         Only provide answers based on the provided CV data. 
+        The CVs below are the {packed} most relevant to the query out of {corpus_size} in the database.
         
         Current query: {query.query}
         
@@ -457,19 +569,186 @@ class LLMService:
         If the information is not available, respond with "The CV data does not provide this information."
         """
         
+        return {
+            "max_tokens": 1500,
+            "system": "You are a precise CV analysis assistant. You only make statements that are directly supported by the CV data.",
+            "messages": self._conversation_messages(query, session) + [
+                {"role": "user", "content": prompt}
+            ]
+        }
+    
+    def _shard_cv_context(self, cvs: List[ParsedCV], query: str, token_budget: int) -> List[str]:
+        """Render every CV and group the sections into contexts of at most token_budget tokens each."""
+        shards: List[str] = []
+        sections: List[str] = []
+        used_tokens = 0
+        for number, cv in enumerate(cvs, start=1):
+            section = self._render_focused_cv(cv, number, query)[:token_budget * 4]
+            cost = estimate_tokens(section)
+            if sections and used_tokens + cost > token_budget:
+                shards.append("\n\n".join(sections))
+                sections, used_tokens = [], 0
+            sections.append(section)
+            used_tokens += cost
+        if sections:
+            shards.append("\n\n".join(sections))
+        return shards
+    
+    async def _map_shards(self, instructions: str, query: str, contexts: List[str], deadline: Deadline) -> List[str]:
+        """Run one LLM call per context, at most QUERY_MAP_CONCURRENCY of them at a time."""
+        semaphore = asyncio.Semaphore(settings.QUERY_MAP_CONCURRENCY)
+        
+        async def map_one(context: str) -> str:
+            request = {
+                "max_tokens": settings.QUERY_MAP_MAX_TOKENS,
+                "system": "You are a precise CV analysis assistant. You only make statements that are directly supported by the CV data.",
+                "messages": [{"role": "user", "content": f"{instructions}\n\nQuery: {query}\n\n{context}"}]
+            }
+            async with semaphore:
+                response = await call_with_retries(
+                    lambda: self._create_message(**request),
+                    deadline,
+                    is_retryable=self.backend.is_retryable
+                )
+            return response.text.strip()
+        
+        return list(await asyncio.gather(*(map_one(context) for context in contexts)))
+    
+    def _check_map_budget(self, shards: List[str], deadline: Deadline) -> None:
+        """Fail before sending anything when the map level alone cannot fit the rate limits in the time left.
+        
+        Even with the whole tokens and requests per minute budgets to itself, the first level needs this long;
+        the merge levels and the final call only add to it.
+        """
+        tokens = sum(estimate_tokens(shard) + settings.QUERY_MAP_MAX_TOKENS for shard in shards)
+        needed = 60.0 * max(tokens / settings.LLM_TOKENS_PER_MINUTE, len(shards) / settings.LLM_REQUESTS_PER_MINUTE)
+        remaining = deadline.remaining()
+        if needed > remaining:
+            raise DeadlineExceeded(
+                f"Map-reduce over {len(shards)} shards (~{tokens} tokens) needs at least {needed:.0f}s "
+                f"of rate limit budget, only {remaining:.0f}s left"
+            )
+    
+    async def _build_map_reduce_request(
+        self,
+        query: CVQuery,
+        cv_data: List[ParsedCV],
+        deadline: Deadline,
+        session: Optional[ConversationSession] = None
+    ) -> Dict[str, Any]:
+        """Extract per-shard findings over every CV, combine them until they fit one prompt, and return the final request.
+        
+        Each level runs its calls in parallel, so latency grows with the number of levels rather than the corpus.
+        """
+        shards = self._shard_cv_context(cv_data, query.query, settings.QUERY_MAP_SHARD_TOKEN_BUDGET)
+        logger.info(f"Map-reduce query over {len(cv_data)} CVs in {len(shards)} shards")
+        self._check_map_budget(shards, deadline)
+        
+        findings = await self._map_shards(
+            "Extract from the CVs below everything relevant to the query. List each relevant candidate by name "
+            "with the supporting facts from their CV. If no candidate is relevant, reply with NONE.",
+            query.query,
+            [f"CV data:\n{shard}" for shard in shards],
+            deadline
+        )
+        findings = [finding for finding in findings if finding.upper() != "NONE"]
+        
+        while len(findings) > 1 and estimate_tokens("\n\n".join(findings)) > settings.QUERY_CONTEXT_TOKEN_BUDGET:
+            groups: List[List[str]] = [[]]
+            for finding in findings:
+                if groups[-1] and estimate_tokens("\n\n".join(groups[-1] + [finding])) > settings.QUERY_MAP_SHARD_TOKEN_BUDGET:
+                    groups.append([])
+                groups[-1].append(finding)
+            if len(groups) == len(findings):
+                # Every finding fills a group on its own; merging further would not shrink anything
+                break
+            findings = await self._map_shards(
+                "Merge the findings below into one list that keeps every candidate relevant to the query "
+                "together with their supporting facts.",
+                query.query,
+                ["Findings:\n" + "\n\n".join(group) for group in groups],
+                deadline
+            )
+        
+        findings_str = "\n\n".join(f"--- Findings {i + 1} ---\n{finding}" for i, finding in enumerate(findings))
+        prompt = f"""
+        You are a helpful assistant that answers questions about CV data. 
+        Every one of the {len(cv_data)} CVs in the database was reviewed in batches, and the findings relevant to the query are below.
+        Only provide answers based on these findings, and consider all of them together.
+        
+        Current query: {query.query}
+        
+        Findings:
+        {findings_str or "No CV contained information relevant to the query."}
+        
+        If the information is not available, respond with "The CV data does not provide this information."
+        """
+        
+        return {
+            "max_tokens": 1500,
+            "system": "You are a precise CV analysis assistant. You only make statements that are directly supported by the CV data.",
+            "messages": self._conversation_messages(query, session) + [
+                {"role": "user", "content": prompt}
+            ]
+        }
+    
+    async def _build_request_for_mode(
+        self,
+        query: CVQuery,
+        cv_data: List[ParsedCV],
+        deadline: Deadline,
+        session: Optional[ConversationSession] = None,
+        search_index: Optional[SearchIndex] = None
+    ) -> Dict[str, Any]:
+        if query.mode == QueryMode.MAP_REDUCE:
+            return await self._build_map_reduce_request(query, cv_data, deadline, session)
+        return await self._build_query_request(query, cv_data, session, search_index)
+    
+    def _query_deadline(self, query: CVQuery) -> Deadline:
+        if query.mode == QueryMode.MAP_REDUCE:
+            return Deadline(settings.QUERY_MAP_REDUCE_DEADLINE_SECONDS)
+        return Deadline(settings.LLM_QUERY_DEADLINE_SECONDS)
+    
+    async def query_cv_data(
+        self,
+        query: CVQuery,
+        cv_data: List[ParsedCV],
+        deadline: Optional[Deadline] = None,
+        session: Optional[ConversationSession] = None,
+        search_index: Optional[SearchIndex] = None
+    ) -> str:
+        """Answer a query, retrying transient failures only while the request's deadline allows."""
+        deadline = deadline or self._query_deadline(query)
+        if not self.client:
+            raise ValueError("LLM backend is not available")
+        
+        request = await self._build_request_for_mode(query, cv_data, deadline, session, search_index)
         try:
-            response = self.client.messages.create(
-                model=self.model_name,
-                max_tokens=1500,
-                system="You are a precise CV analysis assistant. You only make statements that are directly supported by the CV data.",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
+            response = await call_with_retries(
+                lambda: self._create_message(**request),
+                deadline,
+                is_retryable=self.backend.is_retryable
             )
-            return response.content[0].text
+            return response.text
         except Exception as e:
-            logger.error(f"Error calling Anthropic API for query: {e}")
+            logger.error(f"Error calling LLM backend for query: {e}")
             raise
+    
+    async def stream_query_cv_data(
+        self,
+        query: CVQuery,
+        cv_data: List[ParsedCV],
+        session: Optional[ConversationSession] = None,
+        search_index: Optional[SearchIndex] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Answer a query as a stream of token events followed by a done event with usage."""
+        if not self.client:
+            raise ValueError("LLM backend is not available")
+        
+        request = await self._build_request_for_mode(query, cv_data, self._query_deadline(query), session, search_index)
+        async with aclosing(self._stream_message(**request)) as events:
+            async for event in events:
+                yield event
 
     def _parse_conversation_context(self, context: str) -> List[Dict[str, str]]:
         if not context:
@@ -551,116 +830,178 @@ class LLMService:
         
         return potential_entities
     
-    def build_index(self, cvs: List[ParsedCV]):
-        """Build a FAISS index for CV embeddings."""
-        if not cvs or not self.embedding_model:
-            return
+    def build_index(self, cvs: List[ParsedCV]) -> Optional[SearchIndex]:
+        """Build a FAISS index over the stored CV embeddings; the caller keeps it, so concurrent queries never share one."""
+        if not cvs:
+            return None
         
         valid_cvs = [cv for cv in cvs if cv.embedding and len(cv.embedding) > 0]
         if not valid_cvs:
-            return
+            return None
         
         embeddings = [cv.embedding for cv in valid_cvs]
-        self.cv_ids = list(range(len(valid_cvs)))
-        
         embeddings_np = np.array(embeddings).astype('float32')
         
         dimension = len(embeddings[0])
-        self.index = faiss.IndexFlatL2(dimension)
-        self.index.add(embeddings_np)
+        index = faiss.IndexFlatL2(dimension)
+        index.add(embeddings_np)
         
         logger.info(f"Built FAISS index with {len(valid_cvs)} CVs")
+        return index, valid_cvs
     
-    def _get_relevant_cvs(self, query: str, cv_data: List[ParsedCV], top_k: int = 30) -> List[ParsedCV]:
+    def _get_relevant_cvs(self, query: str, search_index: SearchIndex, embedding_model, top_k: int = 30) -> List[ParsedCV]:
         """Get relevant CVs using semantic search."""
-        if not self.index or not self.embedding_model:
-            return cv_data[:min(top_k, len(cv_data))]
+        index, indexed_cvs = search_index
         
-        query_embedding = self.embedding_model.encode(query).reshape(1, -1).astype('float32')
+        query_embedding = embedding_model.encode(query).reshape(1, -1).astype('float32')
         
-        distances, indices = self.index.search(query_embedding, min(top_k, len(self.cv_ids)))
+        distances, indices = index.search(query_embedding, min(top_k, len(indexed_cvs)))
         
+        # Index positions refer to the CVs that had embeddings, not to cv_data
         relevant_cv_indices = indices[0]
-        relevant_cvs = [cv_data[idx] for idx in relevant_cv_indices if idx < len(cv_data)]
+        relevant_cvs = [indexed_cvs[idx] for idx in relevant_cv_indices if 0 <= idx < len(indexed_cvs)]
         
         return relevant_cvs
     
+    async def retrieve_candidates(
+        self,
+        query: str,
+        cv_data: List[ParsedCV],
+        top_k: int,
+        search_index: Optional[SearchIndex] = None
+    ) -> List[ParsedCV]:
+        """Candidates named in the query first, then the closest CVs by embedding.
+        
+        Without a prebuilt search_index over cv_data, one is built for this call only.
+        """
+        named: List[ParsedCV] = []
+        for mention in self._extract_entity_mentions(query):
+            for cv in self._resolve_entity(mention, cv_data):
+                if all(cv is not other for other in named):
+                    named.append(cv)
+        
+        if search_index is None:
+            search_index = await asyncio.to_thread(self.build_index, cv_data)
+        if search_index is None:
+            # Nothing to rank by; say so rather than pretend the first CVs are the relevant ones
+            logger.warning(f"None of the {len(cv_data)} CVs has an embedding, answering from the first {top_k}")
+            relevant = cv_data[:top_k]
+        else:
+            try:
+                # Loads on demand, so queries that arrive before (or without) the warm-up still rank by relevance
+                embedding_model = await model_registry.load_embedding_model()
+            except Exception as e:
+                raise ModelUnavailableError(f"Embedding model is not available: {str(e)}") from e
+            relevant = await asyncio.to_thread(self._get_relevant_cvs, query, search_index, embedding_model, top_k)
+        candidates = named + [cv for cv in relevant if all(cv is not other for other in named)]
+        return candidates[:max(top_k, len(named))]
+    
+    def _pack_cv_context(self, cvs: List[ParsedCV], query: str, token_budget: int) -> Tuple[str, List[ParsedCV]]:
+        """Render candidates in relevance order until the token budget is spent; returns the context and the CVs in it."""
+        sections: List[str] = []
+        packed: List[ParsedCV] = []
+        used_tokens = 0
+        for cv in cvs:
+            section = self._render_focused_cv(cv, len(sections) + 1, query)
+            cost = estimate_tokens(section)
+            if used_tokens + cost > token_budget:
+                if sections:
+                    # A later, shorter CV may still fit
+                    continue
+                section = section[:token_budget * 4]
+                cost = token_budget
+            sections.append(section)
+            packed.append(cv)
+            used_tokens += cost
+        return "\n\n".join(sections), packed
+    
     def _prepare_focused_cv_data(self, cvs: List[ParsedCV], query: str) -> str:
         """Prepare focused CV data relevant to the query."""
+        return "\n\n".join(self._render_focused_cv(cv, i + 1, query) for i, cv in enumerate(cvs))
+    
+    def _render_focused_cv(self, cv: ParsedCV, number: int, query: str) -> str:
         query_lower = query.lower()
         
-        focus_on_skills = any(term in query_lower for term in ['skill', 'technology', 'know', 'proficiency'])
-        focus_on_education = any(term in query_lower for term in ['education', 'degree', 'university', 'school', 'college', 'academic', 'institution'])
-        focus_on_experience = any(term in query_lower for term in ['experience', 'work', 'job', 'position'])
-        focus_on_projects = any(term in query_lower for term in ['project', 'portfolio', 'build'])
+        sections = query_sections(query)
+        focus_on_skills = "skills" in sections
+        focus_on_education = "education" in sections
+        focus_on_experience = "experience" in sections
+        focus_on_projects = "projects" in sections
+        
+        cv_text = f"--- CV #{number} ---\n"
         
-        cv_texts = []
+        if cv.personal_info.name:
+            cv_text += f"Name: {cv.personal_info.name}\n"
         
-        for i, cv in enumerate(cvs):
-            cv_text = f"--- CV #{i+1} ---\n"
+        if cv.skills and (focus_on_skills or not any([focus_on_education, focus_on_experience, focus_on_projects])):
+            cv_text += "\nSkills:\n"
+            skill_categories = {}
             
-            if cv.personal_info.name:
-                cv_text += f"Name: {cv.personal_info.name}\n"
+            for skill in cv.skills:
+                category = skill.category or "Other"
+                if category not in skill_categories:
+                    skill_categories[category] = []
+                skill_categories[category].append(skill.name)
             
-            if cv.skills and (focus_on_skills or not any([focus_on_education, focus_on_experience, focus_on_projects])):
-                cv_text += "\nSkills:\n"
-                skill_categories = {}
+            for category, skills in skill_categories.items():
+                cv_text += f"- {category}: {', '.join(skills)}\n"
+        
+        if cv.education and (focus_on_education or not any([focus_on_skills, focus_on_experience, focus_on_projects])):
+            cv_text += "\nEducation:\n"
+            for edu in cv.education:
+                edu_text = f"- {edu.degree}"
+                if edu.field_of_study:
+                    edu_text += f" in {edu.field_of_study}"
+                edu_text += f" at {edu.institution}"
                 
-                for skill in cv.skills:
-                    category = skill.category or "Other"
-                    if category not in skill_categories:
-                        skill_categories[category] = []
-                    skill_categories[category].append(skill.name)
+                if 'when' in query_lower or 'year' in query_lower:
+                    if edu.start_date and edu.end_date:
+                        edu_text += f" ({edu.start_date.year}-{edu.end_date.year})"
                 
-                for category, skills in skill_categories.items():
-                    cv_text += f"- {category}: {', '.join(skills)}\n"
-            
-            if cv.education and (focus_on_education or not any([focus_on_skills, focus_on_experience, focus_on_projects])):
-                cv_text += "\nEducation:\n"
-                for edu in cv.education:
-                    edu_text = f"- {edu.degree}"
-                    if edu.field_of_study:
-                        edu_text += f" in {edu.field_of_study}"
-                    edu_text += f" at {edu.institution}"
-                    
-                    if 'when' in query_lower or 'year' in query_lower:
-                        if edu.start_date and edu.end_date:
-                            edu_text += f" ({edu.start_date.year}-{edu.end_date.year})"
-                    
-                    cv_text += edu_text + "\n"
-            
-            if cv.work_experience and (focus_on_experience or not any([focus_on_skills, focus_on_education, focus_on_projects])):
-                cv_text += "\nWork Experience:\n"
-                for work in cv.work_experience:
-                    work_text = f"- {work.position} at {work.company}"
-                    
-                    if 'when' in query_lower or 'year' in query_lower or 'how long' in query_lower:
-                        if work.start_date and work.end_date:
-                            work_text += f" ({work.start_date.year}-{work.end_date.year})"
-                    
-                    cv_text += work_text + "\n"
-                    
-                    if work.description and ('detail' in query_lower or 'responsibility' in query_lower):
-                        cv_text += f"  Description: {work.description}\n"
-                    
-                    if work.highlights and ('accomplish' in query_lower or 'achievement' in query_lower):
-                        cv_text += "  Highlights:\n"
-                        for highlight in work.highlights[:3]:  # Limit to 3 highlights
-                            cv_text += f"   - {highlight}\n"
-            
-            if cv.projects and (focus_on_projects or 'project' in query_lower):
-                cv_text += "\nProjects:\n"
-                for project in cv.projects:
-                    proj_text = f"- {project.name}"
-                    if project.technologies:
-                        proj_text += f" (Technologies: {', '.join(project.technologies[:5])})"  # Limit to 5 technologies
-                    cv_text += proj_text + "\n"
-                    
-                    if project.description and len(project.description) > 10:
+                cv_text += edu_text + "\n"
+        
+        if cv.work_experience and (focus_on_experience or not any([focus_on_skills, focus_on_education, focus_on_projects])):
+            cv_text += "\nWork Experience:\n"
+            for work in cv.work_experience:
+                work_text = f"- {work.position} at {work.company}"
+                
+                if 'when' in query_lower or 'year' in query_lower or 'how long' in query_lower:
+                    if work.start_date and work.end_date:
+                        work_text += f" ({work.start_date.year}-{work.end_date.year})"
+                
+                cv_text += work_text + "\n"
+                
+                if work.description and ('detail' in query_lower or 'responsibility' in query_lower):
+                    cv_text += f"  Description: {work.description}\n"
+                
+                if work.highlights and ('accomplish' in query_lower or 'achievement' in query_lower):
+                    cv_text += "  Highlights:\n"
+                    for highlight in work.highlights[:3]:  # Limit to 3 highlights
+                        cv_text += f"   - {highlight}\n"
+        
+        if cv.projects and (focus_on_projects or 'project' in query_lower):
+            cv_text += "\nProjects:\n"
+            for project in cv.projects:
+                proj_text = f"- {project.name}"
+                if project.technologies:
+                    proj_text += f" (Technologies: {', '.join(project.technologies[:5])})"  # Limit to 5 technologies
+                cv_text += proj_text + "\n"
+                
+                if project.description and len(project.description) > 10:
 
-                        short_desc = project.description[:200] + "..." if len(project.description) > 200 else project.description
-                        cv_text += f"  Description: {short_desc}\n"
-            
-            cv_texts.append(cv_text)
+                    short_desc = project.description[:200] + "..." if len(project.description) > 200 else project.description
+                    cv_text += f"  Description: {short_desc}\n"
         
-        return "\n\n".join(cv_texts)
\ No newline at end of file
+        if not any([cv.skills, cv.education, cv.work_experience, cv.projects]) and cv.raw_text:
+            # Nothing was structured for this CV; let the model read the start of the text instead
+            cv_text += f"\nCV excerpt:\n{cv.raw_text[:settings.QUERY_RAW_TEXT_PREVIEW_CHARS]}\n"
+        
+        return cv_text
+
+llm_service: Optional[LLMService] = None
+
+def get_llm_service() -> LLMService:
+    global llm_service
+    if llm_service is None:
+        llm_service = LLMService()
+    return llm_service
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+from typing import Any, Dict, Optional
+
+import anthropic
+import spacy
+from sentence_transformers import SentenceTransformer
+
+from app.core.config import settings
+from app.core.logging import logger
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+SPACY_MODEL_NAME = "en_core_web_sm"
+# Only entities are used; the ner component in the sm model has its own tok2vec so the rest can go
+SPACY_EXCLUDED_COMPONENTS = ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "senter"]
+
+class ModelUnavailableError(Exception):
+    pass
+
+class ModelRegistry:
+    """Owns the process-wide embedding model, spaCy pipeline and LLM client; each is loaded at most once."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._embedding_model: Optional[SentenceTransformer] = None
+        self._nlp = None
+        self._llm_client: Optional[anthropic.AsyncAnthropic] = None
+        self._errors: Dict[str, str] = {}
+        self._warmed_up = False
+
+    def _load_once(self, attribute: str, name: str, loader) -> Any:
+        instance = getattr(self, attribute)
+        if instance is not None:
+            return instance
+        with self._lock:
+            instance = getattr(self, attribute)
+            if instance is None:
+                try:
+                    instance = loader()
+                    setattr(self, attribute, instance)
+                    self._errors.pop(name, None)
+                    logger.info(f"Loaded {name}")
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    logger.error(f"Failed to load {name}: {e}")
+                    raise
+        return instance
+
+    @staticmethod
+    def _load_spacy():
+        try:
+            return spacy.load(SPACY_MODEL_NAME, exclude=SPACY_EXCLUDED_COMPONENTS)
+        except OSError:
+            spacy.cli.download(SPACY_MODEL_NAME)
+            return spacy.load(SPACY_MODEL_NAME, exclude=SPACY_EXCLUDED_COMPONENTS)
+
+    def get_embedding_model(self) -> SentenceTransformer:
+        return self._load_once("_embedding_model", "embedding model", lambda: SentenceTransformer(EMBEDDING_MODEL_NAME))
+
+    def get_nlp(self):
+        return self._load_once("_nlp", "spaCy NER pipeline", self._load_spacy)
+
+    def get_llm_client(self) -> Optional[anthropic.AsyncAnthropic]:
+        try:
+            # SDK-level retries would bypass the shared rate limiter; callers retry through it instead
+            return self._load_once(
+                "_llm_client", "Anthropic client",
+                lambda: anthropic.AsyncAnthropic(
+                    api_key=settings.ANTHROPIC_API_KEY,
+                    max_retries=0,
+                    timeout=settings.LLM_REQUEST_TIMEOUT_SECONDS
+                )
+            )
+        except Exception:
+            return None
+
+    @property
+    def embedding_model(self) -> Optional[SentenceTransformer]:
+        """The embedding model if it has been loaded, without triggering a load."""
+        return self._embedding_model
+
+    async def load_embedding_model(self) -> SentenceTransformer:
+        if self._embedding_model is not None:
+            return self._embedding_model
+        return await asyncio.to_thread(self.get_embedding_model)
+
+    async def load_nlp(self):
+        if self._nlp is not None:
+            return self._nlp
+        return await asyncio.to_thread(self.get_nlp)
+
+    @staticmethod
+    def _needs_llm_client() -> bool:
+        return settings.LLM_BACKEND == "anthropic"
+
+    async def warm_up(self):
+        """Load every model off the event loop so no request pays the load latency."""
+        logger.info("Warming up models")
+        if self._needs_llm_client():
+            self.get_llm_client()
+        results = await asyncio.gather(self.load_embedding_model(), self.load_nlp(), return_exceptions=True)
+        self._warmed_up = not any(isinstance(result, Exception) for result in results)
+        logger.info(f"Model warm-up finished, ready: {self.is_ready()}")
+
+    def is_ready(self) -> bool:
+        return (
+            self._embedding_model is not None
+            and self._nlp is not None
+            and (self._llm_client is not None or not self._needs_llm_client())
+        )
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.is_ready(),
+            "warmed_up": self._warmed_up,
+            "embedding_model": self._embedding_model is not None,
+            "nlp": self._nlp is not None,
+            "llm_client": self._llm_client is not None,
+            "errors": dict(self._errors)
+        }
+
+model_registry = ModelRegistry()
+
+def get_model_registry() -> ModelRegistry:
+    return model_registry
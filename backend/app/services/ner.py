@@ -0,0 +1,30 @@
+import asyncio
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.services.model_registry import model_registry
+
+# Names and contact details sit at the top of a CV; the rest only slows NER down
+NER_MAX_CHARS = 5000
+
+async def recognize_entities(raw_text: str):
+    """Run the trimmed NER pipeline over the head of a single document."""
+    nlp = await model_registry.load_nlp()
+    return await asyncio.to_thread(nlp, raw_text[:NER_MAX_CHARS])
+
+def recognize_entities_batch(
+    texts: List[str],
+    batch_size: Optional[int] = None,
+    n_process: Optional[int] = None
+) -> List:
+    """Run NER over many documents with nlp.pipe; n_process > 1 fans batches out to worker processes."""
+    nlp = model_registry.get_nlp()
+    batch_size = batch_size or settings.NER_BATCH_SIZE
+    n_process = n_process or settings.NER_PROCESSES
+    logger.info(f"Running NER over {len(texts)} documents (batch_size={batch_size}, n_process={n_process})")
+    return list(nlp.pipe(
+        (text[:NER_MAX_CHARS] for text in texts),
+        batch_size=batch_size,
+        n_process=n_process
+    ))
@@ -0,0 +1,254 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+import pytesseract
+from pdf2image import convert_from_path, pdfinfo_from_path
+from PIL import Image
+
+from app.core.config import settings
+from app.core.logging import logger
+
+TESSERACT_CONFIG = '--psm 6 --oem 3 -l eng+osd'
+
+def _to_grayscale(image) -> np.ndarray:
+    img_np = np.array(image)
+    return img_np if img_np.ndim == 2 else cv2.cvtColor(img_np, cv2.COLOR_RGB2GRAY)
+
+def estimate_text_height(gray: np.ndarray) -> Optional[float]:
+    """Estimate the typical glyph height in pixels from the connected components of a page."""
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+
+    # Drop specks, rules and images so mostly glyphs remain
+    glyphs = (heights >= 4) & (heights <= gray.shape[0] * 0.05) & (widths <= gray.shape[1] * 0.1)
+    if glyphs.sum() < 20:
+        return None
+    return float(np.median(heights[glyphs]))
+
+def cheap_preprocess(gray: np.ndarray, target_text_height: int) -> np.ndarray:
+    """Grayscale page downscaled so text sits near the height Tesseract reads best; never upscales."""
+    text_height = estimate_text_height(gray)
+    if text_height is None or text_height <= target_text_height * 1.2:
+        return gray
+
+    scale = target_text_height / text_height
+    return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+def enhance_image_for_ocr(image):
+    try:
+        gray = _to_grayscale(image)
+
+        thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                      cv2.THRESH_BINARY, 21, 11)
+
+        denoised = cv2.fastNlMeansDenoising(thresh, None, 10, 7, 21)
+
+        kernel = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]])
+        sharpened = cv2.filter2D(denoised, -1, kernel)
+
+        kernel = np.ones((1, 1), np.uint8)
+        dilated = cv2.dilate(sharpened, kernel, iterations=1)
+
+        return Image.fromarray(dilated)
+    except Exception as e:
+        logger.error(f"Image enhancement failed: {str(e)}\n{traceback.format_exc()}")
+        return image
+
+def ocr_with_confidence(image, timeout: float) -> Tuple[str, float]:
+    """OCR an image and return its text with the mean word confidence (0-100)."""
+    data = pytesseract.image_to_data(
+        image, config=TESSERACT_CONFIG, output_type=pytesseract.Output.DICT, timeout=timeout
+    )
+
+    lines: Dict[Tuple[int, int, int], List[str]] = {}
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        confidence = float(data["conf"][i])
+        if confidence < 0 or not word.strip():
+            continue
+        confidences.append(confidence)
+        line_key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(line_key, []).append(word)
+
+    text = "\n".join(" ".join(words) for words in lines.values())
+    mean_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+    return text, mean_confidence
+
+def ocr_page(
+    image,
+    timeout: int,
+    min_confidence: float = settings.OCR_MIN_CONFIDENCE,
+    target_text_height: int = settings.OCR_TARGET_TEXT_HEIGHT
+) -> str:
+    """OCR a single page image or rendered page file. Runs inside an OCR pool worker process.
+
+    Pages go through a cheap grayscale/downscale pass first; only pages whose mean confidence
+    falls below min_confidence pay for the full denoise/sharpen enhancement and a second pass.
+    """
+    if isinstance(image, str):
+        with Image.open(image) as page_image:
+            page_image.load()
+            return ocr_page(page_image, timeout, min_confidence, target_text_height)
+
+    started = time.monotonic()
+    gray = _to_grayscale(image)
+    text, confidence = ocr_with_confidence(cheap_preprocess(gray, target_text_height), timeout)
+    if confidence >= min_confidence:
+        return text
+
+    remaining = timeout - (time.monotonic() - started)
+    if remaining <= 1:
+        return text
+
+    enhanced_text, enhanced_confidence = ocr_with_confidence(enhance_image_for_ocr(gray), remaining)
+    logger.info(f"Low OCR confidence ({confidence:.0f}), enhanced pass scored {enhanced_confidence:.0f}")
+    return enhanced_text if enhanced_confidence > confidence else text
+
+def _render_pages(file_path: str, first_page: int, last_page: int, output_dir: str, dpi: int) -> List[str]:
+    return convert_from_path(
+        file_path,
+        dpi=dpi,
+        first_page=first_page,
+        last_page=last_page,
+        output_folder=output_dir,
+        paths_only=True,
+        grayscale=True,
+        thread_count=min(last_page - first_page + 1, os.cpu_count() or 4)
+    )
+
+def _page_windows(pages: List[int], window_size: int) -> List[Tuple[int, int]]:
+    """Group sorted page numbers into contiguous (first_page, last_page) runs of at most window_size pages."""
+    windows = []
+    for page in pages:
+        if windows and page == windows[-1][1] + 1 and page - windows[-1][0] < window_size:
+            windows[-1] = (windows[-1][0], page)
+        else:
+            windows.append((page, page))
+    return windows
+
+async def iter_rasterized_windows(
+    file_path: str,
+    output_dir: str,
+    pages: Optional[List[int]] = None,
+    window_size: int = settings.OCR_RASTER_WINDOW_PAGES,
+    dpi: int = settings.OCR_RASTER_DPI
+) -> AsyncIterator[Tuple[int, List[str]]]:
+    """Render a PDF a few pages at a time to files in output_dir, yielding (first_page, page_paths).
+
+    Only the requested pages (all pages by default) are rendered. The next window is rendered
+    while the caller works on the current one, so at most two windows exist on disk and none
+    are held in memory. Files of a window are removed once the caller moves on.
+    """
+    if pages is None:
+        info = await asyncio.to_thread(pdfinfo_from_path, file_path)
+        pages = list(range(1, int(info["Pages"]) + 1))
+    windows = _page_windows(sorted(pages), max(1, window_size))
+    logger.info(f"Rasterizing {len(pages)} pages at {dpi} DPI in {len(windows)} windows of up to {window_size} pages")
+
+    next_window = None
+    try:
+        for index, (first_page, last_page) in enumerate(windows):
+            if next_window is None:
+                next_window = asyncio.create_task(
+                    asyncio.to_thread(_render_pages, file_path, first_page, last_page, output_dir, dpi)
+                )
+            paths = await next_window
+            next_window = None
+
+            if index + 1 < len(windows):
+                upcoming_first, upcoming_last = windows[index + 1]
+                next_window = asyncio.create_task(
+                    asyncio.to_thread(_render_pages, file_path, upcoming_first, upcoming_last, output_dir, dpi)
+                )
+
+            try:
+                yield first_page, paths
+            finally:
+                for path in paths:
+                    if os.path.exists(path):
+                        os.unlink(path)
+    finally:
+        if next_window is not None:
+            next_window.cancel()
+
+class OCREngine:
+    """Fans page OCR out to a bounded process pool so CPU-bound work stays off the event loop."""
+
+    def __init__(self, max_workers: Optional[int] = None, page_timeout: int = settings.OCR_PAGE_TIMEOUT_SECONDS):
+        self.max_workers = max_workers or settings.OCR_WORKERS or os.cpu_count() or 4
+        self.page_timeout = page_timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Only as many pages in flight as there are pool workers, so a page's timeout starts when it runs
+        # rather than while it waits behind other documents' pages in the pool queue
+        self._slots = asyncio.Semaphore(self.max_workers)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawn rather than fork: the parent runs database and model threads that must not be copied mid-flight
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"Started OCR process pool with {self.max_workers} workers")
+        return self._executor
+
+    async def _ocr_one(self, page_number: int, image) -> str:
+        loop = asyncio.get_running_loop()
+        try:
+            async with self._slots:
+                future = loop.run_in_executor(self._get_executor(), ocr_page, image, self.page_timeout)
+                page_text = await asyncio.wait_for(future, timeout=self.page_timeout)
+            logger.info(f"OCR extracted {len(page_text)} characters from page {page_number}")
+            return page_text
+        except asyncio.TimeoutError:
+            logger.warning(f"OCR timed out on page {page_number} after {self.page_timeout}s")
+        except BrokenProcessPool:
+            logger.error(f"OCR pool crashed while processing page {page_number}, restarting pool")
+            self.shutdown()
+        except Exception as e:
+            logger.error(f"OCR failed on page {page_number}: {str(e)}")
+        return ""
+
+    async def ocr_images(self, images: List, first_page: int = 1) -> List[str]:
+        """OCR page images concurrently; results are returned in page order."""
+        return await asyncio.gather(
+            *(self._ocr_one(first_page + i, image) for i, image in enumerate(images))
+        )
+
+    async def ocr_pdf(self, file_path: str, pages: Optional[List[int]] = None) -> Dict[int, str]:
+        """Rasterize and OCR PDF pages window by window so peak memory is bounded by the window size.
+
+        Returns the OCR text keyed by 1-based page number.
+        """
+        page_texts = {}
+        with tempfile.TemporaryDirectory(prefix="cv-ocr-") as output_dir:
+            async for first_page, paths in iter_rasterized_windows(file_path, output_dir, pages=pages):
+                window_texts = await self.ocr_images(paths, first_page=first_page)
+                for offset, page_text in enumerate(window_texts):
+                    page_texts[first_page + offset] = page_text
+        return page_texts
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("OCR process pool shut down")
+
+ocr_engine: Optional[OCREngine] = None
+
+def get_ocr_engine() -> OCREngine:
+    global ocr_engine
+    if ocr_engine is None:
+        ocr_engine = OCREngine()
+    return ocr_engine
@@ -0,0 +1,226 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from bson import ObjectId
+
+from app.core.config import settings
+from app.core.database import get_cvs_collection, get_parsed_data_collection
+from app.core.logging import logger
+from app.models.documents import CVDocument, DocumentStatus, ParsedCV, PersonalInfo
+from app.services.artifacts import ArtifactStore, get_artifact_store
+from app.services.corpus import bump_corpus_version
+from app.services.document_processing import DocumentProcessor, EXTRACTION_VERSION, NER_VERSION
+from app.services.llm_service import LLMService, PROMPT_VERSION, EMBEDDING_MODEL_NAME, EMBEDDING_TEXT_VERSION
+
+# Stage graph in execution order: stage -> stages whose output it consumes
+STAGE_DEPENDENCIES: Dict[str, List[str]] = {
+    "extract": [],
+    "ner": ["extract"],
+    "llm_structure": ["extract"],
+    "embed": ["ner", "llm_structure"],
+    "persist": ["embed"],
+}
+PIPELINE_STAGES = list(STAGE_DEPENDENCIES)
+
+class PipelineError(Exception):
+    def __init__(self, stage: str, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.stage = stage
+        self.retryable = retryable
+
+def downstream_stages(stages: Iterable[str]) -> Set[str]:
+    """Return the given stages plus every stage that transitively depends on them."""
+    affected = set(stages)
+    for stage in PIPELINE_STAGES:
+        if any(dependency in affected for dependency in STAGE_DEPENDENCIES[stage]):
+            affected.add(stage)
+    return affected
+
+def completed_fields(parsed_data_id: str) -> Dict[str, Any]:
+    """Fields set on a CV document once its parsed data has been written."""
+    return {
+        "status": DocumentStatus.COMPLETED,
+        "parsed_data_id": parsed_data_id,
+        "error_message": None,
+        "force_stages": []
+    }
+
+@dataclass
+class StageRun:
+    """A document's progress through the stages before persist."""
+    cv_document: CVDocument
+    forced: Set[str]
+    outputs: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # Stages computed in this run rather than resumed; their dependents must be recomputed too
+    recomputed: Set[str] = field(default_factory=set)
+
+class IngestionPipeline:
+    """Runs extract -> ner -> llm_structure -> embed -> persist, storing each stage's output as a
+    versioned artifact so a retry or reprocess resumes from the last completed stage."""
+
+    def __init__(self, llm_service: LLMService, artifact_store: Optional[ArtifactStore] = None):
+        self.llm_service = llm_service
+        self.artifact_store = artifact_store or get_artifact_store()
+        self.stage_versions = self._compute_stage_versions()
+
+    def _compute_stage_versions(self) -> Dict[str, str]:
+        own_versions = {
+            # The DOCX extractors order and de-duplicate table text differently
+            "extract": f"extract-{EXTRACTION_VERSION}-{settings.DOCX_EXTRACTOR}",
+            "ner": f"ner-{NER_VERSION}",
+            "llm_structure": f"llm-{self.llm_service.model_name}-p{PROMPT_VERSION}",
+            "embed": f"embed-{EMBEDDING_MODEL_NAME}-t{EMBEDDING_TEXT_VERSION}",
+            "persist": "persist",
+        }
+        # A stage's stamp includes its inputs' stamps, so upstream changes invalidate everything downstream
+        versions: Dict[str, str] = {}
+        for stage in PIPELINE_STAGES:
+            parts = sorted({versions[dependency] for dependency in STAGE_DEPENDENCIES[stage]})
+            versions[stage] = "+".join(parts + [own_versions[stage]])
+        return versions
+
+    async def run(self, cv_document: CVDocument, force_stages: Iterable[str] = ()) -> str:
+        """Run the pipeline for a stored document and return the parsed data id."""
+        outputs = await self.run_stages(cv_document, force_stages)
+        return await self._persist(cv_document, outputs)
+
+    async def run_stages(self, cv_document: CVDocument, force_stages: Iterable[str] = ()) -> Dict[str, Dict[str, Any]]:
+        """Run every stage before persist and return their outputs, leaving the write to the caller."""
+        run = self.start(cv_document, force_stages)
+        await self.advance(run)
+        return run.outputs
+
+    def start(self, cv_document: CVDocument, force_stages: Iterable[str] = ()) -> StageRun:
+        return StageRun(cv_document, downstream_stages(force_stages))
+
+    async def advance(self, run: StageRun, until: Optional[str] = None) -> None:
+        """Run the stages that have no output yet, stopping before `until` (default: persist)."""
+        for stage in PIPELINE_STAGES[:-1]:
+            if stage == until:
+                break
+            if stage in run.outputs:
+                continue
+            run.outputs[stage], from_artifact = await self._run_stage(stage, run)
+            if not from_artifact:
+                run.recomputed.add(stage)
+
+    async def run_ner_batch(self, runs: List[StageRun]) -> None:
+        """Fill in the NER stage for runs that are past extract, with one nlp.pipe call over every
+        document that has no stored artifact."""
+        pending: List[StageRun] = []
+        for run in runs:
+            if "ner" in run.outputs:
+                continue
+            stored = await self._stored_output("ner", run)
+            if stored is not None:
+                run.outputs["ner"] = stored
+            else:
+                pending.append(run)
+        if not pending:
+            return
+
+        logger.info(f"Running stage 'ner' for {len(pending)} documents in one batch")
+        personal_infos = await DocumentProcessor.extract_personal_info_batch(
+            [run.outputs["extract"]["raw_text"] for run in pending]
+        )
+        for run, personal_info in zip(pending, personal_infos):
+            data = {"personal_info": personal_info.model_dump()}
+            await self.artifact_store.put(self._input_key(run), "ner", self.stage_versions["ner"], data)
+            run.outputs["ner"] = data
+            run.recomputed.add("ner")
+
+    @staticmethod
+    def _input_key(run: StageRun) -> str:
+        return run.cv_document.content_hash or run.cv_document.id
+
+    async def _stored_output(self, stage: str, run: StageRun) -> Optional[Dict[str, Any]]:
+        # Freshly computed inputs may differ from what a stored artifact was built from
+        if stage in run.forced or any(dependency in run.recomputed for dependency in STAGE_DEPENDENCIES[stage]):
+            return None
+        stored = await self.artifact_store.get(self._input_key(run), stage, self.stage_versions[stage])
+        if stored is not None:
+            logger.info(f"Stage '{stage}' for document {run.cv_document.id} resumed from stored artifact")
+        return stored
+
+    async def _run_stage(self, stage: str, run: StageRun) -> Tuple[Dict[str, Any], bool]:
+        stored = await self._stored_output(stage, run)
+        if stored is not None:
+            return stored, True
+
+        cv_document = run.cv_document
+        logger.info(f"Running stage '{stage}' for document {cv_document.id}")
+        try:
+            data, cacheable = await getattr(self, f"_stage_{stage}")(cv_document, run.outputs)
+        except PipelineError:
+            raise
+        except Exception as e:
+            raise PipelineError(stage, f"Stage '{stage}' failed: {str(e)}") from e
+
+        if cacheable:
+            await self.artifact_store.put(self._input_key(run), stage, self.stage_versions[stage], data)
+        return data, False
+
+    async def _stage_extract(self, cv_document: CVDocument, outputs: Dict) -> Tuple[Dict[str, Any], bool]:
+        raw_text = await DocumentProcessor.extract_text(cv_document)
+        if not raw_text:
+            raise PipelineError("extract", "Failed to extract text from document", retryable=False)
+        return {"raw_text": raw_text}, True
+
+    async def _stage_ner(self, cv_document: CVDocument, outputs: Dict) -> Tuple[Dict[str, Any], bool]:
+        personal_info = await DocumentProcessor.extract_personal_info(outputs["extract"]["raw_text"])
+        return {"personal_info": personal_info.model_dump()}, True
+
+    async def _stage_llm_structure(self, cv_document: CVDocument, outputs: Dict) -> Tuple[Dict[str, Any], bool]:
+        cv_json = await self.llm_service.structure_cv(outputs["extract"]["raw_text"])
+        # An unusable response is not stored so the next reprocess asks the LLM again
+        return {"cv_json": cv_json}, cv_json is not None
+
+    def _assemble_cv(self, outputs: Dict[str, Dict[str, Any]]) -> ParsedCV:
+        raw_text = outputs["extract"]["raw_text"]
+        cv_json = outputs["llm_structure"]["cv_json"]
+        parsed_cv = self.llm_service._cv_from_json(raw_text, cv_json) if cv_json else ParsedCV(raw_text=raw_text)
+
+        # Fill gaps in the LLM's personal info with what NER and the patterns found
+        ner_info = PersonalInfo.model_validate(outputs["ner"]["personal_info"])
+        for name, value in ner_info.model_dump().items():
+            if value and not getattr(parsed_cv.personal_info, name):
+                setattr(parsed_cv.personal_info, name, value)
+        return parsed_cv
+
+    async def _stage_embed(self, cv_document: CVDocument, outputs: Dict) -> Tuple[Dict[str, Any], bool]:
+        embedding = await self.llm_service.embed_cv(self._assemble_cv(outputs))
+        return {"embedding": embedding}, True
+
+    def build_parsed_cv(self, cv_document: CVDocument, outputs: Dict[str, Dict[str, Any]]) -> ParsedCV:
+        parsed_cv = self._assemble_cv(outputs)
+        parsed_cv.embedding = outputs["embed"]["embedding"]
+        parsed_cv.id = cv_document.id
+        return parsed_cv
+
+    async def _persist(self, cv_document: CVDocument, outputs: Dict[str, Dict[str, Any]]) -> str:
+        parsed_cv = self.build_parsed_cv(cv_document, outputs)
+        self.llm_service._update_entity_map(parsed_cv)
+
+        cvs_collection = get_cvs_collection()
+        parsed_data_id = cv_document.parsed_data_id
+        if not parsed_data_id:
+            # Reserve the id on the document first so a retry after a crash overwrites instead of duplicating
+            parsed_data_id = str(ObjectId())
+            await cvs_collection.update_one(
+                {"_id": ObjectId(cv_document.id)},
+                {"$set": {"parsed_data_id": parsed_data_id}}
+            )
+
+        parsed_data_collection = get_parsed_data_collection()
+        await parsed_data_collection.replace_one(
+            {"_id": ObjectId(parsed_data_id)},
+            parsed_cv.model_dump(by_alias=True, exclude={"id"}),
+            upsert=True
+        )
+
+        await cvs_collection.update_one(
+            {"_id": ObjectId(cv_document.id)},
+            {"$set": completed_fields(parsed_data_id)}
+        )
+        await bump_corpus_version("persist")
+        return parsed_data_id
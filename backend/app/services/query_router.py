@@ -0,0 +1,290 @@
+import asyncio
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Collection, Dict, List, Optional, Set, Tuple
+
+from prometheus_client import Counter
+
+from app.core.database import get_parsed_data_collection
+from app.core.logging import logger
+from app.models.documents import CVQuery, QueryMode
+from app.services.corpus import get_corpus_version
+
+QUERY_ROUTES = Counter(
+    "cv_query_routes_total",
+    "Queries by how they were answered",
+    ["route"]
+)
+
+# Keywords that point a query at a CV section; also used to focus the LLM context
+SECTION_TERMS: Dict[str, List[str]] = {
+    "skills": ["skill", "technology", "know", "proficiency"],
+    "education": ["education", "degree", "university", "school", "college", "academic", "institution"],
+    "experience": ["experience", "work", "job", "position"],
+    "projects": ["project", "portfolio", "build"],
+}
+
+def query_sections(query: str) -> Set[str]:
+    query_lower = query.lower()
+    return {section for section, terms in SECTION_TERMS.items() if any(term in query_lower for term in terms)}
+
+DEGREE_LEVELS: Dict[str, List[str]] = {
+    "Bachelor's": ["bachelor", "bachelors", "bsc", "b.sc", "ba", "b.a", "bs", "beng", "b.eng", "undergraduate"],
+    "Master's": ["master", "masters", "msc", "m.sc", "ma", "m.a", "ms", "mba", "meng", "m.eng", "postgraduate"],
+    "PhD": ["phd", "ph.d", "doctorate", "doctoral", "dphil"],
+}
+
+COUNT_PATTERN = re.compile(r"\b(how many|number of|count)\b")
+LIST_PATTERN = re.compile(r"^\s*(who|which|list|show|find|name|give me)\b")
+COMPANY_PATTERN = re.compile(r"\b(work|works|worked|working|employed|been)\s+(at|for|with)\b")
+INSTITUTION_PATTERN = re.compile(r"\b(study|studied|graduated|attended|went to)\b")
+# Questions that need judgement rather than a lookup
+OPEN_ENDED_PATTERN = re.compile(
+    r"\b(best|rank|ranking|compare|comparison|why|recommend|suitable|fit|strongest|most|least|better|summari[sz]e|describe|explain|years?|senior|junior)\b"
+)
+# Exclusions and contrasts change the set operation in ways the indexes cannot express
+NEGATION_PATTERN = re.compile(r"\b(not|no|without|except|excluding|but|lack|lacking|non)\b|n't\b")
+CONJUNCTION_PATTERN = re.compile(r",?\s*\b(and|or)\b|,")
+# Two-letter aliases are also common words and abbreviations ("MS SQL", "BA" the airline), so they
+# only count as a degree when followed by "degree" or "in <field>"
+SHORT_DEGREE_ALIASES = {"ma", "ms", "ba", "bs"}
+COMPANY_SUFFIXES = {"inc", "llc", "ltd", "limited", "corp", "corporation", "co", "gmbh", "plc", "ag", "sa"}
+COMPANY_SUFFIX_PATTERN = re.compile(rf"[\s,]+({'|'.join(sorted(COMPANY_SUFFIXES))})\.?$")
+# Words a lookup question is phrased with. Any other word (a field of study, a year, a place, ...) is a
+# qualifier the indexes cannot apply, so the query goes to the LLM rather than being answered without it
+TEMPLATE_WORDS = {
+    "how", "many", "number", "of", "count", "who", "which", "list", "show", "find", "name", "names", "give", "me",
+    "candidates", "candidate", "people", "person", "applicants", "applicant", "cvs", "cv", "anyone", "someone",
+    "do", "does", "did", "is", "are", "was", "were", "has", "have", "had", "having", "with", "a", "an", "the",
+    "any", "all", "their", "listed", "as", "in", "and", "or",
+    "know", "knows", "knew", "known", "skill", "skills", "skilled", "technology", "technologies",
+    "proficiency", "proficient", "familiar", "use", "uses", "used", "using", "experience", "experienced",
+    "work", "works", "worked", "working", "employed", "been", "at", "for",
+    "study", "studied", "graduated", "attended", "went", "to", "from", "degree", "degrees", "hold", "holds",
+} | COMPANY_SUFFIXES
+
+def _normalize(value: str) -> str:
+    return re.sub(r"\s+", " ", value.lower()).strip(" .,")
+
+def _normalize_company(company: str) -> str:
+    return COMPANY_SUFFIX_PATTERN.sub("", _normalize(company))
+
+def degree_level(degree: str) -> Optional[str]:
+    tokens = set(re.findall(r"[a-z.]+", degree.lower().replace("'", "")))
+    tokens |= {token.strip(".") for token in tokens}
+    for level, aliases in DEGREE_LEVELS.items():
+        if tokens & set(aliases):
+            return level
+    return None
+
+def _words(query_lower: str) -> List[str]:
+    return [re.sub(r"'s$", "", word).strip(".'") for word in re.findall(r"[\w+#.'&-]+", query_lower)]
+
+def _mentions(query_lower: str, vocabulary: Collection[str], max_words: int = 5) -> List[str]:
+    """Vocabulary entries spelled out in the query, preferring the longest phrase at each position."""
+    words = _words(query_lower)
+    found = []
+    i = 0
+    while i < len(words):
+        for n in range(min(max_words, len(words) - i), 0, -1):
+            phrase = " ".join(words[i:i + n])
+            if phrase in vocabulary:
+                found.append(phrase)
+                i += n
+                break
+        else:
+            i += 1
+    return found
+
+def _degree_mentions(query_lower: str) -> Tuple[List[str], bool]:
+    """Degree levels named in the query, and whether a short alias was used in a way that may not mean a degree."""
+    words = _words(query_lower)
+    levels: List[str] = []
+    ambiguous = False
+    for i, word in enumerate(words):
+        level = next((level for level, aliases in DEGREE_LEVELS.items() if word in aliases), None)
+        if level is None:
+            continue
+        if word in SHORT_DEGREE_ALIASES:
+            following = words[i + 1:i + 3]
+            if not (following[:1] == ["degree"] or (len(following) == 2 and following[0] == "in")):
+                ambiguous = True
+                continue
+        if level not in levels:
+            levels.append(level)
+    return levels, ambiguous
+
+@dataclass
+class CandidateIndex:
+    """Inverted indexes from skills, degree levels, employers and institutions to candidates."""
+    names: Dict[str, str] = field(default_factory=dict)
+    skills: Dict[str, Set[str]] = field(default_factory=lambda: defaultdict(set))
+    degrees: Dict[str, Set[str]] = field(default_factory=lambda: defaultdict(set))
+    companies: Dict[str, Set[str]] = field(default_factory=lambda: defaultdict(set))
+    institutions: Dict[str, Set[str]] = field(default_factory=lambda: defaultdict(set))
+    display: Dict[str, str] = field(default_factory=dict)
+
+    def add(self, doc: Dict) -> None:
+        cv_id = str(doc["_id"])
+        self.names[cv_id] = (doc.get("personal_info") or {}).get("name") or f"Unnamed candidate ({cv_id})"
+        for skill in doc.get("skills") or []:
+            if skill.get("name"):
+                self._index(self.skills, _normalize(skill["name"]), skill["name"], cv_id)
+        for education in doc.get("education") or []:
+            level = degree_level(education.get("degree") or "")
+            if level:
+                self.degrees[level].add(cv_id)
+            if education.get("institution"):
+                self._index(self.institutions, _normalize(education["institution"]), education["institution"], cv_id)
+        for work in doc.get("work_experience") or []:
+            if work.get("company"):
+                self._index(self.companies, _normalize_company(work["company"]), work["company"], cv_id)
+
+    def _index(self, index: Dict[str, Set[str]], key: str, label: str, cv_id: str) -> None:
+        if key:
+            index[key].add(cv_id)
+            self.display.setdefault(key, label)
+
+@dataclass
+class StructuredQuery:
+    operation: str  # "count" or "list"
+    facet: str  # "skills", "degrees", "companies" or "institutions"
+    terms: List[str]
+    match_all: bool
+
+class QueryRouter:
+    """Answers lookup questions ("how many candidates know Kubernetes", "who worked at Google") from
+    indexes over the structured CV fields, leaving open-ended questions to the LLM.
+
+    The index is rebuilt when the corpus version changes, so answers always reflect the current CVs.
+    """
+
+    def __init__(self):
+        self._index: Optional[CandidateIndex] = None
+        self._index_version: Optional[int] = None
+        self._lock = asyncio.Lock()
+
+    async def _load_index(self) -> CandidateIndex:
+        projection = {
+            "personal_info.name": 1,
+            "skills.name": 1,
+            "education.degree": 1,
+            "education.institution": 1,
+            "work_experience.company": 1
+        }
+        index = CandidateIndex()
+        async for doc in get_parsed_data_collection().find({}, projection):
+            index.add(doc)
+        logger.info(f"Built query router index over {len(index.names)} CVs")
+        return index
+
+    async def get_index(self) -> CandidateIndex:
+        async with self._lock:
+            corpus_version = await get_corpus_version()
+            if corpus_version is None:
+                # Without a version we cannot tell whether a kept index is current
+                return await self._load_index()
+            if self._index is None or self._index_version != corpus_version:
+                self._index = await self._load_index()
+                self._index_version = corpus_version
+            return self._index
+
+    def classify(self, query: str, index: CandidateIndex) -> Optional[StructuredQuery]:
+        query_lower = _normalize(query)
+        if OPEN_ENDED_PATTERN.search(query_lower):
+            return None
+        if COUNT_PATTERN.search(query_lower):
+            operation = "count"
+        elif LIST_PATTERN.search(query_lower):
+            operation = "list"
+        else:
+            return None
+
+        if NEGATION_PATTERN.search(query_lower):
+            return None
+
+        degree_levels, ambiguous_degree = _degree_mentions(query_lower)
+        if ambiguous_degree:
+            return None
+        facet_terms = {
+            "companies": _mentions(query_lower, index.companies.keys()) if COMPANY_PATTERN.search(query_lower) else [],
+            "institutions": _mentions(query_lower, index.institutions.keys()) if INSTITUTION_PATTERN.search(query_lower) else [],
+            "degrees": degree_levels,
+            "skills": _mentions(query_lower, index.skills.keys()),
+        }
+        named = {term for facet in ("companies", "institutions") for term in facet_terms[facet]}
+        # An employer or school that is also listed as a skill ("Oracle") was meant as the former
+        facet_terms["skills"] = [term for term in facet_terms["skills"] if term not in named]
+        if any(alias in _words(term) for term in facet_terms["skills"] for aliases in DEGREE_LEVELS.values() for alias in aliases):
+            return None
+
+        facets = [facet for facet, terms in facet_terms.items() if terms]
+        if len(facets) != 1:
+            # Nothing we index was named, or several conditions across facets that one lookup cannot combine
+            return None
+        facet = facets[0]
+        terms = facet_terms[facet]
+        if facet == "skills" and not ("skills" in query_sections(query) or re.search(r"\b(with|have|has|use|uses|using|familiar|proficient)\b", query_lower)):
+            return None
+
+        recognized = {word for term in terms for word in _words(term)}
+        recognized |= {alias for aliases in DEGREE_LEVELS.values() for alias in aliases}
+        if any(word not in recognized and word not in TEMPLATE_WORDS for word in _words(query_lower)):
+            return None
+
+        # Each "and"/"or" joins one more condition; if fewer terms were recognized, one was unknown to the
+        # indexes (and may still appear in unstructured text, which only the LLM sees)
+        conjunctions = len(CONJUNCTION_PATTERN.findall(query_lower)) - sum(len(CONJUNCTION_PATTERN.findall(term)) for term in terms)
+        if len(terms) != conjunctions + 1:
+            return None
+        # " or " asks for either; otherwise several terms must all match
+        match_all = " or " not in query_lower
+        return StructuredQuery(operation, facet, terms, match_all)
+
+    def answer(self, structured: StructuredQuery, index: CandidateIndex) -> str:
+        facet_index: Dict[str, Set[str]] = getattr(index, structured.facet)
+        matches = [facet_index.get(term, set()) for term in structured.terms]
+        cv_ids = set.intersection(*matches) if structured.match_all else set.union(*matches)
+        names = sorted(index.names[cv_id] for cv_id in cv_ids)
+
+        labels = [index.display.get(term, term) for term in structured.terms]
+        joiner = " and " if structured.match_all else " or "
+        description = {
+            "skills": f"list {joiner.join(labels)} as {'skills' if len(labels) > 1 else 'a skill'}",
+            "degrees": f"hold a {joiner.join(labels)} degree",
+            "companies": f"have worked at {joiner.join(labels)}",
+            "institutions": f"studied at {joiner.join(labels)}",
+        }[structured.facet]
+
+        if not names:
+            return f"No candidates {description}."
+        summary = f"{len(names)} of {len(index.names)} candidates {description}"
+        if structured.operation == "count" and len(names) > 10:
+            return f"{summary}."
+        return f"{summary}:\n" + "\n".join(f"- {name}" for name in names)
+
+    async def route(self, query: CVQuery) -> Optional[str]:
+        """Answer the query from the indexes, or return None if it needs the LLM."""
+        # Follow-ups may refer back to earlier answers ("which of them ..."), which only the LLM can resolve
+        if query.context or query.mode != QueryMode.FOCUSED:
+            QUERY_ROUTES.labels(route="llm").inc()
+            return None
+        try:
+            index = await self.get_index()
+            structured = self.classify(query.query, index)
+        except Exception as e:
+            logger.warning(f"Query routing failed, falling back to the LLM: {str(e)}")
+            structured = None
+
+        if structured is None:
+            QUERY_ROUTES.labels(route="llm").inc()
+            return None
+        QUERY_ROUTES.labels(route=f"{structured.operation}_{structured.facet}").inc()
+        logger.info(f"Answering query from the {structured.facet} index: {structured.terms}")
+        return self.answer(structured, index)
+
+query_router = QueryRouter()
+
+def get_query_router() -> QueryRouter:
+    return query_router
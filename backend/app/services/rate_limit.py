@@ -0,0 +1,148 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from app.core.config import settings
+from app.core.database import get_redis_client
+from app.core.logging import logger
+
+# Refill both buckets to now, then take one request and the estimated tokens if both can cover it.
+# Returns 0 on success, otherwise the milliseconds to wait before trying again.
+ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local paused = redis.call('PTTL', KEYS[3])
+if paused > 0 then
+    return paused
+end
+
+local function level(key, capacity)
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    return math.min(capacity, tokens + math.max(0, now - ts) * capacity / 60000)
+end
+
+local rpm = tonumber(ARGV[2])
+local tpm = tonumber(ARGV[3])
+local requests = level(KEYS[1], rpm)
+local tokens = level(KEYS[2], tpm)
+-- A call larger than the whole bucket waits for a full bucket rather than forever
+local wanted = math.min(tonumber(ARGV[4]), tpm)
+
+local wait = 0
+if requests < 1 then
+    wait = math.max(wait, (1 - requests) * 60000 / rpm)
+end
+if tokens < wanted then
+    wait = math.max(wait, (wanted - tokens) * 60000 / tpm)
+end
+if wait > 0 then
+    return math.ceil(wait)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', requests - 1, 'ts', now)
+redis.call('HSET', KEYS[2], 'tokens', tokens - wanted, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], 120000)
+redis.call('PEXPIRE', KEYS[2], 120000)
+return 0
+"""
+
+# Correct the token bucket once the real usage is known; a negative delta charges the overrun.
+SETTLE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local tpm = tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or tpm
+local ts = tonumber(state[2]) or now
+tokens = math.min(tpm, tokens + math.max(0, now - ts) * tpm / 60000 + tonumber(ARGV[3]))
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], 120000)
+return 0
+"""
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting; about four characters per token for English text."""
+    return len(text) // 4 + 1
+
+class LLMRateLimiter:
+    """Caps in-flight LLM calls per process and shares request/token budgets across workers through Redis.
+
+    The concurrency cap is per process: the fleet-wide ceiling is max_concurrency times the number of
+    API and worker processes, while the request and token budgets are global. If Redis is unavailable
+    the limiter falls back to the process-local concurrency cap.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int = settings.LLM_MAX_CONCURRENCY,
+        requests_per_minute: int = settings.LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: int = settings.LLM_TOKENS_PER_MINUTE
+    ):
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        self.requests_key = f"ratelimit:{name}:requests"
+        self.tokens_key = f"ratelimit:{name}:tokens"
+        self.paused_key = f"ratelimit:{name}:paused"
+
+    @asynccontextmanager
+    async def acquire(self, estimated_tokens: int, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """Hold a concurrency slot with the budget for one call; waiting longer than timeout raises asyncio.TimeoutError."""
+        async with asyncio.timeout(timeout):
+            await self._semaphore.acquire()
+            try:
+                await self._wait_for_budget(estimated_tokens)
+            except BaseException:
+                self._semaphore.release()
+                raise
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+    async def _wait_for_budget(self, estimated_tokens: int) -> None:
+        while True:
+            try:
+                redis = get_redis_client()
+                wait_ms = await redis.eval(
+                    ACQUIRE_SCRIPT, 3, self.requests_key, self.tokens_key, self.paused_key,
+                    int(time.time() * 1000), self.requests_per_minute, self.tokens_per_minute, estimated_tokens
+                )
+            except Exception as e:
+                logger.warning(f"Rate limiter '{self.name}' unavailable, relying on the concurrency cap: {str(e)}")
+                return
+
+            if not wait_ms:
+                return
+            logger.info(f"Rate limiter '{self.name}' budget exhausted, waiting {wait_ms}ms")
+            await asyncio.sleep(wait_ms / 1000)
+
+    async def settle(self, estimated_tokens: int, actual_tokens: int) -> None:
+        if estimated_tokens == actual_tokens:
+            return
+        try:
+            redis = get_redis_client()
+            await redis.eval(
+                SETTLE_SCRIPT, 1, self.tokens_key,
+                int(time.time() * 1000), self.tokens_per_minute, estimated_tokens - actual_tokens
+            )
+        except Exception as e:
+            logger.warning(f"Failed to settle rate limiter '{self.name}' usage: {str(e)}")
+
+    async def pause(self, seconds: float) -> None:
+        """Stop every worker from calling the API for a while, e.g. after a 429."""
+        try:
+            redis = get_redis_client()
+            await redis.set(self.paused_key, 1, px=int(seconds * 1000))
+            logger.warning(f"Rate limiter '{self.name}' paused for {seconds}s")
+        except Exception as e:
+            logger.warning(f"Failed to pause rate limiter '{self.name}': {str(e)}")
+
+llm_rate_limiter = LLMRateLimiter("anthropic")
+
+def get_llm_rate_limiter() -> LLMRateLimiter:
+    return llm_rate_limiter
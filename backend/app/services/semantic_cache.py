@@ -0,0 +1,110 @@
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+from prometheus_client import Histogram
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.models.documents import CVQuery, QueryMode
+from app.services.llm_cache import CACHE_REQUESTS, normalize_text
+from app.services.model_registry import model_registry
+
+SEMANTIC_SIMILARITY = Histogram(
+    "cv_semantic_cache_similarity",
+    "Best cosine similarity between an incoming query and the cached queries",
+    buckets=(0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.98, 1.0)
+)
+
+@dataclass
+class SemanticCacheEntry:
+    embedding: np.ndarray
+    answer: str
+    corpus_version: int
+    created_at: float
+
+class SemanticAnswerCache:
+    """Per-process cache of recent query answers, matched by embedding similarity.
+
+    Entries are only served for the corpus version they were answered against and are evicted by
+    TTL and then least recent use. Queries with conversation context are never cached since the
+    answer depends on more than the question.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        threshold: float = settings.SEMANTIC_CACHE_THRESHOLD,
+        max_entries: int = settings.SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl: int = settings.SEMANTIC_CACHE_TTL_SECONDS
+    ):
+        self.name = name
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, SemanticCacheEntry]" = OrderedDict()
+
+    def applies_to(self, query: CVQuery) -> bool:
+        return (
+            settings.SEMANTIC_CACHE_ENABLED
+            and not query.context
+            and query.mode == QueryMode.FOCUSED
+            and model_registry.embedding_model is not None
+        )
+
+    async def embed(self, query_text: str) -> np.ndarray:
+        embedding = await asyncio.to_thread(model_registry.embedding_model.encode, query_text, normalize_embeddings=True)
+        return np.asarray(embedding, dtype="float32")
+
+    def _prune(self, corpus_version: int) -> None:
+        oldest_allowed = time.time() - self.ttl
+        stale = [
+            key for key, entry in self._entries.items()
+            if entry.corpus_version != corpus_version or entry.created_at < oldest_allowed
+        ]
+        for key in stale:
+            del self._entries[key]
+
+    async def lookup(self, query_text: str, corpus_version: int) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """Return the cached answer for a close enough query, plus the query embedding for storing a miss."""
+        try:
+            embedding = await self.embed(normalize_text(query_text))
+        except Exception as e:
+            logger.warning(f"Semantic cache '{self.name}' could not embed query: {str(e)}")
+            CACHE_REQUESTS.labels(cache=self.name, result="error").inc()
+            return None, None
+
+        self._prune(corpus_version)
+        if not self._entries:
+            CACHE_REQUESTS.labels(cache=self.name, result="miss").inc()
+            return None, embedding
+
+        keys = list(self._entries)
+        similarities = np.stack([self._entries[key].embedding for key in keys]) @ embedding
+        best = int(np.argmax(similarities))
+        SEMANTIC_SIMILARITY.observe(float(similarities[best]))
+        if similarities[best] < self.threshold:
+            CACHE_REQUESTS.labels(cache=self.name, result="miss").inc()
+            return None, embedding
+
+        self._entries.move_to_end(keys[best])
+        CACHE_REQUESTS.labels(cache=self.name, result="hit").inc()
+        logger.info(f"Semantic cache '{self.name}' hit (similarity {similarities[best]:.3f})")
+        return self._entries[keys[best]].answer, embedding
+
+    def store(self, query_text: str, embedding: np.ndarray, answer: str, corpus_version: int) -> None:
+        if not settings.SEMANTIC_CACHE_ENABLED:
+            return
+        key = normalize_text(query_text).lower()
+        self._entries[key] = SemanticCacheEntry(embedding, answer, corpus_version, time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+answer_cache = SemanticAnswerCache("semantic_answers")
+
+def get_answer_cache() -> SemanticAnswerCache:
+    return answer_cache
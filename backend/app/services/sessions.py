@@ -0,0 +1,101 @@
+from datetime import datetime
+from typing import List
+
+from app.core.config import settings
+from app.core.database import get_redis_client
+from app.core.logging import logger
+from app.models.documents import ConversationSession, ConversationTurn
+from app.services.circuit_breaker import Deadline, call_with_retries
+from app.services.llm_service import get_llm_service
+
+class SessionStore:
+    """Conversation sessions in Redis: a running summary plus the most recent turns.
+
+    Once a session holds more than SESSION_MAX_TURNS turns, the oldest are folded into the summary,
+    so the history sent with a follow-up stays the same size however long the conversation runs.
+    """
+
+    def __init__(self, ttl: int = settings.SESSION_TTL_SECONDS, max_turns: int = settings.SESSION_MAX_TURNS):
+        self.ttl = ttl
+        self.max_turns = max_turns
+
+    @staticmethod
+    def _key(session_id: str) -> str:
+        return f"session:{session_id}"
+
+    async def load(self, session_id: str) -> ConversationSession:
+        """Return the stored session, or a fresh one if it expired, never existed or cannot be read."""
+        try:
+            value = await get_redis_client().get(self._key(session_id))
+            if value:
+                return ConversationSession.model_validate_json(value)
+        except Exception as e:
+            logger.warning(f"Failed to load session {session_id}, starting a new one: {str(e)}")
+        return ConversationSession(id=session_id)
+
+    async def save(self, session: ConversationSession) -> None:
+        session.updated_at = datetime.utcnow()
+        try:
+            await get_redis_client().set(self._key(session.id), session.model_dump_json(), ex=self.ttl)
+        except Exception as e:
+            logger.warning(f"Failed to save session {session.id}: {str(e)}")
+
+    async def record_turn(self, session: ConversationSession, question: str, answer: str) -> None:
+        answer = answer if len(answer) <= settings.SESSION_TURN_MAX_CHARS else answer[:settings.SESSION_TURN_MAX_CHARS] + "..."
+        session.turns.append(ConversationTurn(question=question, answer=answer))
+        await self.save(session)
+
+    def needs_folding(self, session: ConversationSession) -> bool:
+        return len(session.turns) > self.max_turns
+
+    async def fold(self, session_id: str) -> None:
+        """Fold the oldest turns into the summary; meant to run after the response has been sent."""
+        session = await self.load(session_id)
+        if not self.needs_folding(session):
+            return
+        # Fold down to half the limit so the summarization call happens every few turns, not every turn
+        folded = session.turns[:len(session.turns) - self.max_turns // 2]
+        summary = await self._summarize(session.summary, folded)
+
+        # Turns may have been recorded while the summary was written; keep those
+        session = await self.load(session_id)
+        if session.turns[:len(folded)] != folded:
+            logger.info(f"Session {session_id} was folded concurrently, discarding this summary")
+            return
+        session.turns = session.turns[len(folded):]
+        session.summary = summary
+        await self.save(session)
+
+    async def _summarize(self, summary: str, turns: List[ConversationTurn]) -> str:
+        max_chars = settings.SESSION_SUMMARY_MAX_TOKENS * 4
+        exchanges = "\n\n".join(f"User: {turn.question}\nAssistant: {turn.answer}" for turn in turns)
+        llm_service = get_llm_service()
+        try:
+            response = await call_with_retries(
+                lambda: llm_service._create_message(
+                    max_tokens=settings.SESSION_SUMMARY_MAX_TOKENS,
+                    system="You summarize conversations about candidate CVs for a recruiter's assistant.",
+                    messages=[{
+                        "role": "user",
+                        "content": (
+                            "Update the summary of the conversation with the exchanges below. Keep the candidate names, "
+                            "the facts established about them and what the user is looking for. Reply with the summary only, "
+                            f"in under {settings.SESSION_SUMMARY_MAX_TOKENS // 2} words.\n\n"
+                            f"Current summary:\n{summary or '(none)'}\n\nExchanges:\n{exchanges}"
+                        )
+                    }]
+                ),
+                Deadline(settings.LLM_QUERY_DEADLINE_SECONDS),
+                is_retryable=llm_service.backend.is_retryable
+            )
+            return response.text.strip()[:max_chars]
+        except Exception as e:
+            # Keep the questions at least; they carry most of what a follow-up refers back to
+            logger.warning(f"Failed to summarize conversation, keeping earlier questions only: {str(e)}")
+            questions = " ".join(f"Asked: {turn.question}" for turn in turns)
+            return f"{summary} {questions}".strip()[-max_chars:]
+
+session_store = SessionStore()
+
+def get_session_store() -> SessionStore:
+    return session_store
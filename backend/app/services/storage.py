@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import os
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import UploadFile
+
+UPLOAD_DIR = Path("data/uploads")
+INCOMING_DIR = UPLOAD_DIR / ".incoming"
+COPY_CHUNK_SIZE = 1024 * 1024
+SNIFF_BYTES = 1024
+
+class UploadRejected(Exception):
+    pass
+
+@dataclass
+class StoredUpload:
+    file_path: str
+    file_size: int
+    content_hash: str
+    created: bool = True
+
+def detect_document_type(head: bytes) -> Optional[str]:
+    """Identify a document type from its leading bytes."""
+    # The PDF spec tolerates junk before the header within the first 1024 bytes
+    if b"%PDF-" in head[:SNIFF_BYTES]:
+        return "pdf"
+    if head.startswith(b"PK\x03\x04"):
+        return "docx"
+    return None
+
+def hash_file(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(COPY_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def sharded_path(content_hash: str, file_ext: str) -> Path:
+    return UPLOAD_DIR / content_hash[:2] / content_hash[2:4] / f"{content_hash}.{file_ext}"
+
+class UploadWriter:
+    """Copies an upload chunk by chunk, enforcing the per-file size limit and hashing as it goes,
+    then moves it to its content-addressed location. The request body itself is capped earlier by
+    UploadSizeLimitMiddleware."""
+
+    def __init__(self, file_ext: str, max_size: int):
+        self.file_ext = file_ext
+        self.max_size = max_size
+        self.size = 0
+        self.head = b""
+        self.digest = hashlib.sha256()
+
+        INCOMING_DIR.mkdir(parents=True, exist_ok=True)
+        self.temp_path = INCOMING_DIR / f"{ObjectId()}.part"
+        self.temp_file = open(self.temp_path, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > self.max_size:
+            raise UploadRejected(f"File too large. Maximum size: {self.max_size // (1024 * 1024)}MB")
+
+        if len(self.head) < SNIFF_BYTES:
+            self.head += chunk[:SNIFF_BYTES - len(self.head)]
+            if len(self.head) >= SNIFF_BYTES and detect_document_type(self.head) != self.file_ext:
+                raise UploadRejected(f"File content is not a valid {self.file_ext.upper()} document")
+
+        self.digest.update(chunk)
+        self.temp_file.write(chunk)
+
+    def commit(self) -> StoredUpload:
+        self.temp_file.close()
+        if detect_document_type(self.head) != self.file_ext:
+            self.abort()
+            raise UploadRejected(f"File content is not a valid {self.file_ext.upper()} document")
+
+        content_hash = self.digest.hexdigest()
+        file_path = sharded_path(content_hash, self.file_ext)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Identical content is already on disk under the same name
+        created = not file_path.exists()
+        if created:
+            os.replace(self.temp_path, file_path)
+        else:
+            self.abort()
+        return StoredUpload(file_path=str(file_path), file_size=self.size, content_hash=content_hash, created=created)
+
+    def abort(self) -> None:
+        self.temp_file.close()
+        if self.temp_path.exists():
+            self.temp_path.unlink()
+
+async def save_upload(upload: UploadFile, file_ext: str, max_size: int) -> StoredUpload:
+    """Stream an UploadFile to storage without blocking the event loop on file I/O."""
+    writer = await asyncio.to_thread(UploadWriter, file_ext, max_size)
+    try:
+        while chunk := await upload.read(COPY_CHUNK_SIZE):
+            await asyncio.to_thread(writer.write, chunk)
+        return await asyncio.to_thread(writer.commit)
+    except BaseException:
+        await asyncio.to_thread(writer.abort)
+        raise
+
+def save_stream(source: BinaryIO, file_ext: str, max_size: int) -> StoredUpload:
+    writer = UploadWriter(file_ext, max_size)
+    try:
+        while chunk := source.read(COPY_CHUNK_SIZE):
+            writer.write(chunk)
+        return writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
+
+def save_archive(
+    source: BinaryIO,
+    allowed_types: List[str],
+    max_file_size: int,
+    max_files: int
+) -> Tuple[List[Tuple[str, StoredUpload]], List[Dict[str, str]]]:
+    """Store every allowed document inside a zip archive.
+
+    Returns (filename, StoredUpload) pairs for stored members and a list of rejected members
+    with the reason they were skipped.
+    """
+    stored: List[Tuple[str, StoredUpload]] = []
+    rejected: List[Dict[str, str]] = []
+
+    with zipfile.ZipFile(source) as archive:
+        for member in archive.infolist():
+            member_path = PurePosixPath(member.filename)
+            if member.is_dir() or member_path.name.startswith(".") or "__MACOSX" in member_path.parts:
+                continue
+
+            file_ext = member_path.suffix.lower().lstrip(".")
+            if file_ext not in allowed_types:
+                rejected.append({"filename": member.filename, "reason": "Invalid file type"})
+                continue
+            if len(stored) >= max_files:
+                rejected.append({"filename": member.filename, "reason": "Batch file limit reached"})
+                continue
+
+            try:
+                with archive.open(member) as member_stream:
+                    stored.append((member_path.name, save_stream(member_stream, file_ext, max_file_size)))
+            except UploadRejected as e:
+                rejected.append({"filename": member.filename, "reason": str(e)})
+
+    return stored, rejected
+
+def discard_upload(stored: StoredUpload, in_use_path: Optional[str] = None) -> None:
+    """Remove a stored upload, unless the file predates this upload or another document already points at it."""
+    if not stored.created or stored.file_path == in_use_path:
+        return
+    if os.path.exists(stored.file_path):
+        os.unlink(stored.file_path)
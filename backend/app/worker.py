@@ -0,0 +1,144 @@
+import argparse
+import asyncio
+import signal
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.database import (
+    connect_to_mongodb,
+    connect_to_redis,
+    close_mongodb_connection,
+    close_redis_connection,
+    maintain_database_connections,
+    get_cvs_collection
+)
+from app.models.documents import DocumentStatus
+from app.services.ingestion import IngestionError, ingest_document, mark_document_failed
+from app.services.job_queue import Job, JobQueue, get_ingestion_queue
+from app.services.model_registry import get_model_registry
+from app.services.ocr import get_ocr_engine
+
+async def enqueue_pending_documents(queue: JobQueue) -> int:
+    """Enqueue PENDING documents that never reached the queue (e.g. uploaded while Redis was down)."""
+    cvs_collection = get_cvs_collection()
+    enqueued = 0
+    async for document in cvs_collection.find({"status": DocumentStatus.PENDING}, {"_id": 1}):
+        if await queue.enqueue(str(document["_id"])):
+            enqueued += 1
+    if enqueued:
+        logger.info(f"Swept {enqueued} pending documents into queue '{queue.name}'")
+    return enqueued
+
+async def keep_job_visible(queue: JobQueue, job: Job):
+    while True:
+        await asyncio.sleep(queue.visibility_timeout / 3)
+        try:
+            await queue.extend(job)
+        except Exception as e:
+            logger.warning(f"Failed to extend visibility of job {job.job_id}: {str(e)}")
+
+async def handle_job(queue: JobQueue, job: Job):
+    if job.attempts > queue.max_attempts:
+        await mark_document_failed(job.job_id, "Processing abandoned after repeated worker failures")
+        await queue.dead_letter(job)
+        return
+
+    logger.info(f"Worker picked up document {job.job_id} (attempt {job.attempts}/{queue.max_attempts})")
+    heartbeat = asyncio.create_task(keep_job_visible(queue, job))
+    try:
+        await ingest_document(job.job_id)
+    except Exception as e:
+        retryable = getattr(e, "retryable", True)
+        logger.error(f"Error processing document {job.job_id}: {str(e)}", exc_info=not isinstance(e, IngestionError))
+
+        if retryable and job.attempts < queue.max_attempts:
+            await mark_document_failed(job.job_id, str(e), final=False)
+            await queue.retry(job)
+        else:
+            await mark_document_failed(job.job_id, str(e))
+            await queue.dead_letter(job)
+        return
+    finally:
+        heartbeat.cancel()
+
+    # Kept out of the failure path: the document is already COMPLETED, and if the ack is lost the job
+    # is redelivered after the visibility timeout and skipped as already processed
+    await queue.ack(job)
+
+async def consume(queue: JobQueue, worker_id: int, stop_event: asyncio.Event):
+    logger.info(f"Ingestion worker {worker_id} started")
+    while not stop_event.is_set():
+        try:
+            job = await queue.dequeue()
+        except Exception as e:
+            logger.error(f"Worker {worker_id} failed to dequeue: {str(e)}")
+            await asyncio.sleep(settings.INGESTION_POLL_INTERVAL_SECONDS * 5)
+            continue
+
+        if job is None:
+            await asyncio.sleep(settings.INGESTION_POLL_INTERVAL_SECONDS)
+            continue
+
+        try:
+            await handle_job(queue, job)
+        except Exception as e:
+            # The job stays in flight and is requeued once its visibility timeout expires
+            logger.error(f"Worker {worker_id} failed to handle job {job.job_id}: {str(e)}", exc_info=True)
+    logger.info(f"Ingestion worker {worker_id} stopped")
+
+async def supervise(queue: JobQueue, stop_event: asyncio.Event):
+    """Periodically recover expired jobs, sweep unqueued documents and refresh queue metrics."""
+    last_sweep = 0.0
+    loop = asyncio.get_running_loop()
+    while not stop_event.is_set():
+        try:
+            await queue.requeue_expired()
+            if loop.time() - last_sweep >= settings.INGESTION_SWEEP_INTERVAL_SECONDS:
+                await enqueue_pending_documents(queue)
+                last_sweep = loop.time()
+            await queue.stats()
+        except Exception as e:
+            logger.error(f"Error in queue supervisor: {str(e)}")
+        await asyncio.sleep(settings.INGESTION_POLL_INTERVAL_SECONDS * 5)
+
+async def run_worker(concurrency: int):
+    logger.info(f"Starting ingestion worker pool with concurrency {concurrency}")
+    await connect_to_mongodb()
+    await connect_to_redis()
+    maintenance = asyncio.create_task(maintain_database_connections())
+    
+    if settings.MODEL_WARMUP_ON_STARTUP:
+        await get_model_registry().warm_up()
+
+    queue = get_ingestion_queue()
+    stop_event = asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    tasks = [asyncio.create_task(consume(queue, i + 1, stop_event)) for i in range(concurrency)]
+    tasks.append(asyncio.create_task(supervise(queue, stop_event)))
+
+    await stop_event.wait()
+    logger.info("Shutdown requested, waiting for in-flight jobs to finish")
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    maintenance.cancel()
+    get_ocr_engine().shutdown()
+    await close_mongodb_connection()
+    await close_redis_connection()
+
+def main():
+    parser = argparse.ArgumentParser(description="CV ingestion worker")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.INGESTION_WORKER_CONCURRENCY,
+        help="Number of documents processed concurrently by this worker process"
+    )
+    args = parser.parse_args()
+    asyncio.run(run_worker(args.concurrency))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Compare the streaming DOCX extractor with the python-docx one for speed, memory and output.
+
+Run from the backend directory:
+
+    python -m benchmarks.docx_extraction data/uploads --repeat 5 --output docx.json
+"""
+import argparse
+import json
+import logging
+import re
+import resource
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Callable, Dict, List
+
+EXTRACTORS = ["python-docx", "streaming"]
+
+def _get_extractor(name: str) -> Callable[[str], str]:
+    from app.services.document_processing import DocumentProcessor
+
+    # Keep per-document log lines out of the timings and out of the JSON report
+    logging.getLogger().setLevel(logging.WARNING)
+    if name == "python-docx":
+        return DocumentProcessor._extract_text_from_docx_python_docx
+    return DocumentProcessor._extract_text_from_docx_streaming
+
+def collect_files(paths: List[str]) -> List[str]:
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(str(p) for p in sorted(path.rglob("*.docx")))
+        elif path.suffix.lower() == ".docx":
+            files.append(str(path))
+    return files
+
+def time_extractor(name: str, files: List[str], repeat: int) -> Dict:
+    extract = _get_extractor(name)
+    durations = []
+    for file_path in files:
+        runs = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            extract(file_path)
+            runs.append(time.perf_counter() - started)
+        durations.append(min(runs))
+
+    total = sum(durations)
+    return {
+        "total_seconds": round(total, 4),
+        "mean_ms": round(statistics.mean(durations) * 1000, 3),
+        "p95_ms": round(sorted(durations)[int(0.95 * (len(durations) - 1))] * 1000, 3),
+        "documents_per_second": round(len(files) / total, 2) if total else None
+    }
+
+def measure_peak_memory(name: str, files: List[str]) -> int:
+    """Peak RSS growth in KiB while extracting every file; runs in a fresh process per extractor."""
+    extract = _get_extractor(name)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    for file_path in files:
+        extract(file_path)
+    return max(0, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline)
+
+def _tokens(text: str) -> List[str]:
+    return re.findall(r"\w+", text.lower())
+
+def compare_outputs(files: List[str]) -> Dict:
+    """Exact equality, plus vocabulary equality since the extractors order and de-duplicate table text differently."""
+    reference = _get_extractor("python-docx")
+    candidate = _get_extractor("streaming")
+    identical = 0
+    same_vocabulary = 0
+    differences = []
+
+    for file_path in files:
+        expected, actual = reference(file_path), candidate(file_path)
+        if expected == actual:
+            identical += 1
+        missing = set(_tokens(expected)) - set(_tokens(actual))
+        extra = set(_tokens(actual)) - set(_tokens(expected))
+        if not missing and not extra:
+            same_vocabulary += 1
+        else:
+            differences.append({
+                "file": file_path,
+                "missing_tokens": sorted(missing)[:20],
+                "extra_tokens": sorted(extra)[:20],
+                "python_docx_chars": len(expected),
+                "streaming_chars": len(actual)
+            })
+
+    return {
+        "identical": identical,
+        "same_vocabulary": same_vocabulary,
+        "differences": differences
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DOCX text extractors")
+    parser.add_argument("paths", nargs="+", help="DOCX files or directories to scan for them")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per file; the fastest is kept")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    files = collect_files(args.paths)
+    if not files:
+        parser.error("No DOCX files found")
+
+    report = {"documents": len(files), "extractors": {}}
+    for name in EXTRACTORS:
+        result = time_extractor(name, files, args.repeat)
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            result["peak_rss_growth_kib"] = executor.submit(measure_peak_memory, name, files).result()
+        report["extractors"][name] = result
+
+    baseline = report["extractors"]["python-docx"]["total_seconds"]
+    streaming = report["extractors"]["streaming"]["total_seconds"]
+    report["speedup"] = round(baseline / streaming, 2) if streaming else None
+    report["equivalence"] = compare_outputs(files)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    print(output)
+
+if __name__ == "__main__":
+    main()
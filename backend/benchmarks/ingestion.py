@@ -0,0 +1,207 @@
+"""Measure ingestion speed stage by stage, with the LLM replaced by recorded responses.
+
+Run from the backend directory:
+
+    python -m benchmarks.ingestion data/sample_cvs data/uploads --output ingestion.json
+
+Record real responses for the sample set once with --record (needs ANTHROPIC_API_KEY); files
+without a recording are parsed from the canned response in benchmarks/fixtures.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import resource
+import statistics
+import subprocess
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BENCHMARK_DIR = Path(__file__).parent
+DEFAULT_PATHS = ["data/sample_cvs", "data/uploads"]
+DEFAULT_RESPONSES = BENCHMARK_DIR / "fixtures" / "recorded_responses.json"
+CANNED_RESPONSE = BENCHMARK_DIR / "fixtures" / "llm_response.txt"
+
+class RecordedLLM:
+    """Stands in for the Anthropic API by replaying raw response text keyed by file content hash."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.responses: Dict[str, str] = json.loads(path.read_text()) if path.exists() else {}
+        self.canned = CANNED_RESPONSE.read_text()
+        self.misses = 0
+
+    def response_for(self, content_hash: str) -> str:
+        if content_hash in self.responses:
+            return self.responses[content_hash]
+        self.misses += 1
+        return self.canned
+
+    async def record(self, content_hash: str, raw_text: str, llm_service) -> None:
+        if content_hash in self.responses:
+            return
+        response = await llm_service._create_message(
+            max_tokens=4000,
+            messages=[{"role": "user", "content": llm_service._create_cv_parsing_prompt(raw_text)}]
+        )
+        self.responses[content_hash] = response.text
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(self.responses, indent=2))
+
+def collect_files(paths: List[str]) -> List[Path]:
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(
+                p for p in sorted(path.rglob("*"))
+                if p.suffix.lower() in (".pdf", ".docx") and ".incoming" not in p.parts
+            )
+        elif path.suffix.lower() in (".pdf", ".docx"):
+            files.append(path)
+    return files
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+def summarize(durations: List[float], pages: int = 0) -> Dict:
+    total = sum(durations)
+    summary = {
+        "count": len(durations),
+        "p50_ms": round(percentile(durations, 0.5) * 1000, 2),
+        "p95_ms": round(percentile(durations, 0.95) * 1000, 2),
+        "mean_ms": round(statistics.mean(durations) * 1000, 2),
+        "total_seconds": round(total, 3)
+    }
+    if pages:
+        summary["pages"] = pages
+        summary["pages_per_second"] = round(pages / total, 2) if total else None
+    return summary
+
+def resource_usage() -> Dict:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        "cpu_seconds": round(own.ru_utime + own.ru_stime, 3),
+        "children_cpu_seconds": round(children.ru_utime + children.ru_stime, 3),
+        # ru_maxrss is reported in KiB on Linux
+        "peak_rss_mib": round(own.ru_maxrss / 1024, 1),
+        "children_peak_rss_mib": round(children.ru_maxrss / 1024, 1)
+    }
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run_benchmark(files: List[Path], recorded: RecordedLLM, record: bool, skip_ocr: bool) -> Dict:
+    from app.models.documents import CVDocument, DocumentType
+    from app.services.document_processing import DocumentProcessor
+    from app.services.llm_service import get_llm_service
+    from app.services.model_registry import get_model_registry
+    from app.services.ocr import get_ocr_engine
+    from app.services.storage import hash_file
+
+    # Importing the app configures logging; keep per-document log lines out of the timings
+    logging.getLogger().setLevel(logging.WARNING)
+    registry = get_model_registry()
+    llm_service = get_llm_service()
+    timings: Dict[str, List[float]] = defaultdict(list)
+    pages: Dict[str, int] = defaultdict(int)
+
+    # Model loading is reported on its own so it does not skew the first document's stages
+    model_load: Dict[str, float] = {}
+    for name, load in (("embedding_model", registry.load_embedding_model), ("nlp", registry.load_nlp)):
+        started = time.perf_counter()
+        await load()
+        model_load[name] = round(time.perf_counter() - started, 3)
+
+    async def timed(stage: str, coroutine, page_count: int = 0):
+        started = time.perf_counter()
+        result = await coroutine
+        timings[stage].append(time.perf_counter() - started)
+        pages[stage] += page_count
+        return result
+
+    started_at = time.perf_counter()
+    for file_path in files:
+        file_type = DocumentType.PDF if file_path.suffix.lower() == ".pdf" else DocumentType.DOCX
+        cv_document = CVDocument(
+            filename=file_path.name,
+            file_type=file_type,
+            file_size=file_path.stat().st_size,
+            file_path=str(file_path)
+        )
+        content_hash = hash_file(str(file_path))
+
+        page_count = 0
+        if file_type == DocumentType.PDF:
+            page_texts = await timed("text_layer", asyncio.to_thread(DocumentProcessor._extract_text_layer, str(file_path)))
+            page_count = len(page_texts)
+            pages["text_layer"] += page_count
+            if not skip_ocr:
+                await timed("ocr", get_ocr_engine().ocr_pdf(str(file_path)), page_count)
+
+        raw_text = await timed(f"extract_{file_type.value}", DocumentProcessor.extract_text(cv_document), page_count)
+        if not raw_text:
+            continue
+
+        await timed("ner", DocumentProcessor.extract_personal_info(raw_text))
+
+        if record:
+            await recorded.record(content_hash, raw_text, llm_service)
+        response_text = recorded.response_for(content_hash)
+        started = time.perf_counter()
+        cv_json = llm_service._extract_json_from_response(response_text)
+        parsed_cv = llm_service._cv_from_json(raw_text, cv_json or {})
+        timings["llm_parse"].append(time.perf_counter() - started)
+
+        await timed("embed", llm_service.embed_cv(parsed_cv))
+
+    wall_seconds = time.perf_counter() - started_at
+    # OCR workers only count towards RUSAGE_CHILDREN once they have exited
+    get_ocr_engine().shutdown()
+
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "documents": len(files),
+        "wall_seconds": round(wall_seconds, 3),
+        "documents_per_second": round(len(files) / wall_seconds, 3) if wall_seconds else None,
+        "model_load_seconds": model_load,
+        "stages": {stage: summarize(durations, pages[stage]) for stage, durations in timings.items()},
+        "llm_recording_misses": recorded.misses,
+        "resources": resource_usage()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ingestion stages over sample CVs")
+    parser.add_argument("paths", nargs="*", default=DEFAULT_PATHS, help="CV files or directories")
+    parser.add_argument("--responses", type=Path, default=DEFAULT_RESPONSES, help="Recorded LLM responses (JSON)")
+    parser.add_argument("--record", action="store_true", help="Call the real LLM for files without a recording and save it")
+    parser.add_argument("--skip-ocr", action="store_true", help="Skip the forced full-document OCR stage")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    files = collect_files(args.paths)
+    if not files:
+        parser.error("No PDF or DOCX files found")
+
+    recorded = RecordedLLM(args.responses)
+    report = asyncio.run(run_benchmark(files, recorded, args.record, args.skip_ocr))
+    if args.record:
+        recorded.save()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    print(output)
+
+if __name__ == "__main__":
+    main()
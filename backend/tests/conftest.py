@@ -0,0 +1,6 @@
+import os
+
+# Settings require connection URLs; the unit tests never connect, so any well-formed value will do
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
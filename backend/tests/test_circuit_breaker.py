@@ -0,0 +1,155 @@
+import asyncio
+
+import pytest
+
+from app.services import circuit_breaker
+from app.services.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    Deadline,
+    DeadlineExceeded,
+    call_with_retries,
+)
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", clock)
+    return clock
+
+def make_breaker(**overrides) -> CircuitBreaker:
+    options = dict(failure_rate_threshold=0.5, minimum_calls=4, window_seconds=60, open_seconds=30)
+    options.update(overrides)
+    return CircuitBreaker("test", **options)
+
+async def call(breaker: CircuitBreaker, fail: bool = False, is_failure=lambda e: True):
+    async with breaker.protect(is_failure):
+        if fail:
+            raise RuntimeError("upstream failed")
+
+def test_opens_at_failure_rate_after_minimum_calls(clock):
+    breaker = make_breaker()
+    breaker.record(False)
+    breaker.record(False)
+    breaker.record(False)
+    # Below the minimum number of calls, the rate is not trusted yet
+    assert breaker.state == CLOSED
+    breaker.record(True)
+    assert breaker.state == OPEN
+
+def test_stays_closed_below_failure_rate(clock):
+    breaker = make_breaker()
+    for success in (True, True, False, True, True):
+        breaker.record(success)
+    assert breaker.state == CLOSED
+
+def test_outcomes_leave_the_window(clock):
+    breaker = make_breaker()
+    breaker.record(False)
+    breaker.record(False)
+    clock.now += 61
+    breaker.record(False)
+    breaker.record(True)
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["recent_calls"] == 2
+
+def test_fails_fast_while_open_then_probes(clock):
+    breaker = make_breaker()
+    breaker._transition(OPEN)
+
+    with pytest.raises(CircuitOpenError) as raised:
+        breaker.before_call()
+    assert raised.value.retry_after == pytest.approx(30)
+
+    clock.now += 30
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+@pytest.mark.parametrize("probe_succeeds, state", [(True, CLOSED), (False, OPEN)])
+def test_probe_decides_state(clock, probe_succeeds, state):
+    breaker = make_breaker()
+    breaker._transition(OPEN)
+    clock.now += 30
+
+    if probe_succeeds:
+        asyncio.run(call(breaker))
+    else:
+        with pytest.raises(RuntimeError):
+            asyncio.run(call(breaker, fail=True))
+    assert breaker.state == state
+
+def test_errors_that_are_not_upstream_failures_are_not_counted(clock):
+    breaker = make_breaker(minimum_calls=1)
+    with pytest.raises(RuntimeError):
+        asyncio.run(call(breaker, fail=True, is_failure=lambda e: False))
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["recent_calls"] == 0
+
+def test_cancelled_probe_frees_its_slot(clock):
+    breaker = make_breaker()
+    breaker._transition(OPEN)
+    clock.now += 30
+
+    async def cancelled_probe():
+        async with breaker.protect():
+            raise asyncio.CancelledError()
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(cancelled_probe())
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+
+def test_deadline_expiry_counts_as_failure():
+    breaker = make_breaker(minimum_calls=1)
+
+    async def hung_upstream():
+        async with breaker.protect():
+            await asyncio.sleep(10)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(call_with_retries(hung_upstream, Deadline(0.05)))
+    assert breaker.state == OPEN
+
+def test_retries_until_success():
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RuntimeError("transient")
+        return "ok"
+
+    result = asyncio.run(call_with_retries(flaky, Deadline(5), max_attempts=3, base_delay=0.01, max_delay=0.01))
+    assert result == "ok"
+    assert len(attempts) == 3
+
+def test_does_not_retry_open_circuit_or_permanent_errors():
+    attempts = []
+
+    async def open_circuit():
+        attempts.append(1)
+        raise CircuitOpenError("test", 10)
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(call_with_retries(open_circuit, Deadline(5), base_delay=0.01))
+
+    async def bad_request():
+        attempts.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(call_with_retries(bad_request, Deadline(5), base_delay=0.01, is_retryable=lambda e: False))
+    assert len(attempts) == 2
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.api.endpoints import documents
+from app.models.documents import DocumentStatus
+from app.services.pipeline import PIPELINE_STAGES
+
+class UpdateResult:
+    def __init__(self, matched_count: int):
+        self.matched_count = matched_count
+
+class FakeCollection:
+    """Applies update_one's status filter to a single stored document."""
+
+    def __init__(self, document: dict):
+        self.document = document
+
+    async def update_one(self, query, update):
+        if query["_id"] != self.document["_id"] or self.document["status"] == query["status"]["$ne"]:
+            return UpdateResult(0)
+        self.document.update(update["$set"])
+        return UpdateResult(1)
+
+class FakeQueue:
+    def __init__(self):
+        self.enqueued = []
+
+    async def enqueue(self, job_id: str) -> bool:
+        self.enqueued.append(job_id)
+        return True
+
+@pytest.fixture
+def store(monkeypatch):
+    def make(status: DocumentStatus):
+        collection = FakeCollection({"_id": ObjectId(), "status": status, "force_stages": []})
+        queue = FakeQueue()
+        monkeypatch.setattr(documents, "get_cvs_collection", lambda: collection)
+        monkeypatch.setattr(documents, "get_ingestion_queue", lambda: queue)
+        return collection, queue
+    return make
+
+def test_force_reprocess_of_a_completed_document_is_queued(store):
+    collection, queue = store(DocumentStatus.COMPLETED)
+    response = asyncio.run(documents._link_duplicate(dict(collection.document), force_reprocess=True))
+
+    assert response["duplicate"] is True
+    assert collection.document["status"] == DocumentStatus.PENDING
+    assert collection.document["force_stages"] == PIPELINE_STAGES
+    assert queue.enqueued == [str(collection.document["_id"])]
+
+def test_force_reprocess_of_a_document_in_flight_is_refused(store):
+    collection, queue = store(DocumentStatus.PROCESSING)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(documents._link_duplicate(dict(collection.document), force_reprocess=True))
+
+    assert error.value.status_code == 409
+    assert collection.document["status"] == DocumentStatus.PROCESSING
+    assert collection.document["force_stages"] == []
+    assert queue.enqueued == []
@@ -0,0 +1,101 @@
+import re
+import zipfile
+
+import docx
+import pytest
+
+from app.services.docx_extractor import extract_docx_text, iter_docx_blocks
+
+def python_docx_text(file_path) -> str:
+    """The python-docx extractor's output before preprocessing: paragraphs, then table rows."""
+    document = docx.Document(file_path)
+    blocks = [para.text for para in document.paragraphs if para.text.strip()]
+    for table in document.tables:
+        for row in table.rows:
+            row_text = " | ".join(cell.text for cell in row.cells if cell.text.strip())
+            if row_text:
+                blocks.append(row_text)
+    return "\n\n".join(blocks)
+
+def tokens(text: str):
+    return set(re.findall(r"\w+", text.lower()))
+
+@pytest.fixture
+def cv_path(tmp_path):
+    document = docx.Document()
+    document.add_heading("Ann Smith", level=1)
+    document.add_paragraph("ann@example.com")
+    document.add_paragraph("")
+    document.add_paragraph("Senior engineer with ten years of Python.")
+    table = document.add_table(rows=2, cols=3)
+    for row, values in zip(table.rows, [("Company", "Role", "Years"), ("Google", "SRE", "2015-2020")]):
+        for cell, value in zip(row.cells, values):
+            cell.text = value
+    path = tmp_path / "cv.docx"
+    document.save(path)
+    return path
+
+def test_matches_python_docx(cv_path):
+    assert extract_docx_text(str(cv_path)) == python_docx_text(cv_path)
+    assert list(iter_docx_blocks(str(cv_path))) == [
+        "Ann Smith",
+        "ann@example.com",
+        "Senior engineer with ten years of Python.",
+        "Company | Role | Years",
+        "Google | SRE | 2015-2020",
+    ]
+
+def test_merged_cells_appear_once(tmp_path):
+    document = docx.Document()
+    table = document.add_table(rows=3, cols=2)
+    table.cell(0, 0).merge(table.cell(0, 1)).text = "Experience"
+    table.cell(1, 0).merge(table.cell(2, 0)).text = "Acme Corp"
+    table.cell(1, 1).text = "Engineer"
+    table.cell(2, 1).text = "Lead"
+    path = tmp_path / "merged.docx"
+    document.save(path)
+
+    blocks = list(iter_docx_blocks(str(path)))
+    assert blocks == ["Experience", "Acme Corp | Engineer", "Lead"]
+    # python-docx repeats merged cells, so only the vocabulary is the same
+    assert tokens("\n\n".join(blocks)) == tokens(python_docx_text(path))
+
+def test_nested_table_reads_as_part_of_its_cell(tmp_path):
+    document = docx.Document()
+    table = document.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "Skills"
+    outer = table.cell(0, 1)
+    outer.text = "Languages"
+    nested = outer.add_table(rows=2, cols=2)
+    for row, values in zip(nested.rows, [("Python", "Expert"), ("Go", "Intermediate")]):
+        for cell, value in zip(row.cells, values):
+            cell.text = value
+    document.add_paragraph("References on request")
+    path = tmp_path / "nested.docx"
+    document.save(path)
+
+    assert list(iter_docx_blocks(str(path))) == [
+        "Skills | Languages\nPython | Expert\nGo | Intermediate",
+        "References on request",
+    ]
+
+def test_text_box_fallback_is_skipped(tmp_path):
+    body = (
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+        'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006"><w:body>'
+        '<w:p><w:r><w:t>Profile</w:t></w:r></w:p>'
+        '<w:p><w:r><mc:AlternateContent>'
+        '<mc:Choice Requires="wps"><w:txbxContent><w:p><w:r><w:t>Call me</w:t></w:r></w:p></w:txbxContent></mc:Choice>'
+        '<mc:Fallback><w:txbxContent><w:p><w:r><w:t>Call me</w:t></w:r></w:p></w:txbxContent></mc:Fallback>'
+        '</mc:AlternateContent></w:r></w:p>'
+        '<w:p><w:r><w:t>Line one</w:t><w:br/><w:t>line two</w:t><w:tab/><w:t>end</w:t></w:r></w:p>'
+        '</w:body></w:document>'
+    )
+    path = tmp_path / "textbox.docx"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("word/document.xml", body)
+
+    text = extract_docx_text(str(path))
+    assert text.count("Call me") == 1
+    assert text.startswith("Profile\n\n")
+    assert text.endswith("Line one\nline two\tend")
@@ -0,0 +1,155 @@
+import asyncio
+from typing import Any, Dict
+
+import numpy as np
+import pytest
+
+from app.models.documents import CVQuery, ParsedCV, QueryMode
+from app.services import llm_service as llm_service_module
+from app.services.circuit_breaker import CLOSED, OPEN, CircuitBreaker, Deadline, DeadlineExceeded, call_with_retries
+from app.services.llm_backends import LLMBackend, LLMResponse
+from app.services.llm_service import LLMService
+from app.services.model_registry import ModelUnavailableError
+from app.services.rate_limit import LLMRateLimiter
+
+class StubBackend(LLMBackend):
+    model_name = "stub"
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def is_available(self) -> bool:
+        return True
+
+    async def create(self, request: Dict[str, Any]) -> LLMResponse:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return LLMResponse(text="ok", input_tokens=10, output_tokens=5)
+
+    async def stream(self, request: Dict[str, Any]):
+        yield await self.create(request)
+
+class SlowLimiter(LLMRateLimiter):
+    """Budget that takes a fixed time to free up, without Redis."""
+
+    def __init__(self, wait: float, max_concurrency: int = 4):
+        super().__init__("test", max_concurrency=max_concurrency)
+        self.wait = wait
+
+    async def _wait_for_budget(self, estimated_tokens: int) -> None:
+        await asyncio.sleep(self.wait)
+
+    async def settle(self, estimated_tokens: int, actual_tokens: int) -> None:
+        pass
+
+@pytest.fixture
+def breaker(monkeypatch):
+    breaker = CircuitBreaker("test", failure_rate_threshold=0.5, minimum_calls=4, window_seconds=60, open_seconds=30)
+    monkeypatch.setattr(llm_service_module, "get_llm_breaker", lambda: breaker)
+    return breaker
+
+def make_service(monkeypatch, backend: LLMBackend, limiter: LLMRateLimiter) -> LLMService:
+    monkeypatch.setattr(llm_service_module, "get_llm_rate_limiter", lambda: limiter)
+    service = LLMService()
+    service.backend = backend
+    return service
+
+def create(service: LLMService, deadline: Deadline):
+    return call_with_retries(
+        lambda: service._create_message(max_tokens=10, messages=[{"role": "user", "content": "hi"}]),
+        deadline,
+        base_delay=0.01
+    )
+
+def test_waiting_for_rate_limits_does_not_open_the_breaker(monkeypatch, breaker):
+    backend = StubBackend()
+    service = make_service(monkeypatch, backend, SlowLimiter(wait=1.0))
+
+    async def run():
+        for _ in range(10):
+            with pytest.raises(DeadlineExceeded):
+                await create(service, Deadline(0.05))
+
+    asyncio.run(run())
+    assert backend.calls == 0
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["recent_calls"] == 0
+
+def test_hung_upstream_opens_the_breaker(monkeypatch, breaker):
+    service = make_service(monkeypatch, StubBackend(latency=1.0), SlowLimiter(wait=0.0))
+
+    async def run():
+        for _ in range(4):
+            with pytest.raises(DeadlineExceeded):
+                await create(service, Deadline(0.05))
+
+    asyncio.run(run())
+    assert breaker.state == OPEN
+
+class StubEncoder:
+    def encode(self, text):
+        return np.array([1.0, 0.0])
+
+def test_retrieval_loads_the_embedding_model_on_demand(monkeypatch):
+    loads = []
+
+    async def load_embedding_model():
+        loads.append(1)
+        return StubEncoder()
+
+    monkeypatch.setattr(llm_service_module.model_registry, "load_embedding_model", load_embedding_model)
+    service = LLMService()
+    # Stored in Mongo order; the closest embedding comes last
+    cvs = [ParsedCV(id=str(i), raw_text="cv", embedding=[float(-i), 5.0]) for i in range(3)]
+    cvs.append(ParsedCV(id="match", raw_text="cv", embedding=[1.0, 0.0]))
+
+    candidates = asyncio.run(service.retrieve_candidates("who knows python", cvs, top_k=1))
+    assert [cv.id for cv in candidates] == ["match"]
+    assert loads == [1]
+
+def test_retrieval_fails_when_the_embedding_model_cannot_load(monkeypatch):
+    async def load_embedding_model():
+        raise OSError("model files missing")
+
+    monkeypatch.setattr(llm_service_module.model_registry, "load_embedding_model", load_embedding_model)
+    cvs = [ParsedCV(id="1", raw_text="cv", embedding=[1.0, 0.0])]
+    with pytest.raises(ModelUnavailableError):
+        asyncio.run(LLMService().retrieve_candidates("who knows python", cvs, top_k=1))
+
+class ConcurrencyProbe(StubBackend):
+    def __init__(self, latency: float):
+        super().__init__(latency)
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create(self, request: Dict[str, Any]) -> LLMResponse:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return await super().create(request)
+        finally:
+            self.in_flight -= 1
+
+def test_map_shards_caps_fan_out(monkeypatch, breaker):
+    monkeypatch.setattr(llm_service_module.settings, "QUERY_MAP_CONCURRENCY", 3)
+    backend = ConcurrencyProbe(latency=0.02)
+    service = make_service(monkeypatch, backend, SlowLimiter(wait=0.0, max_concurrency=20))
+
+    contexts = [f"CV data:\nshard {i}" for i in range(10)]
+    findings = asyncio.run(service._map_shards("Extract", "who knows python", contexts, Deadline(5)))
+    assert findings == ["ok"] * 10
+    assert backend.calls == 10
+    assert backend.max_in_flight == 3
+
+def test_map_reduce_fails_fast_when_the_rate_limits_cannot_fit_the_deadline(monkeypatch, breaker):
+    monkeypatch.setattr(llm_service_module.settings, "QUERY_MAP_SHARD_TOKEN_BUDGET", 200)
+    monkeypatch.setattr(llm_service_module.settings, "LLM_TOKENS_PER_MINUTE", 1000)
+    backend = StubBackend()
+    service = make_service(monkeypatch, backend, SlowLimiter(wait=0.0))
+    cvs = [ParsedCV(id=str(i), raw_text="Python engineer " * 100) for i in range(8)]
+
+    query = CVQuery(query="rank everyone by Python", mode=QueryMode.MAP_REDUCE)
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(service._build_map_reduce_request(query, cvs, Deadline(30)))
+    assert backend.calls == 0
@@ -0,0 +1,23 @@
+import pytest
+
+from app.services.ocr import _page_windows
+
+@pytest.mark.parametrize("pages, window_size, windows", [
+    ([], 4, []),
+    ([1], 4, [(1, 1)]),
+    ([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 4, [(1, 4), (5, 8), (9, 10)]),
+    ([1, 2, 3, 4], 4, [(1, 4)]),
+    # Gaps start a new window so only the requested pages are rendered
+    ([2, 3, 7, 8, 9], 4, [(2, 3), (7, 9)]),
+    ([1, 3, 5], 4, [(1, 1), (3, 3), (5, 5)]),
+    ([1, 2, 3], 1, [(1, 1), (2, 2), (3, 3)]),
+])
+def test_page_windows(pages, window_size, windows):
+    assert _page_windows(pages, window_size) == windows
+
+def test_page_windows_cover_every_page_once():
+    pages = [1, 2, 3, 5, 6, 7, 8, 9, 12, 13, 14, 15, 16, 17]
+    windows = _page_windows(pages, 3)
+    covered = [page for first, last in windows for page in range(first, last + 1)]
+    assert covered == pages
+    assert all(last - first + 1 <= 3 for first, last in windows)
@@ -0,0 +1,84 @@
+import pytest
+
+from app.services.query_router import CandidateIndex, QueryRouter
+
+@pytest.fixture
+def index():
+    index = CandidateIndex()
+    index.add({
+        "_id": "1",
+        "personal_info": {"name": "Ann Smith"},
+        "skills": [{"name": "Python"}, {"name": "Kubernetes"}, {"name": "Node.js"}, {"name": "Oracle"}],
+        "education": [{"degree": "M.Sc. Computer Science", "institution": "MIT"}],
+        "work_experience": [{"company": "Google LLC"}, {"company": "Procter and Gamble"}]
+    })
+    index.add({
+        "_id": "2",
+        "personal_info": {"name": "Bob Jones"},
+        "skills": [{"name": "Java"}, {"name": "C++"}, {"name": "Python"}, {"name": "MS Office"}],
+        "education": [{"degree": "Bachelor of Arts"}],
+        "work_experience": [{"company": "Amazon"}, {"company": "Oracle"}]
+    })
+    return index
+
+@pytest.fixture
+def router():
+    return QueryRouter()
+
+@pytest.mark.parametrize("query, facet, terms, match_all", [
+    ("How many candidates know Kubernetes?", "skills", ["kubernetes"], True),
+    ("Which candidates have Python skills", "skills", ["python"], True),
+    ("Who knows Python and C++?", "skills", ["python", "c++"], True),
+    ("Who knows Java or Node.js?", "skills", ["java", "node.js"], False),
+    ("List candidates with a Master's degree", "degrees", ["Master's"], True),
+    ("Who has an MS degree?", "degrees", ["Master's"], True),
+    ("Who worked at Google?", "companies", ["google"], True),
+    ("Who has worked at Google LLC?", "companies", ["google"], True),
+    ("Who has worked at Procter and Gamble?", "companies", ["procter and gamble"], True),
+    ("Who worked at Oracle?", "companies", ["oracle"], True),
+    ("Who studied at MIT?", "institutions", ["mit"], True),
+])
+def test_classifies_lookups(router, index, query, facet, terms, match_all):
+    structured = router.classify(query, index)
+    assert structured is not None
+    assert (structured.facet, structured.terms, structured.match_all) == (facet, terms, match_all)
+
+@pytest.mark.parametrize("query", [
+    # Short degree aliases inside other terms
+    "Who knows MS SQL?",
+    "Which candidates are proficient in Java and MS Office?",
+    # Negation and contrast
+    "Which candidates do not know Java?",
+    "Who knows Python but not Java?",
+    "Who worked at Google but not Amazon?",
+    "Which candidates have Python without Java?",
+    # Conditions across facets
+    "Which candidates know Python and have worked at Google?",
+    "Who has a Masters and knows Python?",
+    # A condition the indexes do not know about
+    "Who knows Python and Rust?",
+    "Who knows Rust?",
+    # Qualifiers beyond the matched facet: field of study, dates, location
+    "Who has an MS in Computer Science?",
+    "List candidates with a Master's degree in Computer Science",
+    "Who has a master's degree in history?",
+    "Who worked at Google in 2019?",
+    "Who worked at Google after 2020?",
+    "Which candidates with Python skills live in Berlin?",
+    # Open-ended questions
+    "Who is the best Python developer?",
+    "How many years of experience does Ann Smith have?",
+    "Tell me about Ann Smith",
+])
+def test_falls_back_to_llm(router, index, query):
+    assert router.classify(query, index) is None
+
+def test_answers_from_index(router, index):
+    answer = router.answer(router.classify("Who knows Python and C++?", index), index)
+    assert answer == "1 of 2 candidates list Python and C++ as skills:\n- Bob Jones"
+
+    answer = router.answer(router.classify("How many candidates know Java or Node.js?", index), index)
+    assert answer.startswith("2 of 2 candidates list Java or Node.js as skills")
+
+    answer = router.answer(router.classify("Who worked at Google?", index), index)
+    assert answer == "1 of 2 candidates have worked at Google LLC:\n- Ann Smith"
@@ -0,0 +1,65 @@
+from typing import List
+
+import pytest
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from app.core import upload_limits
+from app.core.config import settings
+from app.core.upload_limits import UploadSizeLimitMiddleware
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_DOCUMENT_SIZE_MB", 1)
+    monkeypatch.setattr(settings, "BATCH_MAX_UPLOAD_MB", 2)
+    monkeypatch.setattr(upload_limits, "UPLOAD_ENVELOPE_BYTES", 0)
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimitMiddleware)
+    parsed = []
+
+    @app.post(f"{settings.API_V1_STR}/documents/upload")
+    async def upload(file: UploadFile = File(...)):
+        parsed.append(file.filename)
+        return {"size": len(await file.read())}
+
+    @app.post(f"{settings.API_V1_STR}/documents/batch")
+    async def batch(files: List[UploadFile] = File(...)):
+        parsed.extend(file.filename for file in files)
+        return {"files": len(files)}
+
+    client = TestClient(app)
+    client.parsed = parsed
+    return client
+
+def multipart_body(size: int) -> bytes:
+    return (
+        b"--boundary\r\nContent-Disposition: form-data; name=\"file\"; filename=\"cv.pdf\"\r\n\r\n"
+        + b"x" * size + b"\r\n--boundary--\r\n"
+    )
+
+def test_upload_within_limit_is_accepted(client):
+    response = client.post(f"{settings.API_V1_STR}/documents/upload", files={"file": ("cv.pdf", b"x" * 1000)})
+    assert response.status_code == 200
+    assert response.json() == {"size": 1000}
+
+def test_declared_oversized_upload_is_refused_unread(client):
+    response = client.post(f"{settings.API_V1_STR}/documents/upload", files={"file": ("cv.pdf", b"x" * (2 * 1024 * 1024))})
+    assert response.status_code == 413
+    assert client.parsed == []
+
+@pytest.mark.parametrize("route, size", [("upload", 2 * 1024 * 1024), ("batch", 3 * 1024 * 1024)])
+def test_chunked_oversized_body_is_cut_off(client, route, size):
+    body = multipart_body(size)
+    response = client.post(
+        f"{settings.API_V1_STR}/documents/{route}",
+        content=(body[i:i + 65536] for i in range(0, len(body), 65536)),
+        headers={"content-type": "multipart/form-data; boundary=boundary"}
+    )
+    assert response.status_code == 413
+    assert client.parsed == []
+
+def test_batch_under_its_own_limit_is_accepted(client):
+    files = [("files", (f"cv{i}.pdf", b"x" * (600 * 1024))) for i in range(3)]
+    response = client.post(f"{settings.API_V1_STR}/documents/batch", files=files)
+    assert response.status_code == 200
+    assert response.json() == {"files": 3}
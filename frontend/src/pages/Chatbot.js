@@ -24,15 +24,15 @@ import { FiSend, FiInfo } from 'react-icons/fi';
 import ChatMessage from '../components/ChatMessage';
 import { queryService, cvService } from '../services/api';
 
-const MAX_CONVERSATION_HISTORY = 10000;
-const MIN_CONVERSATION_MESSAGES = 5;
+// The server keeps the conversation under this id, summarizing older turns so prompts stay bounded
+const newSessionId = () => `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
 
 const Chatbot = () => {
   const [messages, setMessages] = useState([]);
   const [inputText, setInputText] = useState('');
   const [isLoading, setIsLoading] = useState(false);
   const [documentCount, setDocumentCount] = useState(0);
-  const [conversationHistory, setConversationHistory] = useState([]);
+  const sessionIdRef = useRef(newSessionId());
   const messagesEndRef = useRef(null);
   const toast = useToast();
   const [errorDetails, setErrorDetails] = useState(null);
@@ -64,53 +64,12 @@ const Chatbot = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   }, [messages]);
 
-  const formatConversationForContext = () => {
-
-    const structuredHistory = [];
-    
-    // Group messages into Q&A pairs
-    let currentPair = { user: null, assistant: null };
-    
-    // Process messages in reverse to get most recent first
-    for (let i = conversationHistory.length - 1; i >= 0; i--) {
-      const msg = conversationHistory[i];
-      
-      if (msg.isUser && currentPair.user === null) {
-        currentPair.user = msg.text;
-      } else if (!msg.isUser && currentPair.assistant === null && currentPair.user !== null) {
-        currentPair.assistant = msg.text;
-        
-        // Complete pair found, add to history
-        structuredHistory.unshift({...currentPair});
-        
-        // Reset for next pair
-        currentPair = { user: null, assistant: null };
-      } else if (msg.isUser) {
-        // Found a user message when we already have one - start a new pair
-        if (currentPair.user !== null && currentPair.assistant === null) {
-          // Discard incomplete pair
-          currentPair = { user: msg.text, assistant: null };
-        }
-      }
-    }
-    
-    // Only keep last 5 complete pairs to avoid context length issues
-    const recentHistory = structuredHistory.slice(-5);
-    
-    // Format history as a string with clear user/assistant labels
-    return recentHistory
-      .map(pair => `User: ${pair.user}\nAssistant: ${pair.assistant}`)
-      .join('\n\n');
-  };
-
   const handleSendMessage = async () => {
     if (!inputText.trim()) return;
     
     const userMessage = { text: inputText, isUser: true };
     setMessages(prevMessages => [...prevMessages, userMessage]);
     
-    setConversationHistory(prev => [...prev, userMessage]);
-    
     setInputText('');
     
     if (documentCount === 0) {
@@ -120,7 +79,6 @@ const Chatbot = () => {
       };
       
       setMessages(prevMessages => [...prevMessages, noDocsMessage]);
-      setConversationHistory(prev => [...prev, noDocsMessage]);
       return;
     }
     
@@ -128,10 +86,8 @@ const Chatbot = () => {
     setErrorDetails(null);
     
     try {
-      const context = formatConversationForContext();
-      
       // Send query to backend
-      const response = await queryService.query(inputText, context);
+      const response = await queryService.query(inputText, null, sessionIdRef.current);
       
       // Create assistant response object
       const assistantResponse = { 
@@ -139,34 +95,6 @@ const Chatbot = () => {
         isUser: false 
       };
       
-      // Update conversation history with the assistant's response
-      setConversationHistory(prev => {
-        const updated = [...prev, assistantResponse];
-        
-        // Prune conversation history if it gets too long
-        if (JSON.stringify(updated).length > MAX_CONVERSATION_HISTORY) {
-          // Work with pairs to keep conversations coherent
-          const pairs = [];
-          let currentPair = [];
-          
-          for (let i = updated.length - 1; i >= 0; i--) {
-            currentPair.unshift(updated[i]);
-            
-            // When we have a pair (user + assistant)
-            if (currentPair.length === 2) {
-              pairs.unshift(currentPair);
-              currentPair = [];
-            }
-          }
-          
-          // Keep first pair (might be incomplete) + recent complete pairs
-          const keptPairs = pairs.slice(0, Math.max(MIN_CONVERSATION_MESSAGES / 2, 5));
-          return keptPairs.flat();
-        }
-        
-        return updated;
-      });
-      
       setMessages(prevMessages => [
         ...prevMessages,
         assistantResponse
@@ -191,7 +119,6 @@ const Chatbot = () => {
       };
       
       setMessages(prevMessages => [...prevMessages, errorResponse]);
-      setConversationHistory(prev => [...prev, errorResponse]);
     } finally {
       setIsLoading(false);
     }
@@ -211,7 +138,7 @@ const Chatbot = () => {
     };
     
     setMessages([welcomeMessage]);
-    setConversationHistory([welcomeMessage]);
+    sessionIdRef.current = newSessionId();
     setErrorDetails(null);
   };
 
@@ -69,6 +69,35 @@ export const cvService = {
     }
   },
   
+  uploadBatch: async (files) => {
+    const formData = new FormData();
+    files.forEach(file => formData.append('files', file));
+    
+    try {
+      const response = await api.post('/documents/batch', formData, {
+        headers: {
+          'Content-Type': 'multipart/form-data',
+        },
+        timeout: 300000,
+      });
+      
+      return response.data;
+    } catch (error) {
+      console.error('Error uploading batch:', error);
+      throw error;
+    }
+  },
+  
+  getBatchStatus: async (batchId) => {
+    try {
+      const response = await api.get(`/documents/batch/${batchId}`);
+      return response.data;
+    } catch (error) {
+      console.error(`Error getting batch status ${batchId}:`, error);
+      throw error;
+    }
+  },
+  
   getDocumentStatus: async (id) => {
     try {
       const response = await api.get(`/documents/status/${id}`);
@@ -91,11 +120,12 @@ export const cvService = {
 };
 
 export const queryService = {
-  query: async (queryText, context = null) => {
+  query: async (queryText, context = null, sessionId = null) => {
     try {
       const response = await api.post('/queries/query', {
         query: queryText,
         context: context,
+        session_id: sessionId,
       });
       
       return response.data;
@@ -105,11 +135,57 @@ export const queryService = {
     }
   },
   
-  followupQuery: async (queryText, context) => {
+  // Streams the answer as server-sent events; onToken receives text chunks as they arrive and
+  // onDone the final usage stats. Abort the signal to cancel the upstream LLM call.
+  streamQuery: async (queryText, context = null, { onToken, onDone, signal, sessionId = null } = {}) => {
+    const response = await fetch(`${api.defaults.baseURL}/queries/query/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ query: queryText, context: context, session_id: sessionId }),
+      signal,
+    });
+    
+    if (!response.ok) {
+      throw new Error(`Server error: ${response.status} ${response.statusText}`);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const rawEvent = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        
+        const eventLine = rawEvent.split('\n').find(line => line.startsWith('event: '));
+        const dataLine = rawEvent.split('\n').find(line => line.startsWith('data: '));
+        if (!eventLine || !dataLine) continue;
+        
+        const event = eventLine.slice(7);
+        const data = JSON.parse(dataLine.slice(6));
+        if (event === 'token' && onToken) {
+          onToken(data.text);
+        } else if (event === 'done' && onDone) {
+          onDone(data);
+        } else if (event === 'error') {
+          throw new Error(data.detail);
+        }
+      }
+    }
+  },
+  
+  followupQuery: async (queryText, context, sessionId = null) => {
     try {
       const response = await api.post('/queries/followup', {
         query: queryText,
         context: context,
+        session_id: sessionId,
       });
       
       return response.data;